@@ -0,0 +1,67 @@
+"""
+Ingredient autocomplete: database LIKE lookup versus the in-memory prefix
+index, for one- to four-letter prefixes.
+
+    python benchmarks/bench_autocomplete.py --ingredients 10000 100000
+"""
+import argparse
+import random
+import string
+import time
+
+from common import percentile, setup
+
+
+def random_name(rng):
+    words = rng.randint(1, 3)
+    return " ".join(
+        "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+        for _ in range(words))
+
+
+def measure(func, prefixes):
+    samples = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        func(prefix)
+        samples.append(time.perf_counter() - start)
+    return percentile(samples, 50) * 1000, percentile(samples, 99) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ingredients", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    setup()
+    from ingredients.autocomplete import index
+    from ingredients.models import Ingredient
+
+    def database(prefix):
+        return list(Ingredient.objects.filter(name__istartswith=prefix)
+                    .order_by("name").values_list("id", "name")[:10])
+
+    rng = random.Random(42)
+    print(f"{'ingredients':>11}  {'build s':>8}  {'LIKE p50/p99 ms':>17}  {'index p50/p99 ms':>17}")
+    for size in args.ingredients:
+        names = set(Ingredient.objects.values_list("name", flat=True))
+        while len(names) < size:
+            names.add(random_name(rng))
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name) for name in names], ignore_conflicts=True,
+            batch_size=1000)
+        prefixes = [rng.choice(string.ascii_lowercase) * 1 +
+                    "".join(rng.choice(string.ascii_lowercase)
+                            for _ in range(rng.randint(0, 3)))
+                    for _ in range(args.repeat)]
+        start = time.perf_counter()
+        index.build()
+        build = time.perf_counter() - start
+        slow = measure(database, prefixes[:200])
+        fast = measure(index.complete, prefixes)
+        print(f"{size:>11}  {build:>8.2f}  {slow[0]:>8.3f} /{slow[1]:>7.3f}  {fast[0]:>8.4f} /{fast[1]:>7.4f}")
+
+
+if __name__ == "__main__":
+    main()
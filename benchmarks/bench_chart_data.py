@@ -0,0 +1,71 @@
+"""
+Dashboard chart data: GROUP BY over RecipeIngredient / Recipe on every
+render versus reading the rollup tables, for the popular ingredients (#2)
+and recipe growth (#3) charts.
+
+    python benchmarks/bench_chart_data.py --recipes 100000 --days 365
+"""
+import argparse
+import statistics
+import time
+
+from common import percentile, seed, setup
+
+
+def measure(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000, percentile(samples, 99) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--recipes", type=int, default=100000)
+    parser.add_argument("--ingredients", type=int, default=2000)
+    parser.add_argument("--per-recipe", type=int, default=5)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    seed(args.recipes, args.ingredients, args.per_recipe)
+    from datetime import timedelta
+    from django.db.models import Count, Value
+    from django.db.models.functions import Mod, TruncDate
+    from django.utils import timezone
+    from recipes.models import Recipe
+    from recipes.rollups import daily_recipes, rebuild, top_ingredients
+    from recipesingredients.models import RecipeIngredient
+
+    # spread the recipes over the last `days` days, one day per id modulo
+    now = timezone.now()
+    for day in range(args.days):
+        Recipe.objects.annotate(bucket=Mod("id", Value(args.days))).filter(
+            bucket=day).update(created_at=now - timedelta(days=day))
+
+    start = time.perf_counter()
+    ingredients, days = rebuild()
+    print(f"rebuild_rollups: {time.perf_counter() - start:.2f} s "
+          f"({ingredients} ingredient rows, {days} day rows)")
+
+    def popular_group_by():
+        return list(RecipeIngredient.objects.values("ingredient__name").annotate(
+            count=Count("recipe")).order_by("-count")[:10])
+
+    def growth_group_by():
+        return list(Recipe.objects.annotate(day=TruncDate("created_at")).values(
+            "day").annotate(count=Count("id")).order_by("day"))
+
+    for label, func in [("#2 GROUP BY", popular_group_by),
+                        ("#2 rollup", top_ingredients),
+                        ("#3 GROUP BY", growth_group_by),
+                        ("#3 rollup", daily_recipes)]:
+        p50, p99 = measure(func, args.repeat)
+        print(f"{label:>12}: p50 {p50:8.2f} ms  p99 {p99:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
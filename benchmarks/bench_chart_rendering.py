@@ -0,0 +1,90 @@
+"""
+Load test: sustained throughput of the ingredient-search pie chart (the image
+endpoint the search page links to) with charts drawn inside the web threads
+versus in the render process pool.
+
+Every request bumps the data version, so each one is a chart cache miss and
+really renders. Threads stand in for the threads of a WSGI worker.
+
+    python benchmarks/bench_chart_rendering.py --threads 8 --duration 10
+"""
+import argparse
+import os
+import threading
+import time
+
+from common import percentile, seed, setup
+
+
+def run(mode_workers, threads, duration, user, names):
+    from django.db import connection
+    from django.test import RequestFactory, override_settings
+    from recipes.cache import bump_data_version
+    from recipes.rendering import renderer
+    from recipes.views import chart_image
+
+    latencies, fallbacks = [], []
+    lock = threading.Lock()
+    deadline = None
+
+    def client(index):
+        factory = RequestFactory()
+        i = index
+        while time.perf_counter() < deadline:
+            i += threads
+            request = factory.get("/recipes/charts/difficulty.png", {
+                "ingredient": names[i % len(names)]})
+            request.user = user
+            bump_data_version()
+            start = time.perf_counter()
+            response = chart_image(request, "difficulty", "png")
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                fallbacks.append(not response.has_header("ETag"))
+        connection.close()
+
+    with override_settings(CHART_RENDER_WORKERS=mode_workers):
+        renderer.shutdown()
+        renderer.start()
+        time.sleep(3 if mode_workers else 0)  # let the workers warm up
+        pool = [threading.Thread(target=client, args=(n,)) for n in range(threads)]
+        started = time.perf_counter()
+        deadline = started + duration
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        renderer.shutdown()
+
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50": percentile(latencies, 50) * 1000,
+        "p95": percentile(latencies, 95) * 1000,
+        "fallbacks": sum(fallbacks),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--recipes", type=int, default=2000)
+    args = parser.parse_args()
+
+    setup()
+    user = seed(recipes=args.recipes, ingredients=100)
+    names = [f"ingredient-{i}" for i in range(100)]
+
+    print(f"{'mode':<16}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'fallbacks':>11}")
+    for label, workers in (("inline", 0), (f"pool x{args.workers}", args.workers)):
+        result = run(workers, args.threads, args.duration, user, names)
+        print(f"{label:<16}{result['requests']:>10}{result['rps']:>10.1f}"
+              f"{result['p50']:>10.1f}{result['p95']:>10.1f}{result['fallbacks']:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Per-request database connection overhead: a new connection per request
+(CONN_MAX_AGE = 0) versus persistent connections with health checks versus
+the in-process pool, for requests served by one long-lived thread and for
+requests each served by a new thread.
+
+There is no MySQL server here, so SQLite stands in and --connect-ms adds a
+sleep to every new connection to model MySQL's TCP + auth handshake.
+
+    python benchmarks/bench_db_connections.py --connect-ms 3
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from common import percentile, setup
+
+MODES = {
+    "new per request": {"ENGINE": "django.db.backends.sqlite3", "CONN_MAX_AGE": 0},
+    "persistent": {"ENGINE": "django.db.backends.sqlite3", "CONN_MAX_AGE": 60,
+                   "CONN_HEALTH_CHECKS": True},
+    "pool": {"ENGINE": "recipe_project.db.sqlite3", "CONN_MAX_AGE": 0,
+             "POOL": {"SIZE": 4}},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--connect-ms", type=float, default=3.0)
+    args = parser.parse_args()
+
+    db_path = setup()
+
+    from django.conf import settings
+    from django.core.signals import request_finished, request_started
+    from django.db import connections
+    # one more alias per mode, all on the benchmark database
+    settings.DATABASES.update({
+        mode: {**options, "NAME": db_path} for mode, options in MODES.items()})
+    connections.settings = connections.configure_settings(settings.DATABASES)
+    from django.db.backends.sqlite3 import base
+    from recipes.models import Recipe
+
+    connect = base.Database.connect
+    connects = {"count": 0}
+
+    def slow_connect(*a, **kw):
+        connects["count"] += 1
+        time.sleep(args.connect_ms / 1000)
+        return connect(*a, **kw)
+
+    base.Database.connect = slow_connect
+
+    def request(mode):
+        # what Django's handler does around a view making one small query
+        request_started.send(sender=None)
+        Recipe.objects.using(mode).filter(pk=1).exists()
+        request_finished.send(sender=None)
+
+    def in_new_thread(mode):
+        thread = threading.Thread(target=request, args=(mode,))
+        thread.start()
+        thread.join()
+
+    for label, serve in [("one thread", request), ("thread per request", in_new_thread)]:
+        for mode in MODES:
+            connects["count"] = 0
+            samples = []
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                serve(mode)
+                samples.append(time.perf_counter() - start)
+            print(f"{label:>18} {mode:>15}: p50 {statistics.median(samples) * 1000:6.3f} ms"
+                  f"  p99 {percentile(samples, 99) * 1000:6.3f} ms"
+                  f"  connects {connects['count']}")
+
+
+if __name__ == "__main__":
+    main()
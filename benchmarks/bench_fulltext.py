@@ -0,0 +1,108 @@
+"""
+Full-text recipe search: index build time, then query latency of the BM25
+index versus an icontains scan over recipe names and ingredient texts (first
+page plus the total count, as a paginated result needs).
+
+Words are drawn from a Zipf-like vocabulary, so a few words appear in most
+recipes and most words in few.
+
+    python benchmarks/bench_fulltext.py --recipes 100000 --vocabulary 2000
+"""
+import argparse
+import itertools
+import random
+import statistics
+import time
+
+from common import percentile, setup
+
+WORDS = (
+    "tomato basil garlic onion pepper chicken beef pork tofu rice noodle "
+    "bean lentil cheese butter cream lemon lime ginger chili curry soup "
+    "salad stew roast grilled fried baked spicy sweet sour smoky fresh "
+    "crispy creamy herb mushroom spinach potato carrot corn egg honey"
+).split()
+
+
+class Vocabulary:
+    def __init__(self, size, rng):
+        compounds = (a + b for a, b in itertools.product(WORDS, WORDS) if a != b)
+        self.words = list(itertools.islice(itertools.chain(WORDS, compounds), size))
+        self.weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(self.words))))
+        self.rng = rng
+
+    def sample(self, count):
+        return self.rng.choices(self.words, cum_weights=self.weights, k=count)
+
+    def sentence(self, low, high):
+        return " ".join(self.sample(self.rng.randint(low, high)))
+
+
+def measure(func, queries):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        func(query)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000, percentile(samples, 99) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--recipes", type=int, default=100000)
+    parser.add_argument("--ingredients", type=int, default=2000)
+    parser.add_argument("--per-recipe", type=int, default=5)
+    parser.add_argument("--vocabulary", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth.models import User
+    from django.db.models import Q
+    from ingredients.models import Ingredient
+    from recipes.fulltext import index
+    from recipes.models import Recipe
+    from recipesingredients.models import RecipeIngredient
+
+    rng = random.Random(42)
+    vocabulary = Vocabulary(args.vocabulary, rng)
+    sentence = vocabulary.sentence
+    user = User.objects.create(username="bench")
+    Ingredient.objects.bulk_create(
+        [Ingredient(name=f"{sentence(1, 2)} {i}", introduction=sentence(5, 15))
+         for i in range(args.ingredients)], batch_size=1000)
+    Recipe.objects.bulk_create(
+        [Recipe(name=sentence(2, 4), cooking_time=10, difficulty="Hard",
+                ingredient_num=args.per_recipe, created_by=user)
+         for _ in range(args.recipes)], batch_size=1000)
+    ingredient_ids = list(Ingredient.objects.values_list("id", flat=True))
+    RecipeIngredient.objects.bulk_create(
+        [RecipeIngredient(recipe_id=pk, ingredient_id=ingredient_id, quantity="1")
+         for pk in Recipe.objects.values_list("id", flat=True)
+         for ingredient_id in rng.sample(ingredient_ids, args.per_recipe)],
+        batch_size=5000)
+
+    def database(query):
+        condition = Q()
+        for word in query.split():
+            condition |= (Q(name__icontains=word)
+                          | Q(recipeingredient__ingredient__introduction__icontains=word))
+        matches = Recipe.objects.filter(condition).distinct()
+        return matches.count(), list(matches.values_list("id", flat=True)[:20])
+
+    def in_memory(query):
+        return index.search(query)[:20]
+
+    start = time.perf_counter()
+    index.build()
+    print(f"index build for {args.recipes} recipes: {time.perf_counter() - start:.2f} s")
+    for terms in (1, 2, 3):
+        queries = [" ".join(vocabulary.sample(terms)) for _ in range(args.repeat)]
+        slow = measure(database, queries[:max(5, args.repeat // 20)])
+        fast = measure(in_memory, queries)
+        print(f"{terms} term(s): icontains p50 {slow[0]:8.1f} / p99 {slow[1]:8.1f} ms   "
+              f"BM25 index p50 {fast[0]:6.2f} / p99 {fast[1]:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
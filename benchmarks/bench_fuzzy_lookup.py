@@ -0,0 +1,64 @@
+"""
+Fuzzy ingredient lookup: p50/p99 latency of the trigram index for exact,
+one-typo and two-typo queries.
+
+    python benchmarks/bench_fuzzy_lookup.py --ingredients 100000
+"""
+import argparse
+import random
+import string
+import time
+
+from common import percentile, setup
+
+
+def random_name(rng):
+    return " ".join(
+        "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+        for _ in range(rng.randint(1, 3)))
+
+
+def typo(rng, name, edits):
+    for _ in range(edits):
+        i = rng.randrange(len(name))
+        name = name[:i] + rng.choice(string.ascii_lowercase) + name[i + 1:]
+    return name
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ingredients", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    setup()
+    from ingredients.fuzzy import index
+    from ingredients.models import Ingredient
+
+    rng = random.Random(42)
+    names = set()
+    while len(names) < args.ingredients:
+        names.add(random_name(rng))
+    Ingredient.objects.bulk_create([Ingredient(name=name) for name in names],
+                                   batch_size=1000)
+    names = sorted(names)
+
+    start = time.perf_counter()
+    index.build()
+    print(f"index build for {len(names)} ingredients: {time.perf_counter() - start:.2f} s")
+    print(f"{'edits':>5}  {'p50 ms':>8}  {'p99 ms':>8}  {'found':>6}")
+    for edits in (0, 1, 2):
+        samples, found = [], 0
+        for _ in range(args.repeat):
+            name = rng.choice(names)
+            query = typo(rng, name, edits)
+            start = time.perf_counter()
+            matches = index.lookup(query)
+            samples.append(time.perf_counter() - start)
+            found += any(match.name == name for match in matches)
+        print(f"{edits:>5}  {percentile(samples, 50) * 1000:>8.3f}  "
+              f"{percentile(samples, 99) * 1000:>8.3f}  {found / args.repeat:>6.1%}")
+
+
+if __name__ == "__main__":
+    main()
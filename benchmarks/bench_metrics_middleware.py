@@ -0,0 +1,63 @@
+"""
+Per-request cost of MetricsMiddleware: not installed, installed with
+sampling off, at 10 % and at 100 %, on the ingredient list page (served
+from the fragment cache after the first request) and on the uncached
+ingredient detail page of a popular ingredient.
+
+    python benchmarks/bench_metrics_middleware.py --requests 2000
+"""
+import argparse
+import statistics
+import time
+
+from common import percentile, seed, setup
+
+MIDDLEWARE = "recipe_project.middleware.MetricsMiddleware"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    setup()
+    seed(2000, 200)
+    from django.conf import settings
+    from django.test import Client, override_settings
+    from django.urls import reverse
+    from ingredients.models import Ingredient
+
+    without = [name for name in settings.MIDDLEWARE if name != MIDDLEWARE]
+    modes = [
+        ("not installed", without, 0),
+        ("rate 0", settings.MIDDLEWARE, 0),
+        ("rate 0.1", settings.MIDDLEWARE, 0.1),
+        ("rate 1", settings.MIDDLEWARE, 1.0),
+    ]
+    pk = Ingredient.objects.order_by("pk").values_list("pk", flat=True).first()
+    pages = [
+        ("ingredient list", reverse("ingredients:ingredient_list")),
+        # a new cache key every request: ?before= ids above every recipe
+        ("ingredient detail", reverse("ingredients:ingredient-detail", args=[pk])),
+    ]
+
+    before = 10 ** 9
+    for page, url in pages:
+        for label, middleware, rate in modes:
+            with override_settings(MIDDLEWARE=middleware, METRICS_SAMPLE_RATE=rate,
+                                   ALLOWED_HOSTS=["testserver"]):
+                client = Client()
+                client.get(url)
+                samples = []
+                for _ in range(args.requests):
+                    before += 1
+                    params = {"before": before} if page == "ingredient detail" else {}
+                    start = time.perf_counter()
+                    client.get(url, params)
+                    samples.append(time.perf_counter() - start)
+            print(f"{page:>17} {label:>13}: p50 {statistics.median(samples) * 1000:6.3f} ms"
+                  f"  p99 {percentile(samples, 99) * 1000:6.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Pantry search: GROUP BY over RecipeIngredient in SQL versus the in-memory
+inverted index, for a 10-ingredient pantry.
+
+    python benchmarks/bench_pantry.py --recipes 100000 --ingredients 2000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from common import percentile, seed, setup
+
+
+def measure(func, pantries):
+    samples = []
+    for pantry in pantries:
+        start = time.perf_counter()
+        func(pantry)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000, percentile(samples, 99) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--recipes", type=int, default=100000)
+    parser.add_argument("--ingredients", type=int, default=2000)
+    parser.add_argument("--per-recipe", type=int, default=5)
+    parser.add_argument("--pantry", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    setup()
+    seed(args.recipes, args.ingredients, args.per_recipe)
+    from django.db.models import Count, F
+    from recipes.pantry import index
+    from recipesingredients.models import RecipeIngredient
+
+    def database(pantry):
+        return list(RecipeIngredient.objects.filter(ingredient_id__in=pantry)
+                    .values("recipe").annotate(matched=Count("id"))
+                    .annotate(missing=F("recipe__ingredient_num") - F("matched"))
+                    .order_by("missing", "-matched", "recipe")[:50])
+
+    def in_memory(pantry):
+        recipe_ids, matched, missing = index.search(pantry)
+        return recipe_ids[:50]
+
+    rng = random.Random(1)
+    pantries = [rng.sample(range(1, args.ingredients + 1), args.pantry)
+                for _ in range(args.repeat)]
+    start = time.perf_counter()
+    index.build()
+    print(f"index build: {time.perf_counter() - start:.2f} s")
+    for label, func in [("SQL GROUP BY", database), ("inverted index", in_memory)]:
+        p50, p99 = measure(func, pantries)
+        print(f"{label:>15}: p50 {p50:8.2f} ms  p99 {p99:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
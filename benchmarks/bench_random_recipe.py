@@ -0,0 +1,59 @@
+"""
+Featured recipe pick on logout: ORDER BY RANDOM() versus
+Recipe.objects.random() as the recipe table grows.
+
+    python benchmarks/bench_random_recipe.py --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import statistics
+import time
+
+from common import percentile, setup
+
+
+def grow_to(size, user):
+    from recipes.models import Recipe
+    current = Recipe.objects.count()
+    batch = []
+    for i in range(current, size):
+        batch.append(Recipe(name=f"recipe-{i}", cooking_time=10,
+                            difficulty="Hard", created_by=user))
+        if len(batch) == 10000:
+            Recipe.objects.bulk_create(batch)
+            batch = []
+    Recipe.objects.bulk_create(batch)
+
+
+def measure(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000, percentile(samples, 99) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth.models import User
+    from recipes.models import Recipe
+
+    user = User.objects.create(username="bench")
+    print(f"{'recipes':>9}  {'order_by(?) p50/p99 ms':>24}  {'random() p50/p99 ms':>21}")
+    for size in args.sizes:
+        grow_to(size, user)
+        Recipe.objects.random()  # cache the id range
+        slow = measure(lambda: Recipe.objects.order_by("?").first(),
+                       max(3, args.repeat // 40))
+        fast = measure(Recipe.objects.random, args.repeat)
+        print(f"{size:>9}  {slow[0]:>13.2f} /{slow[1]:>8.2f}  {fast[0]:>10.3f} /{fast[1]:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Results table of the ingredient search: the old pandas path (DataFrame,
+row-wise apply, to_html) versus the recipes/recipe_table.html template.
+
+Every (renderer, size) pair runs in a fresh interpreter, so the reported
+RSS includes the renderer's own imports.
+
+    python benchmarks/bench_results_table.py --sizes 10 1000 100000
+"""
+import argparse
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+from common import setup
+
+
+def make_rows(size):
+    from recipes.search import RecipeRow
+    return [RecipeRow(i, f"Recipe <{i}> & co", i % 60, 5, "Easy")
+            for i in range(1, size + 1)]
+
+
+def render_pandas(rows):
+    import pandas as pd
+    df = pd.DataFrame(rows, columns=rows[0]._fields)
+    df["name"] = df.apply(
+        lambda row: f'<a href="/recipes/list/{row["id"]}">{row["name"]}</a>', axis=1)
+    df.rename(columns={
+        "name": "Recipe Name",
+        "cooking_time": "Cooking Time (min)",
+        "ingredient_num": "Ingredient Count",
+        "difficulty": "Difficulty"
+    }, inplace=True)
+    return df.to_html(index=False, classes="table table-striped", escape=False)
+
+
+def render_template(rows):
+    from django.template.loader import render_to_string
+    from recipes.search import recipe_table_rows
+    return render_to_string("recipes/recipe_table.html",
+                            {"recipe_rows": recipe_table_rows(rows)})
+
+
+def child(renderer, size, repeat):
+    setup(db_path=":memory:")
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    render = {"pandas": render_pandas, "template": render_template}[renderer]
+    rows = make_rows(size)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render(rows)
+        timings.append(time.perf_counter() - start)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        "first_ms": timings[0] * 1000,  # includes the import on first use
+        "median_ms": statistics.median(timings) * 1000,
+        "rss_mb": (peak - baseline) / 1024,  # ru_maxrss is in KiB on Linux
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--child", nargs=2, metavar=("RENDERER", "SIZE"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], int(args.child[1]), args.repeat)
+        return
+
+    print(f"{'rows':>8}  {'renderer':<10}{'first ms':>10}{'median ms':>11}{'+RSS MB':>9}")
+    for size in args.sizes:
+        for renderer in ("pandas", "template"):
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", renderer, str(size),
+                 "--repeat", str(args.repeat)],
+                check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{size:>8}  {renderer:<10}{result['first_ms']:>10.1f}"
+                  f"{result['median_ms']:>11.1f}{result['rss_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Similar recipes: signature build time, then an LSH bucket lookup versus
+comparing the recipe's signature with every other signature.
+
+    python benchmarks/bench_similar_recipes.py --recipes 100000
+"""
+import argparse
+import random
+import statistics
+import time
+from io import StringIO
+
+from common import percentile, seed, setup
+
+
+def measure(func, recipe_ids):
+    samples = []
+    for pk in recipe_ids:
+        start = time.perf_counter()
+        func(pk)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000, percentile(samples, 99) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--recipes", type=int, default=100000)
+    parser.add_argument("--ingredients", type=int, default=500)
+    parser.add_argument("--per-recipe", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    setup()
+    seed(args.recipes, args.ingredients, args.per_recipe)
+    import numpy as np
+    from django.core.management import call_command
+    from recipes.models import RecipeSignature
+    from recipes.similarity import similar_recipes
+
+    start = time.perf_counter()
+    call_command("build_recipe_signatures", stdout=StringIO())
+    print(f"build_recipe_signatures: {time.perf_counter() - start:.2f} s")
+
+    def brute_force(pk):
+        rows = list(RecipeSignature.objects.values_list("recipe_id", "signature"))
+        ids = np.array([row[0] for row in rows])
+        matrix = np.frombuffer(b"".join(bytes(row[1]) for row in rows),
+                               dtype=np.uint32).reshape(len(rows), -1)
+        scores = (matrix == matrix[ids == pk][0]).mean(axis=1)
+        return ids[np.argsort(-scores)[1:6]]
+
+    rng = random.Random(3)
+    recipe_ids = rng.sample(list(RecipeSignature.objects.values_list("recipe_id", flat=True)),
+                            args.repeat)
+    for label, func in [("all signatures", brute_force), ("LSH buckets", similar_recipes)]:
+        runs = recipe_ids if func is similar_recipes else recipe_ids[:5]
+        p50, p99 = measure(func, runs)
+        print(f"{label:>15}: p50 {p50:9.2f} ms  p99 {p99:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
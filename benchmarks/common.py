@@ -0,0 +1,83 @@
+"""
+Shared bootstrap for the benchmark scripts.
+
+Boots Django with the project settings on a throwaway SQLite database, so a
+benchmark never touches the configured MySQL server. Run the scripts from
+the repository root, e.g. `python benchmarks/bench_chart_rendering.py`.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def setup(db_path=None):
+    """Configure Django against a fresh SQLite file and run the migrations."""
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "recipe_project.settings")
+    os.environ.setdefault("DJANGO_SECRET_KEY", "benchmark-only")
+
+    import django
+    from django.conf import settings
+    from django.core.management import call_command
+
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="recipe-bench-"), "db.sqlite3")
+    settings.DATABASES["default"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": db_path,
+    }
+    django.setup()
+    call_command("migrate", verbosity=0)
+    return db_path
+
+
+def seed(recipes, ingredients, per_recipe=5, seed=42):
+    """Bulk-insert a synthetic catalog, returns the benchmark user."""
+    from django.contrib.auth.models import User
+    from ingredients.models import Ingredient
+    from recipes.models import Recipe
+    from recipesingredients.models import RecipeIngredient
+
+    rng = random.Random(seed)
+    user, _ = User.objects.get_or_create(username="bench")
+    Ingredient.objects.bulk_create(
+        [Ingredient(name=f"ingredient-{i}") for i in range(ingredients)],
+        batch_size=1000)
+    ingredient_ids = list(Ingredient.objects.values_list("id", flat=True))
+    difficulties = ["Easy", "Medium", "Intermediate", "Hard"]
+    Recipe.objects.bulk_create(
+        [Recipe(name=f"recipe-{i}", cooking_time=rng.randint(1, 60),
+                ingredient_num=per_recipe, difficulty=rng.choice(difficulties),
+                created_by=user)
+         for i in range(recipes)],
+        batch_size=1000)
+    links = []
+    for recipe_id in Recipe.objects.values_list("id", flat=True).iterator():
+        for ingredient_id in rng.sample(ingredient_ids, min(per_recipe, len(ingredient_ids))):
+            links.append(RecipeIngredient(
+                recipe_id=recipe_id, ingredient_id=ingredient_id, quantity="1"))
+        if len(links) >= 5000:
+            RecipeIngredient.objects.bulk_create(links)
+            links = []
+    RecipeIngredient.objects.bulk_create(links)
+    return user
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def timed(func, *args, **kwargs):
+    """Return `(result, seconds)` for one call."""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
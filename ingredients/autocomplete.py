@@ -0,0 +1,157 @@
+"""
+In-memory prefix index behind the ingredient autocomplete endpoint.
+
+Every ingredient is indexed under its full name and under each later word,
+so "oil" finds "Olive Oil". The keys live in one sorted list and a prefix
+is the bisect range `[prefix, prefix + "\\uffff")`. Candidates are ranked by
+the number of recipes using them.
+
+The index is built with one query on the first lookup and kept current by
+the model signals in ingredients/signals.py. Writes made by other processes
+are picked up by a full rebuild every INGREDIENT_AUTOCOMPLETE_TTL seconds.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db.models import Count
+
+from .models import Ingredient
+
+# prefix ranges wider than this are memoised until a write touches them
+MEMO_MIN_RANGE = 256
+
+
+def normalize(text):
+    return " ".join(text.casefold().split())
+
+
+def index_keys(name):
+    """Full name plus every suffix starting at a word boundary."""
+    words = normalize(name).split(" ")
+    return [" ".join(words[i:]) for i in range(len(words)) if words[i]]
+
+
+class PrefixIndex:
+    """Sorted `(key, ingredient id)` pairs with per-ingredient usage counts."""
+
+    def __init__(self):
+        self._keys = []
+        self._names = {}  # id -> name
+        self._usage = {}  # id -> number of recipes
+        self._memo = {}
+        self._built_at = None
+        self._lock = threading.RLock()
+
+    @property
+    def is_built(self):
+        return self._built_at is not None
+
+    def build(self):
+        """Load every ingredient and its recipe count with one query."""
+        rows = Ingredient.objects.annotate(
+            recipes=Count("recipeingredient")).values_list("id", "name", "recipes")
+        keys, names, usage = [], {}, {}
+        for pk, name, recipes in rows:
+            names[pk] = name
+            usage[pk] = recipes
+            keys.extend((key, pk) for key in index_keys(name))
+        keys.sort()
+        with self._lock:
+            self._keys, self._names, self._usage = keys, names, usage
+            self._memo = {}
+            self._built_at = time.monotonic()
+
+    def invalidate(self):
+        """Drop the index, the next lookup rebuilds it."""
+        with self._lock:
+            self._built_at = None
+
+    def _ensure_built(self):
+        ttl = settings.INGREDIENT_AUTOCOMPLETE_TTL
+        if self._built_at is None or time.monotonic() - self._built_at > ttl:
+            self.build()
+
+    def complete(self, prefix, limit=10):
+        """Return up to `limit` `(id, name, recipes)` tuples, most used first."""
+        prefix = normalize(prefix)
+        if not prefix or limit < 1:
+            return []
+        with self._lock:
+            self._ensure_built()
+            memo_key = (prefix, limit)
+            if memo_key in self._memo:
+                return self._memo[memo_key]
+
+            lo = bisect_left(self._keys, (prefix,))
+            hi = bisect_left(self._keys, (prefix + "\uffff",), lo)
+            candidates = {pk for _, pk in self._keys[lo:hi]}
+            ranked = heapq.nsmallest(
+                limit, candidates,
+                key=lambda pk: (-self._usage[pk], self._names[pk].casefold()))
+            result = [(pk, self._names[pk], self._usage[pk]) for pk in ranked]
+            if hi - lo > MEMO_MIN_RANGE:
+                self._memo[memo_key] = result
+            return result
+
+    # incremental updates from signals, ignored until the index is built
+
+    def add(self, pk, name):
+        with self._lock:
+            if not self.is_built:
+                return
+            self._remove_keys(pk)
+            self._names[pk] = name
+            self._usage.setdefault(pk, 0)
+            for key in index_keys(name):
+                insort(self._keys, (key, pk))
+            self._forget(name)
+
+    def update(self, pk, name, recipes):
+        """(Re)index one ingredient whose recipe count is known."""
+        with self._lock:
+            if not self.is_built:
+                return
+            if self._names.get(pk) != name:
+                self.add(pk, name)
+            self._usage[pk] = recipes
+            self._forget(name)
+
+    def remove(self, pk):
+        with self._lock:
+            if not self.is_built:
+                return
+            self._remove_keys(pk)
+            self._names.pop(pk, None)
+            self._usage.pop(pk, None)
+
+    def adjust_usage(self, pk, delta):
+        with self._lock:
+            if not self.is_built or pk not in self._usage:
+                return
+            self._usage[pk] = max(0, self._usage[pk] + delta)
+            self._forget(self._names[pk])
+
+    def _remove_keys(self, pk):
+        name = self._names.get(pk)
+        if name is None:
+            return
+        for key in index_keys(name):
+            i = bisect_left(self._keys, (key, pk))
+            if i < len(self._keys) and self._keys[i] == (key, pk):
+                del self._keys[i]
+        self._forget(name)
+
+    def _forget(self, name):
+        """Drop memoised results of the prefixes that match `name`."""
+        keys = index_keys(name)
+        self._memo = {
+            (prefix, limit): result
+            for (prefix, limit), result in self._memo.items()
+            if not any(key.startswith(prefix) for key in keys)
+        }
+
+
+index = PrefixIndex()
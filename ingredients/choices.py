@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from recipes.cache import get_tag_version, invalidate_tags
+from .models import Ingredient
+
+# cache tag of everything showing several ingredients
+CATALOG_TAG = "ingredients"
+
+
+def get_catalog_version():
+    """Version stamp of the ingredient catalog (names and rows)."""
+    return get_tag_version(CATALOG_TAG)
+
+
+def bump_catalog_version():
+    """Call after writes that bypass Ingredient signals, e.g. bulk_create."""
+    invalidate_tags(CATALOG_TAG)
+
+
+class IngredientChoices:
+    """Read-only picker data: `(id, name)` pairs plus lookups by id and name."""
+
+    def __init__(self, pairs):
+        self.pairs = pairs
+        self.by_id = {str(pk): (pk, name) for pk, name in pairs}
+        self.by_name = {name.lower(): (pk, name) for pk, name in pairs}
+
+    def __len__(self):
+        return len(self.pairs)
+
+
+def get_ingredient_choices():
+    """
+    IngredientChoices of every ingredient, ordered by name.
+
+    Loaded with one query, cached across requests until an ingredient is
+    saved or deleted, and shared by all forms of a formset. The version is
+    bumped in the writing process's cache only, so entries also expire after
+    INGREDIENT_CHOICES_TTL seconds for the other processes.
+    """
+    key = f"ingredients:choices:{get_catalog_version()}"
+    choices = cache.get(key)
+    if choices is None:
+        choices = IngredientChoices(list(
+            Ingredient.objects.order_by("name").values_list("id", "name")))
+        cache.set(key, choices, settings.INGREDIENT_CHOICES_TTL)
+    return choices
@@ -0,0 +1,200 @@
+"""
+Typo tolerant ingredient name lookup.
+
+Names are split into padded character trigrams ("  to", " to", "tom", ...)
+and a trigram -> ingredient slots index is kept in process memory. A lookup
+counts the trigrams every name shares with the query in one numpy bincount;
+k edits change at most 4k trigrams of the query (3 per insertion, deletion
+or substitution, 4 per swap of adjacent characters), so names sharing fewer
+cannot be within k edits and are never compared. The remaining candidates
+are verified with an edit distance computed only inside a band of width k.
+
+Like the autocomplete index the trigram index is built on first use, kept
+current by the signals in ingredients/signals.py and rebuilt every
+INGREDIENT_AUTOCOMPLETE_TTL seconds.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+from .autocomplete import normalize
+from .models import Ingredient
+
+# candidates verified per lookup, the ones sharing most trigrams first
+MAX_VERIFY = 64
+
+# length of a removed slot, never within max_distance() of a query
+REMOVED = -(1 << 20)
+
+Match = namedtuple("Match", "id name distance")
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_distance(text):
+    """Edits tolerated for a query: 1 up to 4 characters, at most 3."""
+    return max(1, min(3, len(text) // 4))
+
+
+def bounded_levenshtein(a, b, k):
+    """
+    Edit distance of `a` and `b`, counting a swap of two adjacent characters
+    as one edit, or k + 1 as soon as it must exceed k.
+    """
+    if abs(len(a) - len(b)) > k:
+        return k + 1
+    if len(a) > len(b):
+        a, b = b, a
+    over = k + 1
+    before = None
+    previous = [j if j <= k else over for j in range(len(b) + 1)]
+    for i, char in enumerate(a, 1):
+        current = [over] * (len(b) + 1)
+        if i <= k:
+            current[0] = i
+        lo, hi = max(1, i - k), min(len(b), i + k)
+        for j in range(lo, hi + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1,
+                             previous[j - 1] + (char != b[j - 1]))
+            if before and j > 1 and char == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current[lo - 1:hi + 1]) > k:
+            return over
+        before, previous = previous, current
+    return min(previous[len(b)], over)
+
+
+class FuzzyIndex:
+    """Trigram postings over normalized ingredient names."""
+
+    def __init__(self):
+        self._postings = {}  # trigram -> numpy array of slots
+        self._slots = []  # slot -> (id, name, normalized name), names None once removed
+        self._lengths = None  # slot -> len(normalized name) or REMOVED
+        self._exact = {}  # normalized name -> slot
+        self._by_id = {}  # id -> slot
+        self._built_at = None
+        self._lock = threading.RLock()
+
+    @property
+    def is_built(self):
+        return self._built_at is not None
+
+    def build(self):
+        """Load every ingredient name with one query."""
+        import numpy as np
+
+        slots, postings, exact, by_id = [], {}, {}, {}
+        for pk, name in Ingredient.objects.values_list("id", "name"):
+            key = normalize(name)
+            slot = len(slots)
+            slots.append((pk, name, key))
+            exact[key] = by_id[pk] = slot
+            for gram in trigrams(key):
+                postings.setdefault(gram, []).append(slot)
+        with self._lock:
+            self._slots, self._exact, self._by_id = slots, exact, by_id
+            self._postings = {gram: np.array(found, dtype=np.int32)
+                              for gram, found in postings.items()}
+            self._lengths = np.array([len(key) for _, _, key in slots], dtype=np.int32)
+            self._built_at = time.monotonic()
+
+    def invalidate(self):
+        """Drop the index, the next lookup rebuilds it."""
+        with self._lock:
+            self._built_at = None
+
+    def _ensure_built(self):
+        ttl = settings.INGREDIENT_AUTOCOMPLETE_TTL
+        if self._built_at is None or time.monotonic() - self._built_at > ttl:
+            self.build()
+
+    def canonical(self, name):
+        """The stored spelling of `name` ignoring case and spacing, or None."""
+        with self._lock:
+            self._ensure_built()
+            slot = self._exact.get(normalize(name))
+            return None if slot is None else self._slots[slot][1]
+
+    def lookup(self, name, limit=5):
+        """
+        Up to `limit` Match tuples within max_distance() edits of `name`,
+        closest first. A distance of 0 is a case-insensitive exact match.
+        """
+        import numpy as np
+
+        query = normalize(name)
+        if not query:
+            return []
+        k = max_distance(query)
+        with self._lock:
+            self._ensure_built()
+            if query in self._exact:
+                pk, stored, _ = self._slots[self._exact[query]]
+                return [Match(pk, stored, 0)]
+
+            grams = trigrams(query)
+            lists = [self._postings[gram] for gram in grams if gram in self._postings]
+            if not lists:
+                return []
+            shared = np.bincount(np.concatenate(lists), minlength=len(self._slots))
+            close = np.abs(self._lengths - len(query)) <= k
+            candidates = np.flatnonzero(close & (shared >= max(1, len(grams) - 4 * k)))
+            if len(candidates) > MAX_VERIFY:
+                best = np.argpartition(-shared[candidates], MAX_VERIFY)[:MAX_VERIFY]
+                candidates = candidates[best]
+
+            matches = []
+            for slot in candidates:
+                pk, stored, key = self._slots[slot]
+                distance = bounded_levenshtein(query, key, k)
+                if distance <= k:
+                    matches.append((distance, -int(shared[slot]), key, Match(pk, stored, distance)))
+        matches.sort()
+        return [match for *_, match in matches[:limit]]
+
+    # incremental updates from signals, ignored until the index is built
+
+    def add(self, pk, name):
+        import numpy as np
+
+        with self._lock:
+            if not self.is_built:
+                return
+            slot = self._by_id.get(pk)
+            if slot is not None and self._slots[slot][1] == name:
+                return  # saved without a rename
+            self._remove(pk)
+            key = normalize(name)
+            slot = len(self._slots)
+            self._slots.append((pk, name, key))
+            self._exact[key] = self._by_id[pk] = slot
+            self._lengths = np.append(self._lengths, np.int32(len(key)))
+            for gram in trigrams(key):
+                found = self._postings.get(gram)
+                self._postings[gram] = (np.array([slot], dtype=np.int32) if found is None
+                                        else np.append(found, np.int32(slot)))
+
+    def remove(self, pk):
+        with self._lock:
+            if self.is_built:
+                self._remove(pk)
+
+    def _remove(self, pk):
+        # the slot stays in the postings, its length filters it out
+        slot = self._by_id.pop(pk, None)
+        if slot is None:
+            return
+        key = self._slots[slot][2]
+        if self._exact.get(key) == slot:
+            del self._exact[key]
+        self._slots[slot] = (pk, None, None)
+        self._lengths[slot] = REMOVED
+
+
+index = FuzzyIndex()
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.19 on 2026-10-18 19:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingredients', '0003_ingredient_introduction'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='pic_hash',
+            field=models.CharField(blank=True, editable=False, help_text='Content hash of pic, set once its thumbnails exist', max_length=16),
+        ),
+    ]
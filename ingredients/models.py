@@ -1,15 +1,27 @@
 from django.db import models
 from django.shortcuts import reverse
 
+from recipes.cache import bump_data_version
+
 
 class Ingredient(models.Model):
     name = models.CharField(max_length=120, unique=True,
                             db_index=True)
     introduction = models.TextField(blank=True, null=True)
     pic = models.ImageField(upload_to='ingredients', default='no_picture.jpg')
+    pic_hash = models.CharField(
+        max_length=16, blank=True, editable=False,
+        help_text="Content hash of pic, set once its thumbnails exist")
 
     def __str__(self):
         return self.name
-    
+
+    def save(self, *args, **kwargs):
+        """ ingredient names are part of cached searches and charts """
+        if not self.pic._committed:
+            self.pic_hash = ""  # new upload, thumbnails are made after commit
+        super().save(*args, **kwargs)
+        bump_data_version()
+
     def get_absolute_url(self):
        return reverse ('ingredients:ingredient-detail', kwargs={'pk': self.pk})
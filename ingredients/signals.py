@@ -0,0 +1,73 @@
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.cache import bump_data_version, invalidate_tags
+from recipes.thumbnails import schedule as schedule_thumbnails, thumbnails_ready
+from recipesingredients.models import RecipeIngredient
+from recipesingredients.signals import ingredients_added
+from . import autocomplete, fuzzy
+from .choices import bump_catalog_version
+from .models import Ingredient
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, **kwargs):
+    """ cached ingredient choices are out of date """
+    bump_catalog_version()
+    invalidate_tags(f"ingredient:{instance.pk}")
+    autocomplete.index.add(instance.pk, instance.name)
+    fuzzy.index.add(instance.pk, instance.name)
+    if not instance.pic_hash:
+        schedule_thumbnails(Ingredient, instance.pk)
+
+
+@receiver(thumbnails_ready, sender=Ingredient)
+def ingredient_thumbnails_ready(sender, pks, **kwargs):
+    """ cached ingredient pages still point at the full-size pictures """
+    bump_catalog_version()
+    invalidate_tags(*(f"ingredient:{pk}" for pk in pks))
+
+
+@receiver(post_delete, sender=Ingredient)
+def ingredient_deleted(sender, instance, **kwargs):
+    """ cached searches and charts may name it """
+    bump_data_version()
+    bump_catalog_version()
+    invalidate_tags(f"ingredient:{instance.pk}")
+    autocomplete.index.remove(instance.pk)
+    fuzzy.index.remove(instance.pk)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def recipe_ingredient_saved(sender, instance, created, **kwargs):
+    """ autocomplete ranks ingredients by the number of recipes using them """
+    invalidate_tags(f"ingredient:{instance.ingredient_id}")  # its related recipes
+    previous = getattr(instance, "previous_ids", None)
+    if not created and previous and previous[1] != instance.ingredient_id:
+        invalidate_tags(f"ingredient:{previous[1]}")
+        autocomplete.index.adjust_usage(previous[1], -1)
+        created = True  # one more recipe for the new ingredient
+    if created:
+        autocomplete.index.adjust_usage(instance.ingredient_id, 1)
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_deleted(sender, instance, **kwargs):
+    invalidate_tags(f"ingredient:{instance.ingredient_id}")
+    autocomplete.index.adjust_usage(instance.ingredient_id, -1)
+
+
+@receiver(ingredients_added)
+def recipe_ingredients_bulk_added(sender, recipe, **kwargs):
+    """
+    bulk_create() sent no signal for the new ingredients and links: index
+    the recipe's ingredients with their recipe counts, read in one query.
+    """
+    rows = Ingredient.objects.filter(pk__in=RecipeIngredient.objects.filter(
+        recipe=recipe).values("ingredient_id")).annotate(
+        recipes=Count("recipeingredient")).values_list("id", "name", "recipes")
+    for pk, name, recipes in rows:
+        invalidate_tags(f"ingredient:{pk}")
+        autocomplete.index.update(pk, name, recipes)
+        fuzzy.index.add(pk, name)
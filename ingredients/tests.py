@@ -1,8 +1,14 @@
+from unittest import mock
+
 from django.test import TestCase
 from django.urls import reverse
+from django.contrib.auth.models import User
+from ingredients import fuzzy
+from ingredients.autocomplete import index
 from ingredients.models import Ingredient
 from ingredients.forms import IngredientForm
 from recipesingredients.models import RecipeIngredient
+from recipes.models import Recipe
 
 
 class IngredientModelTest(TestCase):
@@ -83,3 +89,219 @@ class IngredientViewsTest(TestCase):
         }
         form = IngredientForm(data=form_data)
         self.assertFalse(form.is_valid())  # Expecting validation to fail
+
+
+class IngredientListPaginationTest(TestCase):
+    def setUp(self):
+        for name in ["Basil", "Apple", "Carrot", "Avocado", "Butter"]:
+            Ingredient.objects.create(name=name)
+        self.url = reverse("ingredients:ingredient_list")
+
+    def names(self, response):
+        return [ingredient.name for ingredient in response.context["object_list"]]
+
+    def get(self, **params):
+        with mock.patch("ingredients.views.IngredientListView.paginate_by", 2):
+            return self.client.get(self.url, params)
+
+    def test_keyset_pages_and_anchors(self):
+        """Test if cursors and A-Z anchors page through the names in order."""
+        response = self.get()
+        self.assertEqual(self.names(response), ["Apple", "Avocado"])
+        response = self.get(cursor=response.context["page_obj"].next_cursor)
+        self.assertEqual(self.names(response), ["Basil", "Butter"])
+        self.assertEqual(self.names(self.get(start="c")), ["Carrot"])
+        self.assertContains(response, '?start=Z')
+        self.assertEqual(self.get(cursor="not-a-cursor").status_code, 404)
+
+    def test_page_cached_until_catalog_changes(self):
+        """Test if a page is served from the cache until an ingredient is written."""
+        self.get()
+        with self.assertNumQueries(0):
+            response = self.get()
+        self.assertContains(response, "Avocado")
+        self.assertNotContains(response, "Almond")
+
+        Ingredient.objects.create(name="Almond")
+        self.assertContains(self.get(), "Almond")
+
+
+class IngredientRelatedRecipesTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cook", password="pw")
+        self.salt = Ingredient.objects.create(name="Salt")
+        self.recipes = []
+        for i in range(5):
+            recipe = Recipe.objects.create(name=f"Salty {i}", cooking_time=5,
+                                           created_by=self.user)
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=self.salt,
+                                            quantity=f"{i} g")
+            self.recipes.append(recipe)
+        self.url = reverse("ingredients:ingredient-detail", kwargs={"pk": self.salt.pk})
+
+    def get(self, **params):
+        with mock.patch("ingredients.views.IngredientDetailView.related_page_size", 2):
+            return self.client.get(self.url, params)
+
+    def test_query_count_does_not_grow(self):
+        """Test if the detail page is two queries however many recipes use the ingredient."""
+        # the ingredient, then one joined query for the recipes
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertContains(response, "Salty 4")
+        self.assertContains(response, "(4 g)")
+
+    def test_keyset_pages(self):
+        """Test if ?before= pages walk the related recipes newest first."""
+        response = self.get()
+        self.assertEqual([r.name for r in response.context["recipes"]], ["Salty 4", "Salty 3"])
+        self.assertTrue(response.context["is_first_page"])
+
+        response = self.get(before=response.context["next_before"])
+        self.assertEqual([r.name for r in response.context["recipes"]], ["Salty 2", "Salty 1"])
+        self.assertFalse(response.context["is_first_page"])
+
+        with self.assertNumQueries(2):
+            response = self.get(before=response.context["next_before"])
+        self.assertEqual([r.name for r in response.context["recipes"]], ["Salty 0"])
+        self.assertIsNone(response.context["next_before"])
+        self.assertNotContains(response, "Older Recipes")
+
+    def test_page_cached_until_links_or_recipes_change(self):
+        """Test if the cached page is replaced after link, recipe and ingredient writes."""
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+            self.client.get(self.url, {"before": "x"})  # same first page
+        self.assertContains(response, "Salty 4")
+
+        recipe = Recipe.objects.create(name="Brine", cooking_time=1, created_by=self.user)
+        RecipeIngredient.objects.create(recipe=recipe, ingredient=self.salt, quantity="1 kg")
+        self.assertContains(self.client.get(self.url), "Brine")
+        recipe.name = "Pickle brine"
+        recipe.save()
+        self.assertContains(self.client.get(self.url), "Pickle brine")
+        self.salt.introduction = "Sodium chloride"
+        self.salt.save()
+        self.assertContains(self.client.get(self.url), "Sodium chloride")
+
+
+class IngredientAutocompleteTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cook", password="pw")
+        self.olive_oil = Ingredient.objects.create(name="Olive Oil")
+        self.onion = Ingredient.objects.create(name="Onion")
+        self.oregano = Ingredient.objects.create(name="Oregano")
+        for i in range(2):
+            recipe = Recipe.objects.create(name=f"Recipe {i}", cooking_time=5,
+                                           created_by=self.user)
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=self.onion,
+                                            quantity="1")
+        index.invalidate()
+
+    def names(self, prefix, **params):
+        response = self.client.get(reverse("ingredients:autocomplete"),
+                                   {"q": prefix, **params})
+        self.assertEqual(response.status_code, 200)
+        return [item["name"] for item in response.json()["results"]]
+
+    def test_ranked_by_recipe_usage(self):
+        """Test if completions are case-insensitive and the most used come first."""
+        self.assertEqual(self.names("O"), ["Onion", "Olive Oil", "Oregano"])
+        self.assertEqual(self.names("o", limit=1), ["Onion"])
+        self.assertEqual(self.names("ore"), ["Oregano"])
+
+    def test_matches_later_words(self):
+        """Test if a prefix of a later word in the name matches."""
+        self.assertEqual(self.names("oil"), ["Olive Oil"])
+        self.assertEqual(self.names(""), [])
+
+    def test_no_queries_once_built(self):
+        """Test if keystrokes are served from memory."""
+        self.names("o")
+        with self.assertNumQueries(0):
+            index.complete("on")
+
+    def test_kept_current_by_signals(self):
+        """Test if created, renamed, deleted and newly used ingredients show up."""
+        index.complete("o")  # build
+        olives = Ingredient.objects.create(name="Olives")
+        self.assertIn("Olives", self.names("oli"))
+        olives.name = "Black Olives"
+        olives.save()
+        self.assertEqual(self.names("black"), ["Black Olives"])
+        self.assertNotIn("Olives", self.names("oli"))
+        self.oregano.delete()
+        self.assertEqual(self.names("ore"), [])
+        recipe = Recipe.objects.first()
+        for ingredient in (self.olive_oil, olives):
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=ingredient,
+                                            quantity="1")
+        RecipeIngredient.objects.create(recipe=Recipe.objects.last(),
+                                        ingredient=olives, quantity="1")
+        self.assertEqual(self.names("o")[:2], ["Black Olives", "Onion"])
+
+    def test_bulk_add_is_incremental(self):
+        """Test if the bulk write path indexes its ingredients without a rebuild."""
+        index.complete("o")
+        fuzzy.index.lookup("onion")
+        RecipeIngredient.objects.add_to_recipe(
+            Recipe.objects.first(), [("Okra", "1"), ("Oregano", "1")])
+        okra = Ingredient.objects.get(name="Okra")
+        with self.assertNumQueries(0):
+            self.assertEqual(index.complete("o"), [
+                (self.onion.pk, "Onion", 2), (okra.pk, "Okra", 1),
+                (self.oregano.pk, "Oregano", 1), (self.olive_oil.pk, "Olive Oil", 0)])
+            self.assertEqual(fuzzy.index.lookup("okrra")[0].name, "Okra")
+
+    def test_memoised_prefix_follows_usage(self):
+        """Test if a memoised wide prefix is re-ranked after a usage change."""
+        with mock.patch("ingredients.autocomplete.MEMO_MIN_RANGE", 0):
+            self.assertEqual(self.names("o")[0], "Onion")
+            for recipe in Recipe.objects.all():
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=self.oregano, quantity="1")
+            recipe = Recipe.objects.create(name="Pizza", cooking_time=5, created_by=self.user)
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=self.oregano,
+                                            quantity="1")
+            self.assertEqual(self.names("o")[0], "Oregano")
+
+
+class FuzzyIngredientTest(TestCase):
+    def setUp(self):
+        for name in ["Tomato", "Potato", "Cherry Tomato", "Tomatillo", "Basil"]:
+            Ingredient.objects.create(name=name)
+        fuzzy.index.invalidate()
+
+    def names(self, query):
+        return [match.name for match in fuzzy.index.lookup(query)]
+
+    def test_bounded_levenshtein(self):
+        """Test if the banded distance matches the full one up to the bound."""
+        pairs = [("tomatoe", "tomato", 1), ("kitten", "sitting", 3),
+                 ("basil", "basil", 0), ("", "abc", 3), ("flour", "flower", 2),
+                 ("onoin", "onion", 1)]
+        for a, b, distance in pairs:
+            self.assertEqual(fuzzy.bounded_levenshtein(a, b, 3), distance)
+            self.assertEqual(fuzzy.bounded_levenshtein(b, a, 1), min(distance, 2))
+
+    def test_typos_and_case(self):
+        """Test if typos find the closest names and case is ignored."""
+        self.assertEqual(self.names("tomatoe")[0], "Tomato")
+        self.assertEqual(self.names("TOMATO"), ["Tomato"])
+        self.assertEqual(fuzzy.index.lookup("tomato")[0].distance, 0)
+        self.assertEqual(self.names("cherry tomatos"), ["Cherry Tomato"])
+        self.assertEqual(self.names("xyzzy"), [])
+
+    def test_kept_current_by_signals(self):
+        """Test if created, renamed and deleted names are picked up."""
+        self.names("basil")  # build
+        Ingredient.objects.create(name="Oregano")
+        self.assertEqual(self.names("oregan"), ["Oregano"])
+        basil = Ingredient.objects.get(name="Basil")
+        basil.name = "Thai Basil"
+        basil.save()
+        self.assertEqual(fuzzy.index.canonical("thai basil"), "Thai Basil")
+        self.assertIsNone(fuzzy.index.canonical("basil"))
+        basil.delete()
+        self.assertEqual(self.names("thai basl"), [])
@@ -1,5 +1,6 @@
 from django.urls import path
 from .views import IngredientListView, IngredientDetailView, IngredientCreateView
+from .views import ingredient_autocomplete
 
 app_name = 'ingredients'
 
@@ -7,4 +8,5 @@ urlpatterns = [
     path('list/', IngredientListView.as_view(), name='ingredient_list'),
     path('list/<pk>', IngredientDetailView.as_view(), name='ingredient-detail'),
     path('add/', IngredientCreateView.as_view(), name='add_ingredient'),
+    path('autocomplete/', ingredient_autocomplete, name='autocomplete'),
 ]
\ No newline at end of file
@@ -1,4 +1,10 @@
+import string
+from collections import namedtuple
+
+from django.core.paginator import InvalidPage
 from django.shortcuts import render
+from django.http import Http404, JsonResponse
+from django.template.loader import render_to_string
 from django.views.generic import ListView, DetailView, CreateView   #to display lists and details
 from django.shortcuts import redirect
 from .models import Ingredient               #to access Ingredient model
@@ -6,22 +12,124 @@ from .models import Ingredient               #to access Ingredient model
 from .forms import IngredientForm
 from django.urls import reverse_lazy
 
+from recipes.cache import CachePolicy
+from recipes.pagination import KeysetPaginator
 from recipesingredients.models import RecipeIngredient
+from .autocomplete import index
 
 # Create your views here.
 class IngredientListView(ListView):           #class-based view
-   model = Ingredient                         #specify model
-   template_name = 'ingredients/list.html'    #specify template 
+    model = Ingredient                         #specify model
+    template_name = 'ingredients/list.html'    #specify template
+    fragment_template_name = 'ingredients/list_body.html'
+    # any ingredient write drops every page
+    cache_policy = CachePolicy("ingredient_list", "INGREDIENT_LIST_FRAGMENT_TTL",
+                               tags=("ingredients",))
+    paginate_by = 24
+    ordering = ("name",)  # unique and indexed, so it can be used as a cursor
+
+    def start_letter(self):
+        return self.request.GET.get("start", "")[:1].upper()
+
+    def get_queryset(self):
+        # only the columns the cards render
+        queryset = Ingredient.objects.only("id", "name", "pic", "pic_hash")
+        start = self.start_letter()
+        if start:
+            # A-Z anchors: the first page of names from that letter on
+            queryset = queryset.filter(name__gte=start)
+        return queryset
+
+    def paginate_queryset(self, queryset, page_size):
+        """Keyset pagination: ?cursor=<token> instead of ?page=<n>"""
+        paginator = KeysetPaginator(queryset, self.get_ordering(), page_size)
+        try:
+            page = paginator.page(self.request.GET.get("cursor"))
+        except InvalidPage as e:
+            raise Http404(str(e))
+        return (paginator, page, page.object_list, page.has_next)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["letters"] = string.ascii_uppercase
+        return context
+
+    def get(self, request, *args, **kwargs):
+        """
+        Serve the rendered page of cards from the cache when possible. Any
+        ingredient write bumps the catalog version, which drops every page.
+        """
+        key = self.cache_policy.key(
+            "{}|{}".format(self.start_letter(), self.request.GET.get("cursor", "")))
+        body = self.cache_policy.get(key)
+        if body is None:
+            self.object_list = self.get_queryset()
+            body = render_to_string(self.fragment_template_name, self.get_context_data())
+            self.cache_policy.set(key, body)
+        return render(request, self.template_name, {"body": body})
+
+RelatedRecipe = namedtuple("RelatedRecipe", "id name quantity")
+
 
 class IngredientDetailView(DetailView):  # class-based view
     model = Ingredient  # specify model
     template_name = 'ingredients/detail.html'  # specify template
+    fragment_template_name = 'ingredients/detail_body.html'
+    # the ingredient tag covers its links, the recipes tag renamed recipes
+    cache_policy = CachePolicy("ingredient_detail", "INGREDIENT_FRAGMENT_TTL",
+                               tags=("ingredient:{pk}", "recipes"))
+    related_page_size = 20
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["recipes"] = RecipeIngredient.objects.filter(
-            ingredient=self.object)
+        context.update(self.related_recipes())
         return context
+
+    def related_recipes(self):
+        """
+        One page of the recipes using this ingredient, newest first.
+
+        A single RecipeIngredient JOIN Recipe query reading three columns.
+        Pages are keyed by the last recipe id shown (?before=<id>) instead of
+        an OFFSET, so a late page of a popular ingredient costs the same as
+        the first one; one extra row tells whether there is a next page.
+        """
+        links = RecipeIngredient.objects.filter(ingredient=self.object)
+        before = self.before()
+        if before is not None:
+            links = links.filter(recipe_id__lt=before)
+        rows = [RelatedRecipe(*row) for row in links.order_by("-recipe_id").values_list(
+            "recipe_id", "recipe__name", "quantity")[:self.related_page_size + 1]]
+        recipes = rows[:self.related_page_size]
+        return {
+            "recipes": recipes,
+            "is_first_page": before is None,
+            "next_before": recipes[-1].id if len(rows) > len(recipes) else None,
+        }
+
+    def before(self):
+        """ the ?before= recipe id as an int, None on the first page """
+        before = self.request.GET.get("before", "")
+        return int(before) if before.isdigit() else None
+
+    def get(self, request, *args, **kwargs):
+        """ serve the rendered ingredient and page of recipes from the cache """
+        pk = str(self.kwargs[self.pk_url_kwarg])
+        if not pk.isdigit():
+            raise Http404("No ingredient found matching the query")
+        # ?before=007 and ?before=x share the entries of 7 and the first page
+        before = self.before()
+        key = self.cache_policy.key("" if before is None else before, pk=pk)
+        fragment = self.cache_policy.get(key)
+        if fragment is None:
+            self.object = self.get_object()
+            fragment = {
+                "title": self.object.name,
+                "body": render_to_string(self.fragment_template_name,
+                                         self.get_context_data(object=self.object)),
+            }
+            self.cache_policy.set(key, fragment)
+        return render(request, self.template_name, fragment)
     
 
 class IngredientCreateView(CreateView):
@@ -33,3 +141,19 @@ class IngredientCreateView(CreateView):
         """store new ingredient and go back to Recipe add ingredient page"""
         self.object = form.save()
         return redirect(reverse_lazy('recipes:recipe_add_ingredients', kwargs={'recipe_id': self.request.GET.get('recipe_id', 1)}))
+
+
+AUTOCOMPLETE_MAX_LIMIT = 25
+
+
+def ingredient_autocomplete(request):
+    """JSON completions for ?q=<prefix>&limit=<n>, served from memory"""
+    try:
+        limit = min(int(request.GET.get("limit", 10)), AUTOCOMPLETE_MAX_LIMIT)
+    except ValueError:
+        limit = 10
+    results = [
+        {"id": pk, "name": name, "recipes": recipes}
+        for pk, name, recipes in index.complete(request.GET.get("q", ""), limit)
+    ]
+    return JsonResponse({"results": results})
@@ -0,0 +1,18 @@
+"""
+MySQL backend with an in-process connection pool, see recipe_project/db/pool.py.
+
+    ENGINE = "recipe_project.db.mysql"
+"""
+from django.db.backends.mysql import base
+
+from ..pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    def pool_is_usable(self, connection):
+        # one round trip, no statement to parse
+        try:
+            connection.ping()
+        except base.Database.Error:
+            return False
+        return True
@@ -0,0 +1,143 @@
+"""
+In-process connection pool for Django database backends.
+
+Django 4.2 either opens a connection per request (CONN_MAX_AGE = 0) or
+keeps one per thread (CONN_MAX_AGE > 0), so threads that come and go, like
+the thumbnail pool or an ASGI server's sync threads, still pay a TCP and
+auth handshake each. With PooledDatabaseWrapperMixin closing a connection
+hands the DB-API connection back to a small per-process pool and the next
+connect() of any thread takes it from there, skipping the handshake and the
+session setup queries.
+
+A connection is only pooled if it is in a clean state: outside atomic
+blocks, in the configured autocommit mode and without unrecovered errors.
+Connections idle for longer than CHECK_AFTER seconds are pinged before
+reuse, those idle for longer than MAX_IDLE are dropped.
+
+Configured per database with a "POOL" entry:
+
+    "POOL": {"SIZE": 4, "MAX_IDLE": 300, "CHECK_AFTER": 5}
+"""
+import os
+import threading
+import time
+
+DEFAULTS = {"SIZE": 4, "MAX_IDLE": 300, "CHECK_AFTER": 5}
+
+
+class ConnectionPool:
+    """LIFO stack of idle DB-API connections, most recently used first."""
+
+    def __init__(self, size, max_idle, check_after):
+        self.size = size
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self._idle = []  # (connection, returned at)
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return `(connection, seconds idle)` or `(None, None)`."""
+        expired = []
+        try:
+            with self._lock:
+                while self._idle:
+                    connection, returned_at = self._idle.pop()
+                    idle = time.monotonic() - returned_at
+                    if idle <= self.max_idle:
+                        return connection, idle
+                    expired.append(connection)
+                return None, None
+        finally:
+            for connection in expired:
+                discard(connection)
+
+    def put(self, connection):
+        """Keep `connection` for reuse, False if the pool is full."""
+        with self._lock:
+            if len(self._idle) >= self.size:
+                return False
+            self._idle.append((connection, time.monotonic()))
+            return True
+
+    def clear(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            discard(connection)
+
+    def __len__(self):
+        return len(self._idle)
+
+
+def discard(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass  # already broken, nothing to give back
+
+
+_pools = {}
+_pools_pid = None
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, options):
+    """The pool of a database alias in this process."""
+    global _pools, _pools_pid
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # connections inherited through fork() share their sockets with
+            # the parent, forget them without closing
+            _pools, _pools_pid = {}, os.getpid()
+        pool = _pools.get(alias)
+        if pool is None:
+            options = {**DEFAULTS, **options}
+            pool = _pools[alias] = ConnectionPool(
+                options["SIZE"], options["MAX_IDLE"], options["CHECK_AFTER"])
+        return pool
+
+
+class PooledDatabaseWrapperMixin:
+    """Mix in before a backend's DatabaseWrapper to pool its connections."""
+
+    reused_connection = False
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict.get("POOL", {}))
+
+    def pool_is_usable(self, connection):
+        """Cheap liveness check of an idle DB-API connection."""
+        try:
+            connection.cursor().execute("SELECT 1")
+        except Exception:
+            return False
+        return True
+
+    def get_new_connection(self, conn_params):
+        while True:
+            connection, idle = self.pool.get()
+            if connection is None:
+                break
+            if idle < self.pool.check_after or self.pool_is_usable(connection):
+                self.reused_connection = True
+                return connection
+            discard(connection)
+        self.reused_connection = False
+        return super().get_new_connection(conn_params)
+
+    def init_connection_state(self):
+        # session settings survive in a pooled connection
+        if not self.reused_connection:
+            super().init_connection_state()
+
+    def _close(self):
+        clean = (
+            self.connection is not None
+            and not self.in_atomic_block
+            and not self.errors_occurred
+            and self.autocommit == self.settings_dict["AUTOCOMMIT"]
+        )
+        if clean and self.pool.put(self.connection):
+            return
+        return super()._close()
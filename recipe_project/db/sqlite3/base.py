@@ -0,0 +1,13 @@
+"""
+SQLite backend with the connection pool, a local stand-in for the pooled
+MySQL backend in tests and benchmarks.
+
+    ENGINE = "recipe_project.db.sqlite3"
+"""
+from django.db.backends.sqlite3 import base
+
+from ..pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    pass
@@ -0,0 +1,16 @@
+from django.db import connections
+
+
+def upsert_options(queryset, unique_fields, update_fields):
+    """
+    bulk_create() keyword arguments turning conflicts on `unique_fields`
+    into updates of `update_fields`.
+
+    MySQL's ON DUPLICATE KEY UPDATE takes no conflict target, it fires on
+    any unique key, and Django raises NotSupportedError when one is given
+    there, so `unique_fields` is only passed to backends that support it.
+    """
+    options = {"update_conflicts": True, "update_fields": update_fields}
+    if connections[queryset.db].features.supports_update_conflicts_with_target:
+        options["unique_fields"] = unique_fields
+    return options
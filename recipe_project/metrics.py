@@ -0,0 +1,105 @@
+"""
+Per-view request metrics kept in process memory.
+
+For a sampled request MetricsMiddleware (recipe_project/middleware.py)
+records the number of SQL queries, the time spent in the database, the
+time spent rendering templates and the total latency, then adds them to
+one histogram per metric and resolved URL name. Histograms have fixed
+buckets, so recording is a bisect and two additions under a lock.
+
+`/metrics` renders them in the Prometheus text format. Every server process
+keeps its own numbers: a scrape sees those of the process that answered,
+and counts are of sampled requests only, see view_metrics_sample_rate.
+"""
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+
+# seconds, Prometheus client defaults
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# name -> (help, buckets), in export order
+METRICS = {
+    "view_duration_seconds": ("Total request latency.", TIME_BUCKETS),
+    "view_db_queries": ("SQL queries per request.", QUERY_BUCKETS),
+    "view_db_duration_seconds": ("Time spent in SQL queries.", TIME_BUCKETS),
+    "view_template_duration_seconds": ("Time spent rendering templates.", TIME_BUCKETS),
+}
+
+
+class Histogram:
+    """Observations counted into fixed `le` buckets, plus sum and count."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """`(le, observations <= le)` of every bucket, "+Inf" last."""
+        total = 0
+        for le, count in zip(self.buckets + ("+Inf",), self.counts):
+            total += count
+            yield le, total
+
+
+class Registry:
+    """Histograms by metric name and view."""
+
+    def __init__(self):
+        self._histograms = {}  # (metric, view) -> Histogram
+        self._lock = threading.Lock()
+
+    def record(self, view, **values):
+        """Add one request's `metric=value` observations for `view`."""
+        with self._lock:
+            for metric, value in values.items():
+                histogram = self._histograms.get((metric, view))
+                if histogram is None:
+                    histogram = self._histograms[metric, view] = Histogram(METRICS[metric][1])
+                histogram.observe(value)
+
+    def get(self, metric, view):
+        return self._histograms.get((metric, view))
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def export(self):
+        """Every histogram in the Prometheus text exposition format."""
+        lines = [
+            "# HELP view_metrics_sample_rate Share of requests measured.",
+            "# TYPE view_metrics_sample_rate gauge",
+            f"view_metrics_sample_rate {settings.METRICS_SAMPLE_RATE}",
+        ]
+        with self._lock:
+            for metric, (help_text, _) in METRICS.items():
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} histogram")
+                for (name, view), histogram in sorted(self._histograms.items()):
+                    if name != metric:
+                        continue
+                    label = f'view="{_escape(view)}"'
+                    for le, count in histogram.cumulative():
+                        lines.append(f'{metric}_bucket{{{label},le="{le}"}} {count}')
+                    lines.append(f"{metric}_sum{{{label}}} {histogram.sum}")
+                    lines.append(f"{metric}_count{{{label}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
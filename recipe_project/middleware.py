@@ -0,0 +1,114 @@
+import random
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import Template
+
+from .metrics import registry
+
+# the Sample of the request being handled, None when it is not sampled
+current_sample = ContextVar("current_sample", default=None)
+
+
+class Sample:
+    """Measurements of one request, also the execute wrapper counting queries."""
+
+    __slots__ = ("queries", "db_time", "template_time", "rendering")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.rendering = False
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += perf_counter() - start
+
+
+def _instrument_templates():
+    """
+    Time the outermost Template.render() calls of sampled requests.
+
+    Django only sends a signal per rendered template under the test runner,
+    so the backend's Template.render is wrapped once instead. Templates
+    rendered from within another one (inclusion tags, {% include %}) are
+    part of its time.
+    """
+    render = Template.render
+    if getattr(render, "instrumented", False):
+        return
+
+    @wraps(render)
+    def timed_render(self, context=None, request=None):
+        sample = current_sample.get()
+        if sample is None or sample.rendering:
+            return render(self, context, request)
+        sample.rendering = True
+        start = perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            sample.template_time += perf_counter() - start
+            sample.rendering = False
+
+    timed_render.instrumented = True
+    Template.render = timed_render
+
+
+class MetricsMiddleware:
+    """
+    Measure a METRICS_SAMPLE_RATE share of requests: SQL queries and their
+    time on every database, template render time and total latency. They
+    are recorded per resolved URL name (recipe_project/metrics.py) and,
+    with METRICS_SERVER_TIMING, sent back in a Server-Timing header.
+    Requests that are not sampled only cost one random() call.
+
+    Goes first in MIDDLEWARE, so the latency covers the other middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _instrument_templates()
+
+    def __call__(self, request):
+        rate = settings.METRICS_SAMPLE_RATE
+        if rate <= 0 or (rate < 1 and random.random() >= rate):
+            return self.get_response(request)
+
+        sample = Sample()
+        token = current_sample.set(sample)
+        start = perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(sample))
+                response = self.get_response(request)
+        finally:
+            current_sample.reset(token)
+        total = perf_counter() - start
+
+        match = request.resolver_match
+        view = (match.view_name if match else None) or "<unresolved>"
+        registry.record(
+            view,
+            view_duration_seconds=total,
+            view_db_queries=sample.queries,
+            view_db_duration_seconds=sample.db_time,
+            view_template_duration_seconds=sample.template_time,
+        )
+        if settings.METRICS_SERVER_TIMING:
+            response.headers["Server-Timing"] = ", ".join([
+                f'db;dur={sample.db_time * 1000:.1f};desc="{sample.queries} queries"',
+                f"tpl;dur={sample.template_time * 1000:.1f}",
+                f"total;dur={total * 1000:.1f}",
+            ])
+        return response
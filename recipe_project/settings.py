@@ -54,6 +54,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so its latency includes the other middleware
+    'recipe_project.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,18 +89,139 @@ WSGI_APPLICATION = 'recipe_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Connection reuse:
+# - DB_CONN_MAX_AGE: seconds a thread keeps its connection (default 0 = one per
+#   request; 60 or so once the server's connection limit is known to allow it)
+# - DB_CONN_HEALTH_CHECKS: ping a kept connection before the first query of a request
+# - DB_POOL_SIZE: above 0, closed connections go back to an in-process pool of
+#   this size instead (recipe_project/db/pool.py) and DB_CONN_MAX_AGE is ignored
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "0"))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        'ENGINE': 'recipe_project.db.mysql' if DB_POOL_SIZE else 'django.db.backends.mysql',
         'NAME': os.getenv("DB_NAME"),
         'USER': os.getenv("DB_USER"),
         'PASSWORD': os.getenv("DB_PASSWORD"),
         'HOST': os.getenv("DB_HOST", "andersontsaiTW.mysql.pythonanywhere-services.com"),
-        'PORT': "3306",
+        'PORT': os.getenv("DB_PORT", "3306"),
+        'CONN_MAX_AGE': 0 if DB_POOL_SIZE else int(os.getenv("DB_CONN_MAX_AGE", "0")),
+        'CONN_HEALTH_CHECKS': os.getenv("DB_CONN_HEALTH_CHECKS", "True") == "True",
+        'POOL': {
+            'SIZE': DB_POOL_SIZE,
+            'MAX_IDLE': int(os.getenv("DB_POOL_MAX_IDLE", "300")),
+            'CHECK_AFTER': int(os.getenv("DB_POOL_CHECK_AFTER", "5")),
+        },
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# CACHE_BACKEND selects the default cache:
+# - locmem (default): per process, least recently used entries are culled
+#   beyond CACHE_MAX_ENTRIES; writes only invalidate their own process's pages
+# - file: a directory (CACHE_LOCATION) shared by the processes of one host
+# - redis: a Redis-compatible server (CACHE_LOCATION, redis:// URL) shared by
+#   every host, needs the `redis` package
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "locmem")
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'recipe-default'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / 'cache')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+}
+if CACHE_BACKEND not in CACHE_BACKENDS:
+    raise ValueError(f"CACHE_BACKEND must be one of {', '.join(CACHE_BACKENDS)}")
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.getenv("CACHE_LOCATION", CACHE_BACKENDS[CACHE_BACKEND][1]),
+        'TIMEOUT': int(os.getenv("CACHE_TIMEOUT", "300")),
+        'KEY_PREFIX': os.getenv("CACHE_KEY_PREFIX", ""),
+        'OPTIONS': {} if CACHE_BACKEND == 'redis' else {
+            'MAX_ENTRIES': int(os.getenv("CACHE_MAX_ENTRIES", "5000")),
+        },
+    },
+    # rendered charts, least recently used entries are culled once full;
+    # TIMEOUT bounds the stale fallbacks, fresh charts use CHART_CACHE_TTL
+    'charts': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'recipe-charts',
+        'TIMEOUT': 24 * 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv("CHART_CACHE_MAX_ENTRIES", "128")),
+        },
+    },
+}
+
+# Seconds a rendered chart and its ETag are reused. Writes bump the data
+# version in the default cache, which is per process with locmem, so other
+# processes only see them once this runs out; keep it short there.
+CHART_CACHE_TTL = int(os.getenv(
+    "CHART_CACHE_TTL", "300" if CACHE_BACKEND == "locmem" else str(24 * 60 * 60)))
+
+# charts bigger than this are rendered every time instead of cached
+CHART_CACHE_MAX_BYTES = int(os.getenv("CHART_CACHE_MAX_BYTES", str(512 * 1024)))
+
+# Chart rendering: worker processes (0 = draw in the web worker) and the
+# seconds a request waits for one before it falls back to an older image
+CHART_RENDER_WORKERS = int(os.getenv("CHART_RENDER_WORKERS", "2"))
+CHART_RENDER_TIMEOUT = float(os.getenv("CHART_RENDER_TIMEOUT", "5"))
+
+# Seconds the views keep what they render (recipes/cache.py CachePolicy).
+# Model signals drop entries as soon as the rows they show change, so these
+# only bound how long writes made outside the ORM can go unnoticed.
+RECIPE_LIST_FRAGMENT_TTL = int(os.getenv("RECIPE_LIST_FRAGMENT_TTL", "300"))
+INGREDIENT_FRAGMENT_TTL = int(os.getenv("INGREDIENT_FRAGMENT_TTL", "600"))
+# the home and about pages, which only change on deploys
+PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", "3600"))
+
+# seconds a rendered recipe detail fragment is kept; writes to the recipe
+# or its ingredients replace it at once, the similar recipes panel may lag
+RECIPE_FRAGMENT_TTL = int(os.getenv("RECIPE_FRAGMENT_TTL", "300"))
+
+# seconds a rendered page of the ingredient list is kept; ingredient writes
+# replace every page at once, but with the locmem cache only in the process
+# that made the write, the others serve their pages until this runs out
+INGREDIENT_LIST_FRAGMENT_TTL = int(os.getenv("INGREDIENT_LIST_FRAGMENT_TTL", "600"))
+
+# threads generating picture thumbnails after uploads (0 = in the request)
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+
+# seconds the ingredient picker choices are kept; ingredient writes replace
+# them at once in the process that made the write, the others after this
+INGREDIENT_CHOICES_TTL = int(os.getenv("INGREDIENT_CHOICES_TTL", "300"))
+
+# ingredient pickers switch from a <select> to a typed name above this size
+INGREDIENT_SELECT_MAX_CHOICES = int(os.getenv("INGREDIENT_SELECT_MAX_CHOICES", "500"))
+
+# seconds before the in-memory ingredient indexes (autocomplete, fuzzy name
+# matching) are rebuilt to pick up writes made by other server processes
+INGREDIENT_AUTOCOMPLETE_TTL = int(os.getenv("INGREDIENT_AUTOCOMPLETE_TTL", "300"))
+
+# same for the in-memory pantry ("what can I cook") search index
+PANTRY_INDEX_TTL = int(os.getenv("PANTRY_INDEX_TTL", "300"))
+
+# same for the in-memory full-text recipe search index
+FULLTEXT_INDEX_TTL = int(os.getenv("FULLTEXT_INDEX_TTL", "300"))
+
+# import matplotlib at startup (in the master of a preforking server) instead
+# of on the first chart a worker draws; only with CHART_RENDER_WORKERS = 0
+CHART_PRELOAD = os.getenv("CHART_PRELOAD", "False") == "True"
+
+
+# Request metrics (recipe_project/middleware.py), served at /metrics:
+# - METRICS_SAMPLE_RATE: share of requests measured, e.g. 0.05 in production
+# - METRICS_SERVER_TIMING: send the measurements to every client in a
+#   Server-Timing header, off unless DEBUG
+# - METRICS_TOKEN: /metrics needs "Authorization: Bearer <token>", without
+#   a token it answers 403 unless DEBUG
+METRICS_SAMPLE_RATE = float(os.getenv("METRICS_SAMPLE_RATE", "1.0"))
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", str(DEBUG)) == "True"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -21,20 +21,25 @@ from django.urls import include
 from django.views.generic import TemplateView
 # home page
 from recipes.views import home
+from recipes.admin import cache_stats
+from recipes.cache import CachePolicy, cached_page
 # for the urls of static pics
 from django.conf import settings
 from django.conf.urls.static import static
 
-from .views import login_view, logout_success
+from .views import login_view, logout_success, metrics
 
 urlpatterns = [
+    path('admin/cache-stats/', admin.site.admin_view(cache_stats), name='cache_stats'),
     path('admin/', admin.site.urls),
     path('', home, name='home'),
     path('recipes/', include('recipes.urls')),
     path('ingredients/', include('ingredients.urls')),
     path('login/', login_view, name='login'),
     path('logout/', logout_success, name='logout_success'),
-    path("about/", TemplateView.as_view(template_name="about.html"), name="about"),
+    path('metrics', metrics, name='metrics'),
+    path("about/", cached_page(CachePolicy("about", "PAGE_CACHE_TTL"))(
+        TemplateView.as_view(template_name="about.html")), name="about"),
 
 ]
 
@@ -1,10 +1,14 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render, redirect
+from django.utils.crypto import constant_time_compare
 # Django authentication libraries
 from django.contrib.auth import authenticate, login, logout
 # Django Form for authentication
 from django.contrib.auth.forms import AuthenticationForm
 
 from recipes.models import Recipe  # to access Recipe model for logout
+from .metrics import registry
 
 # define a function view called login_view that takes a request from user
 
@@ -50,6 +54,21 @@ def login_view(request):
 def logout_success(request):
     logout(request)
     # choose a recipe randomly
-    # use '?' to rank randomly and choose the first one
-    recipe = Recipe.objects.order_by('?').first()
+    # by primary key lookups, ORDER BY RAND() would scan the whole table
+    recipe = Recipe.objects.random()
     return render(request, 'auth/success.html', {'recipe': recipe})
+
+
+def metrics(request):
+    """
+    Per-view request metrics in the Prometheus text format. Scrapers must
+    send `Authorization: Bearer <METRICS_TOKEN>`; without a token set the
+    endpoint is only open with DEBUG.
+    """
+    if settings.METRICS_TOKEN:
+        expected = f"Bearer {settings.METRICS_TOKEN}"
+        if not constant_time_compare(request.headers.get("Authorization", ""), expected):
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.export(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,5 +1,45 @@
-from django.contrib import admin
+from django.conf import settings
+from django.contrib import admin, messages
+from django.shortcuts import redirect, render
+
+from .cache import chart_cache, policies
 from .models import Recipe
 
 # Register your models here.
 admin.site.register(Recipe)
+
+
+def cache_stats(request):
+    """
+    Cache backends, hit rates of every CachePolicy and of the chart cache,
+    and buttons to drop a policy's entries or reset the counters. Wrapped in
+    admin.site.admin_view() by the URLconf, so staff only.
+    """
+    if request.method == "POST":
+        name = request.POST.get("policy")
+        if name == "reset":
+            for policy in policies.values():
+                policy.reset_stats()
+            chart_cache.reset_stats()
+            messages.success(request, "Counters reset.")
+        elif name in policies:
+            policies[name].invalidate()
+            messages.success(request, f"Cached {name} entries dropped.")
+        return redirect("cache_stats")
+
+    backends = [
+        # not LOCATION, a Redis URL can carry a password
+        {"alias": alias, "backend": options["BACKEND"].rsplit(".", 1)[-1],
+         "timeout": options.get("TIMEOUT", 300)}
+        for alias, options in settings.CACHES.items()
+    ]
+    rows = [{"name": name, "ttl": policy.ttl, "tags": ", ".join(policy.tags), **policy.stats()}
+            for name, policy in sorted(policies.items())]
+    rows.append({"name": "charts", "ttl": settings.CACHES["charts"].get("TIMEOUT"),
+                 "tags": "data version", **chart_cache.stats()})
+    return render(request, "admin/cache_stats.html", {
+        **admin.site.each_context(request),
+        "title": "Cache statistics",
+        "backends": backends,
+        "rows": rows,
+    })
@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        # with a render pool the spawned workers import matplotlib themselves
+        if settings.CHART_PRELOAD and not settings.CHART_RENDER_WORKERS:
+            from .rendering import preload
+            preload()
@@ -0,0 +1,245 @@
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.http import HttpResponse
+
+from .rendering import PLACEHOLDER, RenderUnavailable
+
+DATA_VERSION_KEY = "recipes:data-version"
+
+
+def _new_version():
+    # time based, so a version lost to eviction never comes back with a
+    # value that old cache entries were written under
+    return time.time_ns()
+
+
+def get_version(key):
+    """Return the version stamp stored under `key`, creating it if needed."""
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """Move the stamp under `key` on, orphaning entries keyed by the old one."""
+    try:
+        cache.incr(key)
+    except ValueError:  # key missing or evicted
+        cache.set(key, _new_version(), timeout=None)
+
+
+def get_versions(keys):
+    """get_version() of several keys, one cache round trip once they exist."""
+    found = cache.get_many(keys)
+    return [found[key] if key in found else get_version(key) for key in keys]
+
+
+def get_data_version():
+    """Return the current recipe data version stamp."""
+    return get_version(DATA_VERSION_KEY)
+
+
+def bump_data_version():
+    """Invalidate everything derived from Recipe / RecipeIngredient rows."""
+    bump_version(DATA_VERSION_KEY)
+
+
+def tag_version_key(tag):
+    return f"cache-tag:{tag}"
+
+
+def get_tag_version(tag):
+    return get_version(tag_version_key(tag))
+
+
+def invalidate_tags(*tags):
+    """Orphan every entry cached under one of `tags`, see CachePolicy."""
+    for tag in tags:
+        bump_version(tag_version_key(tag))
+
+
+def get_recipe_version(pk):
+    """Version stamp of one recipe and its ingredient rows."""
+    return get_tag_version(f"recipe:{pk}")
+
+
+def bump_recipe_version(pk):
+    """Invalidate what is cached for one recipe, e.g. its detail fragment."""
+    invalidate_tags(f"recipe:{pk}")
+
+
+class CacheStats:
+    """Hit and miss counters of one cache user, per process."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+# every CachePolicy by name, for the cache statistics admin page
+policies = {}
+
+
+class CachePolicy(CacheStats):
+    """
+    How long and under which tags one view caches what it renders.
+
+    Entries are kept for the number of seconds in the `ttl_setting` setting
+    and dropped as soon as one of `tags` is invalidated: the versions of the
+    tags are part of the key, so invalidate_tags() orphans the entries
+    instead of having to find them. A tag may name view kwargs, like
+    "recipe:{pk}". Every policy also has its own tag, `view:<name>`.
+    """
+
+    def __init__(self, name, ttl_setting, tags=()):
+        super().__init__()
+        self.name = name
+        self.ttl_setting = ttl_setting
+        self.tags = (f"view:{name}",) + tuple(tags)
+        policies[name] = self
+
+    @property
+    def ttl(self):
+        return getattr(settings, self.ttl_setting)
+
+    def key(self, variant="", **kwargs):
+        """Key of one variant (page, cursor...) of the view for `kwargs`."""
+        tags = [tag_version_key(tag.format(**kwargs)) for tag in self.tags]
+        versions = ".".join(str(version) for version in get_versions(tags))
+        variant = hashlib.md5(str(variant).encode("utf-8")).hexdigest()
+        return f"view:{self.name}:{versions}:{variant}"
+
+    def get(self, key):
+        value = cache.get(key)
+        self._count(hit=value is not None)
+        return value
+
+    def set(self, key, value):
+        cache.set(key, value, self.ttl)
+
+    def invalidate(self):
+        """Drop every entry of this policy."""
+        invalidate_tags(self.tags[0])
+
+
+def cached_page(policy):
+    """
+    Cache the whole page a view renders for GET requests under `policy`.
+
+    Only for pages where nothing but the navigation bar depends on the
+    visitor: a page is cached once for anonymous and once for signed-in
+    visitors.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != "GET":
+                return view(request, *args, **kwargs)
+            key = policy.key(f"{request.path}|{request.user.is_authenticated}", **kwargs)
+            content = policy.get(key)
+            if content is not None:
+                return HttpResponse(content)
+            response = view(request, *args, **kwargs)
+            if hasattr(response, "render"):
+                response.render()  # TemplateResponse of a generic view
+            if response.status_code == 200 and not response.streaming:
+                policy.set(key, response.content)
+            return response
+        return wrapper
+    return decorator
+
+
+class ChartCache(CacheStats):
+    """
+    Rendered charts keyed by chart type, ingredient and data version.
+
+    Entries live in the size-bounded "charts" cache alias, so the backend
+    culls old entries once CHART_CACHE_MAX_ENTRIES is reached. A write to the
+    underlying data bumps the version, which makes every older entry
+    unreachable without having to delete it. The version only reaches other
+    processes through a shared default cache, so charts and ETags are also
+    renewed every CHART_CACHE_TTL seconds.
+    """
+
+    def __init__(self, alias="charts"):
+        super().__init__()
+        self.alias = alias
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def make_key(self, chart_type, ingredient_name=None, fmt="png", version=None):
+        if version is None:
+            version = get_data_version()
+        name = hashlib.md5((ingredient_name or "").encode("utf-8")).hexdigest()
+        return f"chart:{version}:{chart_type}:{fmt}:{name}"
+
+    def etag(self, chart_type, ingredient_name=None, fmt="png"):
+        """Strong validator, changes with the data version or the TTL window."""
+        key = self.make_key(chart_type, ingredient_name, fmt)
+        window = int(time.time() // settings.CHART_CACHE_TTL)
+        return hashlib.md5(f"{key}:{window}".encode("utf-8")).hexdigest()
+
+    def get_or_render(self, chart_type, ingredient_name, render, fmt="png"):
+        """
+        Return the cached `(ChartImage, error)` pair or call `render()` to
+        build it. Errors are not cached, they depend on rows that do not bump
+        the version.
+
+        If `render()` raises RenderUnavailable the last chart rendered for the
+        same arguments is returned, even if it is out of date, or a placeholder
+        when there is none. Fallbacks are never stored under the new version.
+        """
+        key = self.make_key(chart_type, ingredient_name, fmt)
+        chart = self.backend.get(key)
+        if chart is not None:
+            self._count(hit=True)
+            return chart, None
+
+        self._count(hit=False)
+        last_key = self.make_key(chart_type, ingredient_name, fmt, version="last")
+        try:
+            chart, error = render()
+        except RenderUnavailable:
+            last = self.backend.get(last_key)
+            if last is None:
+                return PLACEHOLDER, None
+            return last._replace(is_fallback=True), None
+
+        if chart is not None and len(chart.data) <= settings.CHART_CACHE_MAX_BYTES:
+            self.backend.set(key, chart, settings.CHART_CACHE_TTL)
+            self.backend.set(last_key, chart)
+        return chart, error
+
+
+chart_cache = ChartCache()
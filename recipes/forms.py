@@ -1,5 +1,7 @@
 from django import forms
+from django.conf import settings
 from .models import Recipe
+from .growth import RESOLUTIONS, GrowthQuery
 from recipesingredients.models import RecipeIngredient
 from ingredients.models import Ingredient
 from django.urls import reverse_lazy
@@ -10,8 +12,68 @@ class IngredientSearchForm(forms.Form):
     ingredient = forms.CharField(
         label="Ingredient Name",
         max_length=100,
-        required=False
+        required=False,
+        widget=forms.TextInput(attrs={
+            'data-autocomplete-url': reverse_lazy('ingredients:autocomplete')})
     )
+
+class GrowthForm(forms.Form):
+    resolution = forms.ChoiceField(
+        label="Resolution",
+        choices=[(r, r.title()) for r in RESOLUTIONS],
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    start = forms.DateField(
+        label="From",
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+    end = forms.DateField(
+        label="To",
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get("start"), cleaned_data.get("end")
+        if start and end and start > end:
+            raise forms.ValidationError("The start date must not be after the end date.")
+        return cleaned_data
+
+    def get_query(self):
+        """GrowthQuery of the valid form"""
+        data = self.cleaned_data
+        return GrowthQuery(data["resolution"] or "day", data["start"], data["end"])
+
+
+class PantrySearchForm(forms.Form):
+    ingredients = forms.CharField(
+        label="Ingredients You Have",
+        max_length=1000,
+        widget=forms.TextInput(attrs={'class': 'form-control',
+                                      'placeholder': 'e.g. egg, flour, milk'})
+    )
+    max_missing = forms.IntegerField(
+        label="Missing at Most",
+        min_value=0,
+        required=False,
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
+
+    def clean_ingredients(self):
+        """comma separated names, duplicates removed"""
+        names = {}
+        for name in self.cleaned_data['ingredients'].split(','):
+            name = name.strip()
+            if name:
+                names.setdefault(name.lower(), name)
+        if not names:
+            raise forms.ValidationError("Enter at least one ingredient.")
+        return list(names.values())
+
+
 class RecipeForm(forms.ModelForm):
     ingredient_num = forms.IntegerField(
         min_value=1,
@@ -25,8 +87,49 @@ class RecipeForm(forms.ModelForm):
         fields = ['name', 'cooking_time', 'pic', 'ingredient_num']
 
 
+class IngredientChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField that can take its choices from a shared IngredientChoices,
+    so a formset validates and renders every form without querying the
+    ingredient table again.
+    """
+    shared = None
+    autocomplete = False
+
+    def use_choices(self, shared, autocomplete=False):
+        self.shared = shared
+        self.autocomplete = autocomplete
+        if autocomplete:
+            # typed name instead of a <select> listing the whole catalog
+            self.widget = forms.TextInput(attrs={
+                'class': 'form-control', 'placeholder': 'Type an ingredient name',
+                'data-autocomplete-url': reverse_lazy('ingredients:autocomplete')})
+        else:
+            self.choices = [("", self.empty_label)] + shared.pairs
+
+    def to_python(self, value):
+        if self.shared is None:
+            return super().to_python(value)
+        if value in self.empty_values:
+            return None
+        if self.autocomplete:
+            lookup, key = self.shared.by_name, str(value).strip().lower()
+        else:
+            lookup, key = self.shared.by_id, str(value)
+        if key not in lookup:
+            raise forms.ValidationError(
+                self.error_messages["invalid_choice"], code="invalid_choice")
+        pk, name = lookup[key]
+        return Ingredient(pk=pk, name=name)
+
+    def prepare_value(self, value):
+        if self.autocomplete and isinstance(value, Ingredient):
+            return value.name
+        return super().prepare_value(value)
+
+
 class RecipeIngredientForm(forms.ModelForm):
-    ingredient = forms.ModelChoiceField(
+    ingredient = IngredientChoiceField(
         queryset=Ingredient.objects.all(),
         widget=forms.Select(attrs={'class': 'form-control'}),
         required=True
@@ -41,10 +144,22 @@ class RecipeIngredientForm(forms.ModelForm):
         model = RecipeIngredient
         fields = ['ingredient', 'quantity']
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, ingredient_choices=None, **kwargs):
         super().__init__(*args, **kwargs)
+        if ingredient_choices is not None:
+            self.fields['ingredient'].use_choices(
+                ingredient_choices,
+                autocomplete=len(ingredient_choices) > settings.INGREDIENT_SELECT_MAX_CHOICES)
         self.fields['ingredient'].widget.attrs['onchange'] = 'checkNewIngredient()'
 
+    def _get_validation_exclusions(self):
+        exclude = super()._get_validation_exclusions()
+        if self.fields['ingredient'].shared is not None:
+            # already checked against the shared choices, skip the
+            # per-form foreign key lookup of Model.full_clean()
+            exclude.add('ingredient')
+        return exclude
+
 RecipeIngredientFormSet = inlineformset_factory(
     Recipe,
     RecipeIngredient,
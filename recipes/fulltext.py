@@ -0,0 +1,281 @@
+"""
+Full-text recipe search with BM25 ranking, no external search service.
+
+A recipe's document is its name (counted NAME_BOOST times) plus the names
+and introductions of its ingredients. Text is lowercased, split on word
+characters, stripped of stop words and of plural endings. The inverted
+index maps each term to `{document slot: term frequency}`; at query time
+the postings of a term are turned into numpy arrays (cached until the term
+changes) and scored for every document at once.
+
+The index lives in process memory: it is built with three queries on the
+first search, updated by the Recipe, Ingredient and RecipeIngredient
+signals in recipes/signals.py and rebuilt every FULLTEXT_INDEX_TTL seconds
+for writes made by other processes. A rebuild fills a new index without the
+lock, so searches keep using the old one meanwhile; signal updates made
+during it are replayed on the new index before it is swapped in.
+"""
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+from ingredients.models import Ingredient
+from recipesingredients.models import RecipeIngredient
+from .models import Recipe
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# a word of the recipe name weighs as much as this many ingredient words
+NAME_BOOST = 3
+
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from in is it of on or the to with".split())
+
+WORD = re.compile(r"\w+")
+
+
+def stem(word):
+    """Strip the common English plural endings."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith("oes"):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    return [stem(word) for word in WORD.findall((text or "").lower())
+            if word not in STOP_WORDS]
+
+
+class SearchIndex:
+    """BM25 inverted index over recipe documents."""
+
+    def __init__(self):
+        # the structures are created by build(), which imports numpy
+        self._built_at = None
+        self._pending = None  # signal updates made while rebuilding
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()  # one rebuild at a time
+
+    def _reset(self):
+        import numpy as np
+
+        self._postings = defaultdict(dict)  # term -> {slot: tf}
+        self._arrays = {}  # term -> (slots, tfs), dropped when the term changes
+        self._slots = {}  # recipe id -> slot
+        self._size = 0  # slots in use
+        self._recipe_ids = np.zeros(1024, dtype=np.int64)  # slot -> recipe id
+        self._doc_len = np.zeros(1024)  # slot -> number of terms, 0 once removed
+        self._doc_terms = []  # slot -> Counter of terms
+        self._total_len = 0
+        self._names = {}  # recipe id -> name tokens
+        self._ingredients = defaultdict(set)  # recipe id -> ingredient ids
+        self._used_by = defaultdict(set)  # ingredient id -> recipe ids
+        self._ingredient_tokens = {}  # ingredient id -> tokens
+
+    @property
+    def is_built(self):
+        return self._built_at is not None
+
+    def build(self):
+        """Index every recipe with three queries, then swap the result in."""
+        with self._lock:
+            self._pending = []
+        fresh = SearchIndex()
+        try:
+            fresh._load()
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            pending, self._pending = self._pending, None
+            for name, value in vars(fresh).items():
+                if name not in ("_lock", "_build_lock", "_pending"):
+                    setattr(self, name, value)
+            self._built_at = time.monotonic()
+            for method, args in pending:
+                getattr(self, method)(*args)
+
+    def _load(self):
+        self._reset()
+        for pk, name, introduction in Ingredient.objects.values_list(
+                "id", "name", "introduction"):
+            self._ingredient_tokens[pk] = tokenize(name) + tokenize(introduction)
+        for recipe_id, ingredient_id in RecipeIngredient.objects.values_list(
+                "recipe_id", "ingredient_id"):
+            self._ingredients[recipe_id].add(ingredient_id)
+            self._used_by[ingredient_id].add(recipe_id)
+        for pk, name in Recipe.objects.values_list("id", "name"):
+            self._names[pk] = tokenize(name)
+            self._index(pk)
+
+    def invalidate(self):
+        """Drop the index, the next search rebuilds it."""
+        with self._lock:
+            self._built_at = None
+
+    def _is_fresh(self):
+        built_at = self._built_at
+        return built_at is not None and time.monotonic() - built_at <= settings.FULLTEXT_INDEX_TTL
+
+    def _ensure_built(self):
+        """
+        Rebuild a missing or expired index. One thread rebuilds while the
+        others search the old index, they only wait when there is none.
+        """
+        if self._is_fresh():
+            return
+        if not self._build_lock.acquire(blocking=not self.is_built):
+            return
+        try:
+            if not self._is_fresh():  # or another thread just rebuilt it
+                self.build()
+        finally:
+            self._build_lock.release()
+
+    def _defer(self, method, *args):
+        """Keep a signal update for the index being rebuilt, if any."""
+        if self._pending is not None:
+            self._pending.append((method, args))
+
+    def _index(self, recipe_id):
+        """(Re)write the postings of one recipe from the stored tokens."""
+        import numpy as np
+
+        slot = self._slots.get(recipe_id)
+        if slot is not None:
+            self._clear(slot)
+        else:
+            slot = self._slots[recipe_id] = self._size
+            self._size += 1
+            if slot == len(self._recipe_ids):
+                self._recipe_ids = np.concatenate([self._recipe_ids, np.zeros_like(self._recipe_ids)])
+                self._doc_len = np.concatenate([self._doc_len, np.zeros_like(self._doc_len)])
+            self._recipe_ids[slot] = recipe_id
+            self._doc_terms.append(Counter())
+
+        terms = Counter(self._names.get(recipe_id, ()))
+        for term in terms:
+            terms[term] *= NAME_BOOST
+        for ingredient_id in self._ingredients.get(recipe_id, ()):
+            terms.update(self._ingredient_tokens.get(ingredient_id, ()))
+        self._doc_terms[slot] = terms
+        self._doc_len[slot] = length = sum(terms.values())
+        self._total_len += length
+        for term, tf in terms.items():
+            self._postings[term][slot] = tf
+            self._arrays.pop(term, None)
+
+    def _clear(self, slot):
+        for term in self._doc_terms[slot]:
+            del self._postings[term][slot]
+            if not self._postings[term]:
+                del self._postings[term]
+            self._arrays.pop(term, None)
+        self._total_len -= self._doc_len[slot]
+        self._doc_terms[slot] = Counter()
+        self._doc_len[slot] = 0
+
+    def search(self, query):
+        """Recipe ids matching any term of `query`, best BM25 score first."""
+        import numpy as np
+
+        terms = set(tokenize(query))
+        self._ensure_built()
+        with self._lock:
+            docs = len(self._slots)
+            if not terms or not docs or not self._total_len:
+                return np.zeros(0, dtype=np.int64)
+            average = self._total_len / docs
+            scores = np.zeros(self._size)
+            for term in terms:
+                if term not in self._postings:
+                    continue
+                slots, tfs = self._term_arrays(term)
+                idf = math.log(1 + (docs - len(slots) + 0.5) / (len(slots) + 0.5))
+                norm = K1 * (1 - B + B * self._doc_len[slots] / average)
+                scores[slots] += idf * tfs * (K1 + 1) / (tfs + norm)
+            matched = np.flatnonzero(scores)
+            # stable, so equal scores keep slot (roughly insertion) order
+            order = np.argsort(-scores[matched], kind="stable")
+            return self._recipe_ids[matched[order]]
+
+    def _term_arrays(self, term):
+        import numpy as np
+
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            postings = self._postings[term]
+            arrays = (np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)),
+                      np.fromiter(postings.values(), dtype=np.float64, count=len(postings)))
+            self._arrays[term] = arrays
+        return arrays
+
+    # incremental updates from signals, ignored until the index is built
+
+    def recipe_saved(self, recipe_id, name):
+        with self._lock:
+            self._defer("recipe_saved", recipe_id, name)
+            if self.is_built:
+                self._names[recipe_id] = tokenize(name)
+                self._index(recipe_id)
+
+    def recipe_deleted(self, recipe_id):
+        with self._lock:
+            self._defer("recipe_deleted", recipe_id)
+            if not self.is_built or recipe_id not in self._slots:
+                return
+            # the slot is left empty, the next rebuild compacts it away
+            self._clear(self._slots.pop(recipe_id))
+            self._names.pop(recipe_id, None)
+            for ingredient_id in self._ingredients.pop(recipe_id, ()):
+                self._used_by[ingredient_id].discard(recipe_id)
+
+    def ingredient_saved(self, ingredient_id, name, introduction):
+        with self._lock:
+            self._defer("ingredient_saved", ingredient_id, name, introduction)
+            if not self.is_built:
+                return
+            self._ingredient_tokens[ingredient_id] = tokenize(name) + tokenize(introduction)
+            for recipe_id in self._used_by.get(ingredient_id, ()):
+                self._index(recipe_id)
+
+    def link_changed(self, recipe_id, ingredient_id, added):
+        with self._lock:
+            self._defer("link_changed", recipe_id, ingredient_id, added)
+            if not self.is_built or recipe_id not in self._slots:
+                return
+            if added:
+                self._ingredients[recipe_id].add(ingredient_id)
+                self._used_by[ingredient_id].add(recipe_id)
+            else:
+                self._ingredients[recipe_id].discard(ingredient_id)
+                self._used_by[ingredient_id].discard(recipe_id)
+            self._index(recipe_id)
+
+    def refresh_recipe(self, recipe_id):
+        """Re-read a recipe's ingredients, e.g. after a bulk insert."""
+        with self._lock:
+            self._defer("refresh_recipe", recipe_id)
+            if not self.is_built or recipe_id not in self._slots:
+                return
+            for pk, name, introduction in RecipeIngredient.objects.filter(
+                    recipe_id=recipe_id).values_list(
+                    "ingredient_id", "ingredient__name", "ingredient__introduction"):
+                self._ingredients[recipe_id].add(pk)
+                self._used_by[pk].add(recipe_id)
+                self._ingredient_tokens[pk] = tokenize(name) + tokenize(introduction)
+            self._index(recipe_id)
+
+
+index = SearchIndex()
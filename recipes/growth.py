@@ -0,0 +1,101 @@
+"""
+Recipe growth series for the line chart and the growth API.
+
+Recipes per day are read from the DailyRecipeCount rollup, summed into
+day, week (starting Monday) or month buckets by the database, and the
+buckets without recipes are filled in with one NumPy scatter. Whatever the
+range, a series has at most MAX_POINTS points: a resolution that would
+need more is coarsened (day -> week -> month), and months are finally
+summed in groups of `step`, so the renderer's work stays bounded.
+"""
+import math
+from collections import namedtuple
+from datetime import timedelta
+
+from django.db.models import Min, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import DailyRecipeCount
+
+RESOLUTIONS = ("day", "week", "month")
+
+MAX_POINTS = 120
+
+TRUNC = {"week": TruncWeek, "month": TruncMonth}
+
+GrowthSeries = namedtuple("GrowthSeries", "resolution step labels counts")
+
+
+class GrowthQuery(namedtuple("GrowthQuery", "resolution start end", defaults=("day", None, None))):
+    """Requested resolution and inclusive date range, None for open ends."""
+
+    def params(self):
+        """Query string parameters, see GrowthForm."""
+        return {name: value.isoformat() if hasattr(value, "isoformat") else value
+                for name, value in self._asdict().items() if value}
+
+    def cache_key(self):
+        """An open end is today, so yesterday's chart is not served after midnight."""
+        resolution, start, end = self
+        return f"growth:{resolution}:{start or ''}:{end or timezone.localdate()}"
+
+
+def _bucket_starts(resolution, start, end):
+    """datetime64 start of every bucket overlapping [start, end]."""
+    import numpy as np
+
+    if resolution == "month":
+        return np.arange(np.datetime64(start, "M"), np.datetime64(end, "M") + 1)
+    if resolution == "week":
+        monday = start - timedelta(days=start.weekday())
+        return np.arange(np.datetime64(monday, "D"), np.datetime64(end, "D") + 1, 7)
+    return np.arange(np.datetime64(start, "D"), np.datetime64(end, "D") + 1)
+
+
+def growth_series(query=GrowthQuery(), max_points=MAX_POINTS):
+    """
+    GrowthSeries of `query`: `labels` are the ISO start dates of the points,
+    `counts` the recipes created in each, `step` the buckets per point.
+    """
+    import numpy as np
+
+    resolution, start, end = query
+    end = end or timezone.localdate()
+    if start is None:
+        start = DailyRecipeCount.objects.filter(recipes__gt=0).aggregate(
+            first=Min("day"))["first"]
+    if start is None or start > end:
+        return GrowthSeries(resolution, 1, [], [])
+
+    # the finest resolution, at or above the requested one, that fits
+    for resolution in RESOLUTIONS[RESOLUTIONS.index(resolution):]:
+        starts = _bucket_starts(resolution, start, end)
+        if len(starts) <= max_points:
+            break
+
+    rows = DailyRecipeCount.objects.filter(day__range=(start, end), recipes__gt=0)
+    if resolution == "day":
+        rows = rows.values_list("day", "recipes")
+    else:
+        rows = rows.annotate(bucket=TRUNC[resolution]("day")).order_by().values(
+            "bucket").annotate(n=Sum("recipes")).values_list("bucket", "n")
+    rows = list(rows)
+
+    counts = np.zeros(len(starts), dtype=np.int64)
+    if rows:
+        days, values = zip(*rows)
+        keys = np.array(days, dtype="datetime64[D]").astype(starts.dtype)
+        # bucket position of every row: whole buckets since the first one
+        unit = 7 if resolution == "week" else 1
+        counts[(keys - starts[0]).astype(np.int64) // unit] = values
+
+    step = max(1, math.ceil(len(starts) / max_points))
+    if step > 1:
+        padded = np.zeros(math.ceil(len(counts) / step) * step, dtype=np.int64)
+        padded[:len(counts)] = counts
+        counts = padded.reshape(-1, step).sum(axis=1)
+        starts = starts[::step]
+
+    labels = [str(label) for label in starts.astype("datetime64[D]")]
+    return GrowthSeries(resolution, step, labels, counts.tolist())
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+
+from recipes.models import Recipe, RecipeSignature, RecipeSignatureBand
+from recipes.similarity import save_signatures, signatures
+from recipesingredients.models import RecipeIngredient
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the MinHash signatures and LSH bands of every recipe, "
+        "hashing one primary key range of links per NumPy batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=10000,
+            help="Recipes per batch (default: 10000).")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        bounds = Recipe.objects.aggregate(low=Min("pk"), high=Max("pk"))
+        if bounds["low"] is None:
+            self.stdout.write("No recipes.")
+            return
+
+        built = 0
+        for start in range(bounds["low"], bounds["high"] + 1, batch_size):
+            batch = {"recipe_id__gte": start, "recipe_id__lt": start + batch_size}
+            links = list(RecipeIngredient.objects.filter(**batch).order_by(
+                "recipe_id").values_list("recipe_id", "ingredient_id"))
+            with transaction.atomic():
+                # the whole range is replaced, recipes without ingredients
+                # are left without a signature
+                RecipeSignature.objects.filter(**batch).delete()
+                RecipeSignatureBand.objects.filter(**batch).delete()
+                if not links:
+                    continue
+                recipe_ids, matrix = signatures(*zip(*links))
+                save_signatures(recipe_ids, matrix, replace=False)
+            built += len(recipe_ids)
+
+        self.stdout.write(self.style.SUCCESS(f"Built {built} signature(s)."))
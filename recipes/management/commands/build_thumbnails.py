@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from ingredients.models import Ingredient
+from recipes.models import Recipe
+from recipes.thumbnails import generate, thumbnails_ready
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the thumbnails of every recipe and ingredient picture that "
+        "has none yet, one read and encode per distinct picture."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all", action="store_true",
+            help="Also recheck pictures that already have thumbnails.")
+
+    def handle(self, *args, **options):
+        done = missing = 0
+        for model in (Recipe, Ingredient):
+            rows = model.objects.all()
+            if not options["all"]:
+                rows = rows.filter(pic_hash="")
+            # most rows share the default picture
+            for name in rows.order_by().values_list("pic", flat=True).distinct():
+                try:
+                    digest = generate(name)
+                except FileNotFoundError:
+                    self.stderr.write(f"Missing picture: {name}")
+                    missing += 1
+                    continue
+                pks = list(rows.filter(pic=name).values_list("pk", flat=True))
+                rows.filter(pic=name).update(pic_hash=digest)
+                thumbnails_ready.send(sender=model, pks=pks)
+                done += len(pks)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Thumbnailed {done} picture(s), {missing} missing file(s)."))
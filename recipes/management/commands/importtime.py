@@ -0,0 +1,84 @@
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+BOOT_CODE = """
+import importlib, sys
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Report what a fresh worker imports before its first request "
+        "(django.setup() plus the URLconf), aggregated per package from "
+        "python -X importtime."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "modules", nargs="*",
+            help="Extra modules to import after the URLconf.")
+        parser.add_argument(
+            "--depth", type=int, default=1,
+            help="Aggregate on this many dotted name parts (default: 1).")
+        parser.add_argument(
+            "--limit", type=int, default=20,
+            help="Number of rows to print (default: 20).")
+        parser.add_argument(
+            "--max-total", type=float,
+            help="Fail if the total import time exceeds this many ms.")
+        parser.add_argument(
+            "--forbid", nargs="+", default=[], metavar="PACKAGE",
+            help="Fail if any of these packages is imported at startup.")
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", BOOT_CODE, *options["modules"]],
+            capture_output=True, text=True, env=env, cwd=settings.BASE_DIR)
+        if process.returncode:
+            raise CommandError(f"Startup import failed:\n{process.stderr[-2000:]}")
+
+        self_us = defaultdict(int)
+        counts = defaultdict(int)
+        imported = set()
+        for line in process.stderr.splitlines():
+            match = LINE.match(line)
+            if not match:
+                continue
+            own, _, _, name = match.groups()
+            group = ".".join(name.split(".")[:options["depth"]])
+            self_us[group] += int(own)
+            counts[group] += 1
+            imported.add(name)
+
+        total_ms = sum(self_us.values()) / 1000
+        rows = sorted(self_us.items(), key=lambda item: item[1], reverse=True)
+        self.stdout.write(f"{'package':<40}{'modules':>8}{'self ms':>10}{'share':>8}")
+        for group, micros in rows[:options["limit"]]:
+            self.stdout.write(
+                f"{group:<40}{counts[group]:>8}{micros / 1000:>10.1f}"
+                f"{micros / 1000 / total_ms:>8.1%}")
+        self.stdout.write(f"{'total':<40}{len(imported):>8}{total_ms:>10.1f}")
+
+        loaded = sorted(
+            package for package in options["forbid"]
+            if any(name == package or name.startswith(package + ".") for name in imported))
+        if loaded:
+            raise CommandError(f"Imported at startup: {', '.join(loaded)}")
+        if options["max_total"] is not None and total_ms > options["max_total"]:
+            raise CommandError(
+                f"Startup imports took {total_ms:.1f} ms, budget is {options['max_total']} ms")
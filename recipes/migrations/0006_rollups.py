@@ -0,0 +1,54 @@
+# Generated by Django 4.2.19 on 2026-10-18 19:59
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def fill_rollups(apps, schema_editor):
+    """ existing rows, later kept current by signals or rebuild_rollups """
+    RecipeIngredient = apps.get_model('recipesingredients', 'RecipeIngredient')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    IngredientRecipeCount = apps.get_model('recipes', 'IngredientRecipeCount')
+    DailyRecipeCount = apps.get_model('recipes', 'DailyRecipeCount')
+    IngredientRecipeCount.objects.bulk_create(
+        [IngredientRecipeCount(ingredient_id=pk, recipes=n)
+         for pk, n in RecipeIngredient.objects.order_by().values('ingredient_id').annotate(
+             n=Count('pk')).values_list('ingredient_id', 'n')],
+        batch_size=10000)
+    DailyRecipeCount.objects.bulk_create(
+        [DailyRecipeCount(day=day, recipes=n)
+         for day, n in Recipe.objects.order_by().annotate(day=TruncDate('created_at')).values(
+             'day').annotate(n=Count('pk')).values_list('day', 'n')],
+        batch_size=10000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingredients', '0004_ingredient_pic_hash'),
+        ('recipes', '0005_recipe_pic_hash'),
+        ('recipesingredients', '0002_ingredient_recipe_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRecipeCount',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False)),
+                ('recipes', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='IngredientRecipeCount',
+            fields=[
+                ('ingredient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recipe_count', serialize=False, to='ingredients.ingredient')),
+                ('recipes', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-recipes'], name='ingredient_count_recipes_idx')],
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.19 on 2026-10-18 23:40
+
+from django.db import migrations
+from django.db.models import Max, Min
+
+BATCH_SIZE = 10000
+
+
+def fill_signatures(apps, schema_editor):
+    """ recipes created before 0004, later kept current by signals """
+    from recipes.similarity import BANDS, band_buckets, signatures
+
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeIngredient = apps.get_model('recipesingredients', 'RecipeIngredient')
+    RecipeSignature = apps.get_model('recipes', 'RecipeSignature')
+    RecipeSignatureBand = apps.get_model('recipes', 'RecipeSignatureBand')
+    bounds = Recipe.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return
+    for start in range(bounds['low'], bounds['high'] + 1, BATCH_SIZE):
+        links = list(RecipeIngredient.objects.filter(
+            recipe_id__gte=start, recipe_id__lt=start + BATCH_SIZE).exclude(
+            recipe__signature__isnull=False).order_by('recipe_id').values_list(
+            'recipe_id', 'ingredient_id'))
+        if not links:
+            continue
+        recipe_ids, matrix = signatures(*zip(*links))
+        buckets = band_buckets(matrix)
+        RecipeSignature.objects.bulk_create(
+            [RecipeSignature(recipe_id=int(pk), signature=row.tobytes())
+             for pk, row in zip(recipe_ids, matrix)])
+        RecipeSignatureBand.objects.bulk_create(
+            [RecipeSignatureBand(recipe_id=int(pk), band=band, bucket=int(bucket))
+             for pk, row in zip(recipe_ids, buckets)
+             for band, bucket in zip(range(BANDS), row)],
+            batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_created_at_index'),
+        ('recipesingredients', '0002_ingredient_recipe_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_signatures, migrations.RunPython.noop),
+    ]
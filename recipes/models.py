@@ -1,7 +1,51 @@
+import random
+
+from django.core.cache import cache
 from django.db import models
+from django.db.models import Case, F, Max, Min, Q, Value, When
+from django.db.models.lookups import GreaterThanOrEqual, LessThan
 from django.contrib.auth.models import User
 from django.shortcuts import reverse
 
+from .cache import bump_data_version
+
+
+class RecipeManager(models.Manager):
+    ID_RANGE_KEY = "recipes:id-range"
+
+    def id_range(self):
+        """ (min id, max id), cached so picking a recipe is one indexed lookup """
+        bounds = cache.get(self.ID_RANGE_KEY)
+        if bounds is None:
+            bounds = self.aggregate(low=Min("pk"), high=Max("pk"))
+            bounds = (bounds["low"], bounds["high"])
+            cache.set(self.ID_RANGE_KEY, bounds, timeout=300)
+        return bounds
+
+    def random(self, attempts=5):
+        """
+        Return a random recipe (or None) without ORDER BY RAND().
+
+        Draws a few ids from the cached id range and fetches them by primary
+        key in one query, the first draw that exists wins, so the pick is
+        uniform as long as deleted ids are rare. If every draw falls into a
+        gap, the next recipe after the first draw is used instead.
+        """
+        low, high = self.id_range()
+        if low is None:
+            return None
+        picks = [random.randint(low, high) for _ in range(attempts)]
+        found = self.in_bulk(picks)
+        for pk in picks:
+            if pk in found:
+                return found[pk]
+
+        recipe = self.filter(pk__gte=picks[0]).order_by("pk").first()
+        if recipe is None:  # the range is stale, recipes were deleted
+            cache.delete(self.ID_RANGE_KEY)
+            recipe = self.order_by("pk").first()
+        return recipe
+
 
 class Recipe(models.Model):
     DIFFICULTY_CHOICES = [
@@ -20,6 +64,15 @@ class Recipe(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     pic = models.ImageField(upload_to='recipes', default='no_picture.jpg')
+    pic_hash = models.CharField(
+        max_length=16, blank=True, editable=False,
+        help_text="Content hash of pic, set once its thumbnails exist")
+
+    objects = RecipeManager()
+
+    class Meta:
+        # the list's keyset ordering, see RecipeListView
+        indexes = [models.Index(fields=["created_at", "id"], name="recipe_created_at_id_idx")]
 
     def __str__(self):
         return self.name
@@ -34,10 +87,102 @@ class Recipe(models.Model):
             return "Intermediate"
         return "Hard"
 
+    @staticmethod
+    def difficulty_for(ingredient_num):
+        """ calculate_difficulty as a SQL expression of an ingredient_num expression """
+        quick = LessThan(F("cooking_time"), 10)
+        few = LessThan(ingredient_num, 4)
+        return Case(
+            When(Q(quick, few), then=Value("Easy")),
+            When(quick, then=Value("Medium")),
+            When(few, then=Value("Intermediate")),
+            default=Value("Hard"),
+        )
+
+    @classmethod
+    def adjust_ingredient_num(cls, pk, delta):
+        """
+        Atomically add `delta` to ingredient_num (never below 0) and update
+        difficulty in the same UPDATE, without rewriting the other columns.
+        """
+        if delta >= 0:
+            new_num = F("ingredient_num") + delta
+        else:
+            # MySQL refuses to compute a negative UNSIGNED value, clamp first
+            new_num = Case(
+                When(GreaterThanOrEqual(F("ingredient_num"), -delta),
+                     then=F("ingredient_num") + delta),
+                default=Value(0),
+            )
+        cls.objects.filter(pk=pk).update(
+            # difficulty goes first: MySQL evaluates SET clauses left to right
+            # against the already updated row, other backends use the old row
+            difficulty=cls.difficulty_for(new_num),
+            ingredient_num=new_num,
+        )
+
     def save(self, *args, **kwargs):
         """ update difficulty before save """
+        adding = self._state.adding
+        if not adding:
+            # ingredient_num is kept by F() updates, never write a stale copy back
+            current = Recipe.objects.filter(pk=self.pk).values_list(
+                "ingredient_num", flat=True).first()
+            if current is not None:
+                self.ingredient_num = current
         self.difficulty = self.calculate_difficulty  # update difficulty automatically
+        if not self.pic._committed:
+            self.pic_hash = ""  # new upload, thumbnails are made after commit
         super().save(*args, **kwargs)  # call save() and save data
+        if adding:
+            cache.delete(RecipeManager.ID_RANGE_KEY)  # new highest id
+        bump_data_version()  # cached charts are out of date now
 
     def get_absolute_url(self):
         return reverse('recipes:recipe_detail', kwargs={'pk': self.pk})
+
+
+class RecipeSignature(models.Model):
+    """ MinHash signature of a recipe's ingredient set, see recipes/similarity.py """
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.CASCADE, primary_key=True, related_name="signature")
+    signature = models.BinaryField()
+
+    def __str__(self):
+        return f"Signature of {self.recipe_id}"
+
+
+class RecipeSignatureBand(models.Model):
+    """ LSH bucket of one band of a signature, recipes sharing a bucket are candidates """
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name="bands")
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=["band", "bucket"], name="recipe_band_bucket_idx")]
+        constraints = [
+            models.UniqueConstraint(fields=["recipe", "band"], name="unique_recipe_band")
+        ]
+
+
+class IngredientRecipeCount(models.Model):
+    """ rollup: number of recipes using an ingredient, see recipes/rollups.py """
+    ingredient = models.OneToOneField(
+        "ingredients.Ingredient", on_delete=models.CASCADE, primary_key=True,
+        related_name="recipe_count")
+    recipes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=["-recipes"], name="ingredient_count_recipes_idx")]
+
+    def __str__(self):
+        return f"{self.ingredient_id}: {self.recipes}"
+
+
+class DailyRecipeCount(models.Model):
+    """ rollup: number of recipes created per day (in TIME_ZONE) """
+    day = models.DateField(primary_key=True)
+    recipes = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day}: {self.recipes}"
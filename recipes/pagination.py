@@ -0,0 +1,130 @@
+import base64
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Keep microseconds, DjangoJSONEncoder rounds datetimes to milliseconds"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated queryset.
+
+    Rows are only fetched when `object_list` is first accessed, one extra row
+    is read to know whether a next page exists.
+    """
+
+    def __init__(self, paginator, queryset, cursor=None):
+        self.paginator = paginator
+        self.queryset = queryset
+        self.cursor = cursor
+
+    @cached_property
+    def _rows(self):
+        return list(self.queryset[:self.paginator.per_page + 1])
+
+    @cached_property
+    def object_list(self):
+        return self._rows[:self.paginator.per_page]
+
+    @property
+    def has_next(self):
+        return len(self._rows) > self.paginator.per_page
+
+    @property
+    def has_previous(self):
+        return self.cursor is not None
+
+    @property
+    def next_cursor(self):
+        if not self.has_next:
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1])
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Cursor-based paginator.
+
+    `ordering` must be a unique tuple of concrete columns, e.g.
+    ("created_at", "id"), prefix a field with "-" for descending order.
+    Every page is a single indexed range scan, so deep pages cost the same
+    as the first one.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.fields = [
+            (name.lstrip("-"), name.startswith("-")) for name in self.ordering
+        ]
+
+    def encode_cursor(self, obj):
+        """Encode the ordering values of `obj` into an opaque token."""
+        values = [getattr(obj, name) for name, _ in self.fields]
+        data = json.dumps(values, cls=CursorEncoder).encode("utf-8")
+        return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+    def decode_cursor(self, cursor):
+        """Decode a token back into typed ordering values."""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError
+            opts = self.queryset.model._meta
+            values = [
+                opts.get_field(name).to_python(value)
+                for (name, _), value in zip(self.fields, values)
+            ]
+            if None in values:  # to_python() lets null through
+                raise ValueError
+            return values
+        except (ValueError, TypeError, ValidationError) as e:
+            raise InvalidCursor("Invalid cursor.") from e
+
+    def _after(self, values):
+        """Build the `(a, b) > (x, y)` condition honouring each direction."""
+        # implied by the OR below, but lets the database read one index range
+        # in order instead of merging one range per OR branch and sorting
+        name, descending = self.fields[0]
+        bound = Q(**{f"{name}__{'lte' if descending else 'gte'}": values[0]})
+        condition = Q()
+        for i, (name, descending) in enumerate(self.fields):
+            lookup = "lt" if descending else "gt"
+            term = Q(**{f"{name}__{lookup}": values[i]})
+            for j, (prev_name, _) in enumerate(self.fields[:i]):
+                term &= Q(**{prev_name: values[j]})
+            condition |= term
+        return bound & condition
+
+    def page(self, cursor=None):
+        queryset = self.queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(self._after(self.decode_cursor(cursor)))
+        else:
+            cursor = None
+        return KeysetPage(self, queryset, cursor)
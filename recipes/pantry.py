@@ -0,0 +1,179 @@
+"""
+"What can I cook" search: rank recipes by how many pantry ingredients they use.
+
+PantryIndex is an in-memory inverted index from ingredient id to a sorted
+numpy array of recipe ids, plus the number of ingredients of every recipe.
+A query concatenates the posting lists of the pantry, counts the matches of
+every recipe with one bincount and sorts by the number of missing
+ingredients, instead of joining RecipeIngredient once per ingredient in SQL.
+
+The index is built with one query on the first search, kept current by the
+RecipeIngredient signals in recipes/signals.py and rebuilt every
+PANTRY_INDEX_TTL seconds for writes made by other processes. numpy is only
+imported when the index is built.
+"""
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+
+from recipesingredients.models import RecipeIngredient
+from .search import fetch_recipe_rows
+
+PantryMatch = namedtuple("PantryMatch", "recipe_id matched missing")
+
+PantryResult = namedtuple("PantryResult", "recipe matched missing missing_names")
+
+
+class PantryIndex:
+    """Ingredient id -> sorted recipe ids, and recipe id -> ingredient count."""
+
+    def __init__(self):
+        self._postings = {}
+        self._totals = None
+        self._built_at = None
+        self._lock = threading.RLock()
+
+    @property
+    def is_built(self):
+        return self._built_at is not None
+
+    def build(self):
+        """Load every RecipeIngredient link with one query."""
+        import numpy as np
+
+        rows = RecipeIngredient.objects.order_by(
+            "ingredient_id", "recipe_id").values_list("ingredient_id", "recipe_id")
+        pairs = np.fromiter(rows.iterator(chunk_size=10000),
+                            dtype=[("ingredient", "i8"), ("recipe", "i8")])
+        ingredients = pairs["ingredient"]
+        recipes = np.ascontiguousarray(pairs["recipe"])
+
+        # one slice of `recipes` per ingredient, already sorted by recipe id
+        starts = np.flatnonzero(np.diff(ingredients)) + 1
+        postings = {
+            int(ingredients[start]): chunk
+            for start, chunk in zip(np.r_[0, starts], np.split(recipes, starts))
+            if len(chunk)
+        }
+        with self._lock:
+            self._postings = postings
+            self._totals = np.bincount(recipes)
+            self._built_at = time.monotonic()
+
+    def invalidate(self):
+        """Drop the index, the next search rebuilds it."""
+        with self._lock:
+            self._built_at = None
+
+    def _ensure_built(self):
+        with self._lock:
+            ttl = settings.PANTRY_INDEX_TTL
+            if self._built_at is None or time.monotonic() - self._built_at > ttl:
+                self.build()
+
+    def search(self, ingredient_ids, max_missing=None):
+        """
+        Return `(recipe ids, matched, missing)` arrays of every recipe using at
+        least one of `ingredient_ids`, fewest missing ingredients first, then
+        most matched, then oldest recipe.
+        """
+        import numpy as np
+
+        self._ensure_built()
+        # writes replace posting arrays instead of resizing them, so a
+        # snapshot of the references can be read without the lock
+        postings, totals = self._postings, self._totals
+        lists = [postings[pk] for pk in set(ingredient_ids) if pk in postings]
+        if not lists:
+            empty = np.zeros(0, dtype="i8")
+            return empty, empty, empty
+
+        counts = np.bincount(np.concatenate(lists), minlength=len(totals))
+        recipe_ids = np.flatnonzero(counts)
+        matched = counts[recipe_ids]
+        missing = totals[recipe_ids] - matched
+        if max_missing is not None:
+            keep = missing <= max_missing
+            recipe_ids, matched, missing = recipe_ids[keep], matched[keep], missing[keep]
+
+        order = np.lexsort((recipe_ids, -matched, missing))
+        return recipe_ids[order], matched[order], missing[order]
+
+    # incremental updates from signals, ignored until the index is built
+
+    def add(self, recipe_id, ingredient_id):
+        import numpy as np
+
+        with self._lock:
+            if not self.is_built:
+                return
+            posting = self._postings.get(ingredient_id, np.zeros(0, dtype="i8"))
+            i = np.searchsorted(posting, recipe_id)
+            if i < len(posting) and posting[i] == recipe_id:
+                return
+            self._postings[ingredient_id] = np.insert(posting, i, recipe_id)
+            if recipe_id >= len(self._totals):
+                # new recipes: grow with headroom instead of once per recipe
+                size = max(recipe_id + 1, len(self._totals) * 5 // 4)
+                totals = np.zeros(size, dtype=self._totals.dtype)
+                totals[:len(self._totals)] = self._totals
+                self._totals = totals
+            self._totals[recipe_id] += 1
+
+    def remove(self, recipe_id, ingredient_id):
+        import numpy as np
+
+        with self._lock:
+            posting = self._postings.get(ingredient_id)
+            if not self.is_built or posting is None:
+                return
+            i = np.searchsorted(posting, recipe_id)
+            if i == len(posting) or posting[i] != recipe_id:
+                return
+            self._postings[ingredient_id] = np.delete(posting, i)
+            self._totals[recipe_id] -= 1
+
+    def add_recipe(self, recipe_id):
+        """Index every ingredient of a recipe, e.g. after a bulk insert."""
+        if not self.is_built:
+            return
+        for ingredient_id in RecipeIngredient.objects.filter(
+                recipe_id=recipe_id).values_list("ingredient_id", flat=True):
+            self.add(recipe_id, ingredient_id)
+
+
+index = PantryIndex()
+
+
+def find_recipes(ingredient_ids, max_missing=None, limit=50):
+    """
+    Return `(PantryResult list, total number of matches)` for a pantry.
+
+    Ranking runs in memory; the page of recipes and the names of their
+    missing ingredients are then loaded with one query each.
+    """
+    ingredient_ids = set(ingredient_ids)
+    recipe_ids, matched, missing = index.search(ingredient_ids, max_missing)
+    if not len(recipe_ids):
+        return [], 0
+    matches = [
+        PantryMatch(int(pk), int(m), int(x))
+        for pk, m, x in zip(recipe_ids[:limit], matched[:limit], missing[:limit])
+    ]
+
+    ids = [match.recipe_id for match in matches]
+    rows = {row.id: row for row in fetch_recipe_rows(ids)}
+    missing_names = defaultdict(list)
+    for recipe_id, name in RecipeIngredient.objects.filter(recipe_id__in=ids).exclude(
+            ingredient_id__in=ingredient_ids).order_by("ingredient__name").values_list(
+            "recipe_id", "ingredient__name"):
+        missing_names[recipe_id].append(name)
+
+    results = [
+        PantryResult(rows[match.recipe_id], match.matched, match.missing,
+                     missing_names[match.recipe_id])
+        for match in matches if match.recipe_id in rows
+    ]
+    return results, len(recipe_ids)
@@ -0,0 +1,213 @@
+"""
+Chart rendering backend.
+
+Views aggregate the chart data themselves and hand a small, picklable spec
+to `render()`. Drawing happens in a bounded pool of warm worker processes
+using matplotlib's Figure API on the Agg canvas, so a slow render holds
+neither the GIL nor pyplot's global state of the web worker. With
+CHART_RENDER_WORKERS = 0 charts are drawn in-process instead.
+
+matplotlib is only imported on first use. Set CHART_PRELOAD to import it in
+the master process of a preforking server (e.g. gunicorn --preload), so the
+workers share those pages instead of each paying for the import.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+PLACEHOLDER_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="600" height="400">'
+    '<rect width="100%" height="100%" fill="#f8f9fa"/>'
+    '<text x="50%" y="50%" text-anchor="middle" font-family="Arial" '
+    'font-size="18" fill="#6c757d">Chart is being generated, '
+    'please refresh in a moment.</text></svg>'
+).encode("utf-8")
+
+
+# x axis labels of a line chart
+MAX_TICKS = 12
+
+
+class ChartImage(namedtuple("ChartImage", "data fmt is_fallback", defaults=(False,))):
+    """Encoded chart bytes, `is_fallback` marks stale or placeholder images"""
+
+    @property
+    def content_type(self):
+        return CONTENT_TYPES[self.fmt]
+
+
+PLACEHOLDER = ChartImage(PLACEHOLDER_SVG, "svg", is_fallback=True)
+
+
+class RenderUnavailable(Exception):
+    """The pool is saturated, timed out or broken, use a fallback image."""
+
+
+def draw_chart(spec, fmt="png"):
+    """
+    Draw a chart spec and return the encoded image bytes.
+
+    spec keys: kind ("pie", "barh" or "line"), title, labels, values and
+    optionally figsize, xlabel, ylabel, colors.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure
+
+    # a standalone Figure is not registered with pyplot, so it is freed as
+    # soon as it goes out of scope instead of piling up in the worker
+    fig = Figure(figsize=spec.get("figsize", (7, 5)))
+    ax = fig.subplots()
+    labels, values = spec["labels"], spec["values"]
+
+    if spec["kind"] == "pie":
+        ax.pie(values, labels=labels, autopct="%1.1f%%",
+               colors=spec.get("colors"))
+    elif spec["kind"] == "barh":
+        ax.barh(labels, values, color=spec.get("colors", "blue"))
+        ax.invert_yaxis()  # most popular at the top
+    elif spec["kind"] == "line":
+        ax.plot(labels, values, marker="o", linestyle="-",
+                color=spec.get("colors", "blue"))
+        ax.set_ylim(0, max(values) + 1)  # Adding 1 for padding
+        if len(labels) > 1:
+            # label at most MAX_TICKS points, evenly spaced
+            step = -(-len(labels) // MAX_TICKS)
+            ax.set_xticks(range(0, len(labels), step))
+            ax.set_xticklabels(labels[::step], rotation=45)
+    else:
+        raise ValueError(f"Unknown chart kind: {spec['kind']}")
+
+    if spec.get("xlabel"):
+        ax.set_xlabel(spec["xlabel"])
+    if spec.get("ylabel"):
+        ax.set_ylabel(spec["ylabel"])
+    ax.set_title(spec["title"])
+    fig.tight_layout()
+
+    buffer = BytesIO()
+    fig.savefig(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def preload():
+    """Import the chart stack now instead of on the first render."""
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure  # noqa: F401
+    from matplotlib.backends import backend_agg  # noqa: F401
+
+
+def _warm_up():
+    """Process pool initializer: pay matplotlib's import cost once per worker."""
+    draw_chart({"kind": "line", "title": "", "labels": [0], "values": [0]})
+
+
+class ChartRenderer:
+    """
+    Bounded ProcessPoolExecutor for draw_chart().
+
+    Started lazily: the first render() of each process spawns the pool, so
+    that request also waits for the workers to import matplotlib. Nothing
+    starts it at import or in AppConfig.ready(), where management commands
+    and the master of a preforking server would spawn workers they never
+    use; a server can call start() from its post-fork hook instead.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    @property
+    def workers(self):
+        return settings.CHART_RENDER_WORKERS
+
+    def _get_executor(self):
+        with self._lock:
+            # a pool inherited through fork() belongs to the parent process
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_up,
+                )
+                self._pid = os.getpid()
+                # at most two queued jobs per worker, beyond that callers
+                # get the fallback instead of waiting in an unbounded queue
+                self._slots = threading.BoundedSemaphore(self.workers * 2)
+            return self._executor, self._slots
+
+    def start(self):
+        """Spawn and warm every worker now instead of on the first render()."""
+        if self.workers:
+            executor, _ = self._get_executor()
+            for _ in range(self.workers):
+                executor.submit(_warm_up)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def render(self, spec, fmt="png", timeout=None):
+        """Return a ChartImage or raise RenderUnavailable."""
+        return ChartImage(self._draw(spec, fmt, timeout), fmt)
+
+    def _draw(self, spec, fmt, timeout):
+        if not self.workers:
+            return draw_chart(spec, fmt)
+
+        if timeout is None:
+            timeout = settings.CHART_RENDER_TIMEOUT
+        # one deadline for waiting on a slot and on the drawing together
+        deadline = time.monotonic() + timeout
+        executor, slots = self._get_executor()
+        if not slots.acquire(timeout=timeout):
+            raise RenderUnavailable("Chart render queue is full.")
+        try:
+            future = executor.submit(draw_chart, spec, fmt)
+        except BrokenProcessPool:
+            slots.release()
+            self._restart()
+            raise RenderUnavailable("Chart render pool is broken.")
+        except RuntimeError:  # shut down by another thread meanwhile
+            slots.release()
+            raise RenderUnavailable("Chart render pool is restarting.")
+        # held until the job ends, not until this caller gives up on it: a
+        # running job cannot be cancelled and still occupies a worker
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=max(0, deadline - time.monotonic()))
+        except TimeoutError:
+            future.cancel()
+            raise RenderUnavailable("Chart render timed out.")
+        except CancelledError:  # cancelled by shutdown()
+            raise RenderUnavailable("Chart render pool is restarting.")
+        except BrokenProcessPool:
+            self._restart()
+            raise RenderUnavailable("Chart render pool is broken.")
+
+    def _restart(self):
+        logger.exception("Chart render pool is broken, restarting it")
+        self.shutdown()
+
+
+renderer = ChartRenderer()
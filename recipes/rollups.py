@@ -0,0 +1,129 @@
+"""
+Rollup tables behind the dashboard charts.
+
+IngredientRecipeCount holds the number of recipes of every ingredient and
+DailyRecipeCount the number of recipes created per day, so the popular
+ingredients and recipe growth charts read a handful of rows instead of
+grouping RecipeIngredient or Recipe on every render.
+
+Both are kept current by the Recipe and RecipeIngredient signals in
+recipes/signals.py with single-row UPDATEs. `manage.py rebuild_rollups`
+recomputes them from scratch in primary key batches.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Max, Min, Value, When
+from django.db.models.functions import TruncDate
+from django.db.models.lookups import GreaterThanOrEqual
+from django.utils import timezone
+
+from recipe_project.db.utils import upsert_options
+from recipesingredients.models import RecipeIngredient
+from .models import DailyRecipeCount, IngredientRecipeCount, Recipe
+
+
+def _adjust(model, delta, **key):
+    """Add `delta` to the `recipes` column of one row, creating it if needed."""
+    if delta >= 0:
+        new_count = F("recipes") + delta
+    else:
+        # MySQL refuses to compute a negative UNSIGNED value, clamp first
+        new_count = Case(
+            When(GreaterThanOrEqual(F("recipes"), -delta), then=F("recipes") + delta),
+            default=Value(0),
+        )
+    if model.objects.filter(**key).update(recipes=new_count) or delta <= 0:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(recipes=delta, **key)
+    except IntegrityError:  # created concurrently, add to that row instead
+        model.objects.filter(**key).update(recipes=new_count)
+
+
+def recipe_day(recipe):
+    """The day TruncDate("created_at") puts a recipe in."""
+    return timezone.localdate(recipe.created_at)
+
+
+def recipe_added(recipe):
+    _adjust(DailyRecipeCount, 1, day=recipe_day(recipe))
+
+
+def recipe_removed(recipe):
+    _adjust(DailyRecipeCount, -1, day=recipe_day(recipe))
+
+
+def link_added(ingredient_id):
+    _adjust(IngredientRecipeCount, 1, ingredient_id=ingredient_id)
+
+
+def link_removed(ingredient_id):
+    _adjust(IngredientRecipeCount, -1, ingredient_id=ingredient_id)
+
+
+def recount_ingredients(ingredient_ids):
+    """Recount some ingredients, e.g. after a bulk insert of links."""
+    ingredient_ids = set(ingredient_ids)
+    counts = dict(RecipeIngredient.objects.filter(
+        ingredient_id__in=ingredient_ids).order_by().values(
+        "ingredient_id").annotate(n=Count("pk")).values_list("ingredient_id", "n"))
+    IngredientRecipeCount.objects.bulk_create(
+        [IngredientRecipeCount(ingredient_id=pk, recipes=counts.get(pk, 0))
+         for pk in ingredient_ids],
+        **upsert_options(IngredientRecipeCount.objects, ["ingredient"], ["recipes"]),
+    )
+
+
+def top_ingredients(limit=10):
+    """`(ingredient name, recipes)` of the most used ingredients."""
+    return list(IngredientRecipeCount.objects.filter(recipes__gt=0).order_by(
+        "-recipes", "ingredient__name").values_list(
+        "ingredient__name", "recipes")[:limit])
+
+
+def daily_recipes():
+    """`(day, recipes)` of every day with recipes, oldest first."""
+    return list(DailyRecipeCount.objects.filter(recipes__gt=0).order_by(
+        "day").values_list("day", "recipes"))
+
+
+def rebuild(batch_size=10000):
+    """
+    Recompute both tables, one primary key range of links or recipes per
+    query. Returns `(ingredient rows, day rows)` written.
+    """
+    ingredient_counts = Counter()
+    for low, high in _ranges(RecipeIngredient, batch_size):
+        ingredient_counts.update(dict(RecipeIngredient.objects.filter(
+            pk__gte=low, pk__lt=high).order_by().values("ingredient_id").annotate(
+            n=Count("pk")).values_list("ingredient_id", "n")))
+
+    day_counts = Counter()
+    for low, high in _ranges(Recipe, batch_size):
+        day_counts.update(dict(Recipe.objects.filter(
+            pk__gte=low, pk__lt=high).order_by().annotate(
+            day=TruncDate("created_at")).values("day").annotate(
+            n=Count("pk")).values_list("day", "n")))
+
+    with transaction.atomic():
+        IngredientRecipeCount.objects.all().delete()
+        IngredientRecipeCount.objects.bulk_create(
+            [IngredientRecipeCount(ingredient_id=pk, recipes=n)
+             for pk, n in ingredient_counts.items()],
+            batch_size=batch_size)
+        DailyRecipeCount.objects.all().delete()
+        DailyRecipeCount.objects.bulk_create(
+            [DailyRecipeCount(day=day, recipes=n) for day, n in day_counts.items()],
+            batch_size=batch_size)
+    return len(ingredient_counts), len(day_counts)
+
+
+def _ranges(model, batch_size):
+    """`[low, high)` primary key ranges covering the table."""
+    bounds = model.objects.aggregate(low=Min("pk"), high=Max("pk"))
+    if bounds["low"] is None:
+        return
+    for start in range(bounds["low"], bounds["high"] + 1, batch_size):
+        yield start, start + batch_size
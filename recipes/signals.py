@@ -0,0 +1,96 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from ingredients.models import Ingredient
+from recipesingredients.models import RecipeIngredient
+from recipesingredients.signals import ingredients_added
+from . import fulltext, pantry, rollups, thumbnails
+from .cache import bump_data_version, bump_recipe_version, invalidate_tags
+from .models import Recipe
+from .similarity import update_recipe
+
+
+def update_signature(recipe_id):
+    # after commit: a recipe deleted with its links needs no new signature
+    transaction.on_commit(partial(update_recipe, recipe_id))
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def recipe_ingredient_saved(sender, instance, created, **kwargs):
+    """ keep the search indexes and similarity signatures in step """
+    previous = getattr(instance, "previous_ids", None)
+    moved = not created and previous and previous != (instance.recipe_id, instance.ingredient_id)
+    if moved:
+        # an edit pointing the link at another recipe or ingredient
+        old_recipe_id, old_ingredient_id = previous
+        bump_recipe_version(old_recipe_id)
+        pantry.index.remove(old_recipe_id, old_ingredient_id)
+        fulltext.index.link_changed(old_recipe_id, old_ingredient_id, added=False)
+        rollups.link_removed(old_ingredient_id)
+        if old_recipe_id != instance.recipe_id:
+            update_signature(old_recipe_id)
+    bump_recipe_version(instance.recipe_id)
+    pantry.index.add(instance.recipe_id, instance.ingredient_id)
+    if created or moved:
+        fulltext.index.link_changed(instance.recipe_id, instance.ingredient_id, added=True)
+        rollups.link_added(instance.ingredient_id)
+    update_signature(instance.recipe_id)
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_deleted(sender, instance, **kwargs):
+    """ also sent for the links a Recipe or Ingredient delete cascades to """
+    bump_data_version()
+    bump_recipe_version(instance.recipe_id)
+    pantry.index.remove(instance.recipe_id, instance.ingredient_id)
+    fulltext.index.link_changed(instance.recipe_id, instance.ingredient_id, added=False)
+    rollups.link_removed(instance.ingredient_id)
+    update_signature(instance.recipe_id)
+
+
+@receiver(ingredients_added)
+def recipe_ingredients_bulk_added(sender, recipe, **kwargs):
+    bump_recipe_version(recipe.pk)
+    pantry.index.add_recipe(recipe.pk)
+    fulltext.index.refresh_recipe(recipe.pk)
+    rollups.recount_ingredients(RecipeIngredient.objects.filter(
+        recipe=recipe).values_list("ingredient_id", flat=True))
+    update_signature(recipe.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    # also on create: a reused primary key must not find an old fragment
+    bump_recipe_version(instance.pk)
+    invalidate_tags("recipes")
+    fulltext.index.recipe_saved(instance.pk, instance.name)
+    if created:
+        rollups.recipe_added(instance)
+    if not instance.pic_hash:
+        thumbnails.schedule(Recipe, instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    # queryset and admin deletes skip the model's methods
+    bump_data_version()
+    bump_recipe_version(instance.pk)
+    invalidate_tags("recipes")
+    fulltext.index.recipe_deleted(instance.pk)
+    rollups.recipe_removed(instance)
+
+
+@receiver(thumbnails.thumbnails_ready, sender=Recipe)
+def recipe_thumbnails_ready(sender, pks, **kwargs):
+    """ cached pages still point at the full-size picture """
+    for pk in pks:
+        bump_recipe_version(pk)
+    invalidate_tags("recipes")
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, **kwargs):
+    fulltext.index.ingredient_saved(instance.pk, instance.name, instance.introduction)
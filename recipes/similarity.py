@@ -0,0 +1,180 @@
+"""
+Similar recipes by ingredient-set Jaccard similarity, using MinHash + LSH.
+
+Every recipe gets a MinHash signature of NUM_PERM values: for each of
+NUM_PERM random hash functions `(a * id + b) mod PRIME`, the minimum over
+its ingredient ids. The fraction of equal positions in two signatures
+estimates the Jaccard similarity of the two ingredient sets.
+
+For the lookup the signature is cut into BANDS bands of ROWS values and
+each band is hashed into a bucket (RecipeSignatureBand, indexed on
+band + bucket). Recipes sharing at least one bucket are the candidates,
+so a lookup reads a few index ranges instead of every signature. With
+16 bands of 4 rows, pairs above ~0.5 similarity are found with high
+probability and pairs below ~0.2 rarely become candidates.
+
+Signatures are written in NumPy batches by `manage.py build_recipe_signatures`
+and per recipe by update_recipe() after RecipeIngredient writes commit.
+"""
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.db.models import Count, Q
+
+from recipesingredients.models import RecipeIngredient
+from .models import RecipeSignature, RecipeSignatureBand
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+PRIME = (1 << 31) - 1  # a * id + b stays inside int64
+SEED = 1  # changing it, or NUM_PERM / BANDS, requires a rebuild
+
+# candidates estimated below this are not shown
+MIN_SIMILARITY = 0.2
+# signatures compared per lookup, those sharing the most buckets first
+MAX_CANDIDATES = 200
+
+SimilarRecipe = namedtuple("SimilarRecipe", "id name similarity")
+
+_params = None
+
+
+def _hash_params():
+    """Hash function and band weights, the same in every process."""
+    global _params
+    if _params is None:
+        import numpy as np
+        rng = np.random.RandomState(SEED)
+        a = rng.randint(1, PRIME, size=NUM_PERM, dtype=np.int64)
+        b = rng.randint(0, PRIME, size=NUM_PERM, dtype=np.int64)
+        band_weights = rng.randint(1, 1 << 62, size=ROWS, dtype=np.int64).astype(np.uint64)
+        _params = (a, b, band_weights)
+    return _params
+
+
+def signatures(recipe_ids, ingredient_ids):
+    """
+    MinHash signatures of many recipes at once.
+
+    `recipe_ids` and `ingredient_ids` are parallel arrays of links, sorted by
+    recipe id. Returns `(unique recipe ids, uint32 matrix of NUM_PERM columns)`.
+    """
+    import numpy as np
+
+    a, b, _ = _hash_params()
+    recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+    ingredient_ids = np.asarray(ingredient_ids, dtype=np.int64) % PRIME
+    if not len(recipe_ids):
+        return recipe_ids, np.zeros((0, NUM_PERM), dtype=np.uint32)
+
+    hashes = (ingredient_ids[:, None] * a + b) % PRIME
+    starts = np.r_[0, np.flatnonzero(np.diff(recipe_ids)) + 1]
+    return recipe_ids[starts], np.minimum.reduceat(hashes, starts, axis=0).astype(np.uint32)
+
+
+def band_buckets(matrix):
+    """Signed 64 bit bucket of every band, shape (recipes, BANDS)."""
+    import numpy as np
+
+    _, _, band_weights = _hash_params()
+    bands = matrix.astype(np.uint64).reshape(len(matrix), BANDS, ROWS)
+    # uint64 arithmetic wraps around, which is all a bucket hash needs
+    with np.errstate(over="ignore"):
+        buckets = (bands * band_weights).sum(axis=2)
+    return buckets.view(np.int64)
+
+
+def save_signatures(recipe_ids, matrix, replace=True):
+    """Write the signature and band rows, replacing old ones if `replace`."""
+    import numpy as np
+
+    buckets = band_buckets(matrix)
+    with transaction.atomic():
+        if replace:
+            RecipeSignature.objects.filter(recipe_id__in=recipe_ids).delete()
+            RecipeSignatureBand.objects.filter(recipe_id__in=recipe_ids).delete()
+        _insert(RecipeSignature, ["recipe_id", "signature"],
+                [(int(pk), row.tobytes()) for pk, row in zip(recipe_ids, matrix)])
+        _insert(RecipeSignatureBand, ["recipe_id", "band", "bucket"],
+                np.column_stack([
+                    np.repeat(recipe_ids, BANDS),
+                    np.tile(np.arange(BANDS), len(recipe_ids)),
+                    buckets.ravel(),
+                ]).tolist())
+
+
+def _insert(model, columns, rows):
+    """
+    Plain executemany INSERT: a rebuild writes BANDS rows per recipe and
+    building that many model instances costs far more than the SQL.
+    """
+    quote = connection.ops.quote_name
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        quote(model._meta.db_table),
+        ", ".join(quote(column) for column in columns),
+        ", ".join(["%s"] * len(columns)))
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def update_recipe(recipe_id):
+    """Recompute one recipe's signature from its current ingredients."""
+    ingredient_ids = list(RecipeIngredient.objects.filter(
+        recipe_id=recipe_id).values_list("ingredient_id", flat=True))
+    if not ingredient_ids:
+        # deleted recipe or no ingredients left: nothing to compare
+        RecipeSignature.objects.filter(recipe_id=recipe_id).delete()
+        RecipeSignatureBand.objects.filter(recipe_id=recipe_id).delete()
+        return
+    ids, matrix = signatures([recipe_id] * len(ingredient_ids), ingredient_ids)
+    save_signatures(ids, matrix)
+
+
+def similar_recipes(recipe_id, limit=5):
+    """
+    Up to `limit` SimilarRecipe tuples, most similar first.
+
+    Three queries: the recipe's own buckets, the MAX_CANDIDATES recipes
+    sharing the most of them, then the signatures and names of those and of
+    the recipe itself. A common ingredient set can put thousands of recipes
+    in one bucket, so only the best candidates are loaded and compared.
+    """
+    import numpy as np
+
+    own = list(RecipeSignatureBand.objects.filter(
+        recipe_id=recipe_id).values_list("band", "bucket"))
+    if not own:
+        return []
+
+    shared_bucket = Q()
+    for band, bucket in own:
+        shared_bucket |= Q(band=band, bucket=bucket)
+    # evaluated on its own: MySQL refuses LIMIT in an IN subquery
+    candidate_ids = list(RecipeSignatureBand.objects.filter(shared_bucket).exclude(
+        recipe_id=recipe_id).values("recipe_id").annotate(shared=Count("id")).order_by(
+        "-shared", "recipe_id").values_list("recipe_id", flat=True)[:MAX_CANDIDATES])
+    if not candidate_ids:
+        return []
+    rows = RecipeSignature.objects.filter(
+        recipe_id__in=candidate_ids + [recipe_id]
+    ).values_list("recipe_id", "recipe__name", "signature")
+
+    signature, candidates = None, []
+    for pk, name, data in rows:
+        row = np.frombuffer(bytes(data), dtype=np.uint32)
+        if pk == recipe_id:
+            signature = row
+        else:
+            candidates.append((pk, name, row))
+    if signature is None or not candidates:
+        return []
+
+    matrix = np.vstack([row for _, _, row in candidates])
+    scores = (matrix == signature).mean(axis=1)
+    ranked = sorted(
+        (SimilarRecipe(pk, name, float(score))
+         for (pk, name, _), score in zip(candidates, scores)
+         if score >= MIN_SIMILARITY),
+        key=lambda similar: (-similar.similarity, similar.id))
+    return ranked[:limit]
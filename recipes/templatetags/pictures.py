@@ -0,0 +1,28 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+from ..thumbnails import PRESETS, srcset, thumbnail_name
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(obj, preset, alt="", css_class="", sizes=None):
+    """
+    <picture> of `obj.pic` with WebP and JPEG srcsets of a thumbnail preset,
+    or a plain <img> of the original until its thumbnails exist.
+    """
+    if not obj.pic_hash:
+        return format_html('<img src="{}" class="{}" alt="{}" loading="lazy">',
+                           obj.pic.url, css_class, alt)
+    widths = PRESETS[preset].widths
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" loading="lazy">'
+        '</picture>',
+        srcset(obj.pic_hash, preset, "webp"), sizes or PRESETS[preset].sizes,
+        default_storage.url(thumbnail_name(obj.pic_hash, preset, widths[0], "jpg")),
+        srcset(obj.pic_hash, preset, "jpg"), sizes or PRESETS[preset].sizes,
+        css_class, alt)
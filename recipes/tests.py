@@ -1,12 +1,46 @@
-from django.test import TestCase
+import base64
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from io import BytesIO, StringIO
+from unittest import mock
+
+from PIL import Image
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.utils import ConnectionHandler
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth.models import User
 
-from recipes.models import Recipe
+from recipes.models import (DailyRecipeCount, IngredientRecipeCount, Recipe,
+                            RecipeSignature, RecipeSignatureBand)
 from recipesingredients.models import RecipeIngredient
 from ingredients.models import Ingredient
+from ingredients.choices import get_ingredient_choices
+from ingredients.fuzzy import index as fuzzy_index
 
 from recipes.forms import RecipeForm, RecipeIngredientForm, IngredientSearchForm
+from recipes.cache import chart_cache, policies
+from recipes.pagination import KeysetPaginator
+from recipes.pantry import find_recipes, index as pantry_index
+from recipes.similarity import signatures, similar_recipes
+from recipes.fulltext import SearchIndex, index as fulltext_index, tokenize
+from recipes.thumbnails import thumbnail_name
+from recipes.rendering import ChartRenderer, RenderUnavailable, PLACEHOLDER
+from recipe_project.db.pool import get_pool
+from recipe_project.metrics import registry as metrics_registry
+from recipes.growth import GrowthQuery, growth_series
+from recipes.rollups import daily_recipes, recount_ingredients, top_ingredients
+from recipes.utils import generate_chart, get_chart_data
 
 
 class RecipeModelTest(TestCase):
@@ -163,3 +197,1053 @@ class RecipeViewsTest(TestCase):
         response = self.client.get(reverse('recipes:ingredient_search'))
         # Should redirect to login
         self.assertNotEqual(response.status_code, 200)
+
+
+class RecipeListViewTest(TestCase):
+    def setUp(self):
+        """Create a logged-in user."""
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass")
+        self.client.login(username="testuser", password="testpass")
+
+    def create_recipes(self, count):
+        for i in range(count):
+            Recipe.objects.create(
+                name=f"Recipe {i}", cooking_time=5, created_by=self.user)
+
+    def test_query_count_is_constant(self):
+        """Test if the list page runs the same queries for 3 or 40 recipes."""
+        self.create_recipes(3)
+        # session + user + one page of recipes joined with their author
+        with self.assertNumQueries(3):
+            self.client.get(reverse("recipes:recipe_list"))
+
+        self.create_recipes(37)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("recipes:recipe_list"))
+
+        # a deep page costs the same as the first one
+        with self.assertNumQueries(3):
+            self.client.get(reverse("recipes:recipe_list"),
+                            {"cursor": response.context["page_obj"].next_cursor})
+
+    def test_cursor_pagination(self):
+        """Test if following next cursors walks every recipe exactly once."""
+        self.create_recipes(30)
+        seen = []
+        cursor = None
+        while True:
+            params = {"cursor": cursor} if cursor else {}
+            response = self.client.get(reverse("recipes:recipe_list"), params)
+            page = response.context["page_obj"]
+            seen.extend(recipe.pk for recipe in page.object_list)
+            cursor = page.next_cursor
+            if not cursor:
+                break
+        expected = list(Recipe.objects.order_by(
+            "created_at", "id").values_list("id", flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_pages_use_the_ordering_index(self):
+        """Test if a page is read from the (created_at, id) index, not sorted."""
+        self.create_recipes(3)
+        paginator = KeysetPaginator(Recipe.objects.all(), ("created_at", "id"), 2)
+        page = paginator.page(paginator.page().next_cursor)
+        plan = page.queryset[:3].explain()
+        self.assertIn("recipe_created_at_id_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_invalid_cursor(self):
+        """Test if a tampered cursor returns 404."""
+        response = self.client.get(
+            reverse("recipes:recipe_list"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+        for values in (b"[null, null]", b"[null]", b'["2024-01-01T00:00:00", 1, 2]'):
+            cursor = base64.urlsafe_b64encode(values).decode("ascii").rstrip("=")
+            response = self.client.get(reverse("recipes:recipe_list"), {"cursor": cursor})
+            self.assertEqual(response.status_code, 404)
+
+
+@override_settings(CHART_RENDER_WORKERS=0)
+class ChartCacheTest(TestCase):
+    def setUp(self):
+        """Create one recipe with one ingredient and reset the counters."""
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass")
+        self.recipe = Recipe.objects.create(
+            name="Onion Soup", cooking_time=30, created_by=self.user)
+        self.onion = Ingredient.objects.create(name="Onion")
+        RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=self.onion, quantity="1")
+        chart_cache.reset_stats()
+
+    def test_repeat_views_hit_the_cache(self):
+        """Test if the second request for a chart is a cache hit without queries."""
+        chart, error = generate_chart("#2")
+        self.assertIsNone(error)
+        with self.assertNumQueries(0):
+            cached, error = generate_chart("#2")
+        self.assertEqual(cached, chart)
+        self.assertEqual(chart_cache.stats()["hits"], 1)
+        self.assertEqual(chart_cache.stats()["misses"], 1)
+
+    def test_writes_invalidate_the_cache(self):
+        """Test if saving or deleting recipe data forces a re-render."""
+        generate_chart("#1", "Onion")
+        self.recipe.save()
+        generate_chart("#1", "Onion")
+        self.assertEqual(chart_cache.stats()["misses"], 2)
+
+        garlic = Ingredient.objects.create(name="Garlic")
+        link = RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=garlic, quantity="2 cloves")
+        generate_chart("#1", "Onion")
+        link.delete()
+        generate_chart("#1", "Onion")
+        self.assertEqual(chart_cache.stats()["misses"], 4)
+        self.assertEqual(chart_cache.stats()["hits"], 0)
+
+    def test_charts_expire_without_a_version_bump(self):
+        """Test if charts and ETags are renewed after CHART_CACHE_TTL, as other processes' writes are not seen."""
+        etag = chart_cache.etag("#2")
+        generate_chart("#2")
+        later = time.time() + settings.CHART_CACHE_TTL + 1
+        with mock.patch("time.time", return_value=later):  # cache expiry and ETag window
+            self.assertNotEqual(chart_cache.etag("#2"), etag)
+            generate_chart("#2")
+        self.assertEqual(chart_cache.stats()["misses"], 2)
+
+    def test_errors_are_not_cached(self):
+        """Test if a missing ingredient is looked up again on the next request."""
+        self.assertEqual(generate_chart("#1", "Garlic"), (None, "Ingredient not found."))
+        garlic = Ingredient.objects.create(name="Garlic")
+        RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=garlic, quantity="2 cloves")
+        chart, error = generate_chart("#1", "Garlic")
+        self.assertIsNone(error)
+
+    def test_render_failure_falls_back(self):
+        """Test if a timed out render returns the last chart, or a placeholder."""
+        chart, _ = generate_chart("#2")
+        self.recipe.save()  # new data version
+        with mock.patch("recipes.utils.renderer.render",
+                        side_effect=RenderUnavailable):
+            stale, _ = generate_chart("#2")
+            self.assertEqual(stale.data, chart.data)
+            self.assertTrue(stale.is_fallback)
+            self.assertEqual(generate_chart("#3"), (PLACEHOLDER, None))
+        # fallbacks are not cached under the new version
+        self.assertEqual(chart_cache.stats()["misses"], 3)
+
+
+class ChartRendererTest(TestCase):
+    spec = {"kind": "barh", "title": "Test", "labels": ["Salt"], "values": [3]}
+
+    @override_settings(CHART_RENDER_WORKERS=1, CHART_RENDER_TIMEOUT=60)
+    def test_render_in_worker_process(self):
+        """Test if the process pool returns PNG and SVG bytes."""
+        renderer = ChartRenderer()
+        try:
+            self.assertTrue(renderer.render(self.spec).data.startswith(b"\x89PNG"))
+            self.assertIn(b"<svg", renderer.render(self.spec, fmt="svg").data)
+        finally:
+            renderer.shutdown()
+
+    @override_settings(CHART_RENDER_WORKERS=1)
+    def test_timed_out_job_keeps_its_slot(self):
+        """Test if a job still running after its timeout blocks new ones until it ends."""
+        finished = threading.Event()
+        renderer = ChartRenderer()
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        slots = threading.BoundedSemaphore(1)
+        with mock.patch.object(renderer, "_get_executor", return_value=(executor, slots)), \
+                mock.patch("recipes.rendering.draw_chart", lambda *args: finished.wait(10)):
+            with self.assertRaisesMessage(RenderUnavailable, "timed out"):
+                renderer.render(self.spec, timeout=0.05)
+            start = time.monotonic()
+            with self.assertRaisesMessage(RenderUnavailable, "queue is full"):
+                renderer.render(self.spec, timeout=0.05)
+            self.assertLess(time.monotonic() - start, 1)
+            finished.set()
+            executor.shutdown(wait=True)
+        self.assertTrue(slots.acquire(blocking=False))
+
+    @override_settings(CHART_RENDER_WORKERS=1)
+    def test_pool_shut_down_meanwhile(self):
+        """Test if submitting to a pool another thread shut down is a fallback, not an error."""
+        renderer = ChartRenderer()
+        executor = mock.Mock(submit=mock.Mock(side_effect=RuntimeError("shutdown")))
+        slots = threading.BoundedSemaphore(1)
+        with mock.patch.object(renderer, "_get_executor", return_value=(executor, slots)):
+            with self.assertRaises(RenderUnavailable):
+                renderer.render(self.spec)
+        self.assertTrue(slots.acquire(blocking=False))
+
+    @override_settings(CHART_RENDER_WORKERS=0)
+    def test_render_inline(self):
+        """Test if charts are drawn in-process when the pool is disabled."""
+        image = ChartRenderer().render(self.spec)
+        self.assertTrue(image.data.startswith(b"\x89PNG"))
+
+
+@override_settings(CHART_RENDER_WORKERS=0)
+class ChartImageViewTest(TestCase):
+    def setUp(self):
+        """Create a logged-in user and one recipe with one ingredient."""
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass")
+        self.client.login(username="testuser", password="testpass")
+        self.recipe = Recipe.objects.create(
+            name="Onion Soup", cooking_time=30, created_by=self.user)
+        RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=Ingredient.objects.create(name="Onion"),
+            quantity="1")
+        self.url = reverse("recipes:chart", args=["difficulty", "png"])
+
+    def test_png_with_etag(self):
+        """Test if the endpoint streams PNG bytes with a strong ETag."""
+        response = self.client.get(self.url, {"ingredient": "Onion"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertTrue(response.content.startswith(b"\x89PNG"))
+        self.assertFalse(response["ETag"].startswith("W/"))
+
+    def test_svg_format(self):
+        """Test if the endpoint serves SVG as well."""
+        response = self.client.get(
+            reverse("recipes:chart", args=["popular-ingredients", "svg"]))
+        self.assertEqual(response["Content-Type"], "image/svg+xml")
+        self.assertIn(b"<svg", response.content)
+
+    def test_if_none_match(self):
+        """Test if a matching ETag returns 304 until the data changes."""
+        etag = self.client.get(self.url, {"ingredient": "Onion"})["ETag"]
+        response = self.client.get(
+            self.url, {"ingredient": "Onion"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.recipe.save()
+        response = self.client.get(
+            self.url, {"ingredient": "Onion"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_unknown_chart_or_ingredient(self):
+        """Test if unknown charts and ingredients return 404."""
+        response = self.client.get(reverse("recipes:chart", args=["nope", "png"]))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(self.url, {"ingredient": "Garlic"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_search_page_links_to_endpoint(self):
+        """Test if the search page references the chart URL instead of inline data."""
+        response = self.client.get(
+            reverse("recipes:ingredient_search"), {"ingredient": "Onion"})
+        self.assertEqual(response.context["chart"], self.url + "?ingredient=Onion")
+        self.assertNotContains(response, "data:image/png;base64")
+
+
+@override_settings(CHART_RENDER_WORKERS=0)
+class IngredientSearchQueryTest(TestCase):
+    def setUp(self):
+        """Create a logged-in user and an ingredient used by a few recipes."""
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass")
+        self.client.login(username="testuser", password="testpass")
+        self.onion = Ingredient.objects.create(name="Onion")
+        Ingredient.objects.create(name="Saffron")
+        fuzzy_index.build()  # name matching is served from memory
+
+    def add_recipes(self, count):
+        for i in range(count):
+            recipe = Recipe.objects.create(
+                name=f"Onion dish {i}", cooking_time=5 + i, created_by=self.user)
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=self.onion, quantity="1")
+
+    def search(self, name):
+        return self.client.get(
+            reverse("recipes:ingredient_search"), {"ingredient": name})
+
+    def test_query_count_is_fixed(self):
+        """Test if a search is session + user + one joined query for any result size."""
+        self.add_recipes(2)
+        with self.assertNumQueries(3):
+            response = self.search("Onion")
+        self.assertEqual(len(response.context["recipes"]), 2)
+
+        self.add_recipes(20)
+        with self.assertNumQueries(3):
+            response = self.search("Onion")
+        self.assertEqual(len(response.context["recipes"]), 22)
+
+    def test_pie_chart_reuses_search_result(self):
+        """Test if the pie chart after a search needs no recipe query."""
+        self.add_recipes(3)
+        chart = self.search("Onion").context["chart"]
+        with self.assertNumQueries(2):  # session + user
+            response = self.client.get(chart)
+        self.assertEqual(response.status_code, 200)
+
+    def test_deletes_invalidate_cached_results(self):
+        """Test if queryset deletes of recipes and ingredients drop cached searches."""
+        self.add_recipes(2)
+        self.assertEqual(len(self.search("Onion").context["recipes"]), 2)
+        Recipe.objects.filter(name="Onion dish 0").delete()
+        self.assertEqual(len(self.search("Onion").context["recipes"]), 1)
+        Ingredient.objects.filter(name="Onion").delete()
+        self.assertEqual(self.search("Onion").context["error"], "Ingredient not found.")
+
+    def test_results_table_escapes_names(self):
+        """Test if recipe names are escaped in the results table."""
+        recipe = Recipe.objects.create(
+            name="<b>Onion</b> & Co", cooking_time=5, created_by=self.user)
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=self.onion, quantity="1")
+        response = self.search("Onion")
+        self.assertContains(response, "&lt;b&gt;Onion&lt;/b&gt; &amp; Co")
+        self.assertContains(response, f'href="{recipe.get_absolute_url()}"')
+
+    def test_missing_or_unused_ingredient(self):
+        """Test if unknown and unused ingredients report an error without a chart."""
+        response = self.search("Garlic")
+        self.assertEqual(response.context["error"], "Ingredient not found.")
+        self.assertIsNone(response.context["chart"])
+        response = self.search("Saffron")
+        self.assertEqual(response.context["error"], "No recipes contain this ingredient.")
+        self.assertIsNone(response.context["chart"])
+
+    def test_case_and_typos(self):
+        """Test if the name is matched ignoring case and typos get a suggestion."""
+        self.add_recipes(2)
+        response = self.search("onion")
+        self.assertEqual(len(response.context["recipes"]), 2)
+        self.assertIn("Onion", response.context["chart"])
+        with self.assertNumQueries(3):  # session + user + search
+            response = self.search("Onoin")
+        self.assertEqual(response.context["error"], "Ingredient not found.")
+        self.assertEqual(response.context["did_you_mean"], "Onion")
+        self.assertContains(response, 'href="?ingredient=Onion"')
+
+
+class ImportTimeCommandTest(TestCase):
+    def test_chart_libraries_load_lazily(self):
+        """Test if a fresh worker serves the URLconf without matplotlib or pandas."""
+        out = StringIO()
+        call_command("importtime", "--forbid", "matplotlib", "pandas", stdout=out)
+        self.assertIn("django", out.getvalue())
+
+
+class RandomRecipeTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass")
+
+    def create_recipes(self, count):
+        return [Recipe.objects.create(name=f"Recipe {i}", cooking_time=5,
+                                      created_by=self.user)
+                for i in range(count)]
+
+    def test_no_recipes(self):
+        """Test if an empty table returns None."""
+        self.assertIsNone(Recipe.objects.random())
+
+    def test_one_primary_key_query(self):
+        """Test if a pick is a single primary key lookup once the id range is cached."""
+        recipes = self.create_recipes(10)
+        Recipe.objects.random()
+        with self.assertNumQueries(1):
+            self.assertIn(Recipe.objects.random(), recipes)
+
+    def test_gaps_and_stale_range(self):
+        """Test if deleted ids and a stale cached range still return a recipe."""
+        recipes = self.create_recipes(20)
+        Recipe.objects.random()  # cache the id range
+        Recipe.objects.exclude(pk=recipes[0].pk).delete()
+        for _ in range(10):
+            self.assertEqual(Recipe.objects.random(), recipes[0])
+
+    def test_logout_page_features_a_recipe(self):
+        """Test if the logout page shows a random recipe."""
+        recipe = self.create_recipes(1)[0]
+        response = self.client.get(reverse("logout_success"))
+        self.assertEqual(response.context["recipe"], recipe)
+
+
+class IngredientChoicesTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="password123")
+        self.client.login(username="testuser", password="password123")
+        self.ingredients = [Ingredient.objects.create(name=f"Ingredient {i}")
+                            for i in range(20)]
+        self.recipe = Recipe.objects.create(name="Soup", cooking_time=5,
+                                            created_by=self.user)
+        self.url = reverse("recipes:recipe_add_ingredients", args=[self.recipe.id])
+
+    def post_data(self, count):
+        data = {"form-TOTAL_FORMS": str(count), "form-INITIAL_FORMS": "0"}
+        for i in range(count):
+            data[f"form-{i}-ingredient"] = str(self.ingredients[i].id)
+            data[f"form-{i}-quantity"] = "1 cup"
+        return data
+
+    def count_queries(self, request):
+        with CaptureQueriesContext(connection) as queries:
+            request()
+        return len(queries)
+
+    def test_get_queries_do_not_grow_with_forms(self):
+        """Test if rendering 2 or 10 ingredient forms costs the same queries."""
+        get_ingredient_choices()  # warm the shared choices cache
+        counts = []
+        for num in (2, 10):
+            Recipe.objects.filter(pk=self.recipe.pk).update(ingredient_num=num)
+            counts.append(self.count_queries(lambda: self.client.get(self.url)))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_post_queries_do_not_grow_with_forms(self):
+        """Test if validating 2 or 10 ingredient forms costs the same queries."""
+        get_ingredient_choices()
+        counts = [self.count_queries(lambda: self.client.post(self.url, self.post_data(num)))
+                  for num in (2, 10)]
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(RecipeIngredient.objects.filter(recipe=self.recipe).count(), 10)
+
+    def test_choices_refresh_after_ingredient_change(self):
+        """Test if a new ingredient shows up in the cached choices."""
+        self.assertEqual(len(get_ingredient_choices()), 20)
+        Ingredient.objects.create(name="Saffron")
+        self.assertIn("saffron", get_ingredient_choices().by_name)
+
+    def test_choices_expire_without_a_version_bump(self):
+        """Test if ingredients written by another process show up after the TTL."""
+        get_ingredient_choices()
+        Ingredient.objects.bulk_create([Ingredient(name="Sumac")])  # no signal, no bump
+        self.assertNotIn("sumac", get_ingredient_choices().by_name)
+        later = time.time() + settings.INGREDIENT_CHOICES_TTL + 1
+        with mock.patch("django.core.cache.backends.locmem.time.time", return_value=later):
+            self.assertIn("sumac", get_ingredient_choices().by_name)
+
+    def test_invalid_choice(self):
+        """Test if an unknown ingredient id is rejected without a lookup."""
+        form = RecipeIngredientForm(
+            data={"ingredient": "999999", "quantity": "1"},
+            ingredient_choices=get_ingredient_choices())
+        with self.assertNumQueries(0):
+            self.assertFalse(form.is_valid())
+        self.assertIn("ingredient", form.errors)
+
+    @override_settings(INGREDIENT_SELECT_MAX_CHOICES=5)
+    def test_autocomplete_for_large_catalog(self):
+        """Test if a large catalog switches to a typed name input."""
+        form = RecipeIngredientForm(
+            data={"ingredient": " ingredient 3 ", "quantity": "1"},
+            ingredient_choices=get_ingredient_choices())
+        self.assertIn('type="text"', str(form["ingredient"]))
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data["ingredient"].pk, self.ingredients[3].pk)
+
+
+class PantrySearchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="password123")
+        self.client.login(username="testuser", password="password123")
+        self.recipes = {}
+        for name, ingredients in [("Omelette", ["Egg", "Milk"]),
+                                  ("Pancake", ["Egg", "Milk", "Flour"]),
+                                  ("Bread", ["Flour", "Yeast", "Salt"]),
+                                  ("Salad", ["Lettuce"])]:
+            recipe = Recipe.objects.create(name=name, cooking_time=5, created_by=self.user)
+            RecipeIngredient.objects.add_to_recipe(recipe, [(i, "1") for i in ingredients])
+            self.recipes[name] = recipe
+        pantry_index.invalidate()
+
+    def search(self, ingredients, **params):
+        response = self.client.get(reverse("recipes:pantry_search"),
+                                   {"ingredients": ingredients, **params})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def ranking(self, response):
+        return [(r.recipe.name, r.matched, r.missing) for r in response.context["results"]]
+
+    def test_ranked_by_missing_ingredients(self):
+        """Test if complete recipes come first, then missing one, two..."""
+        response = self.search("egg, milk, flour")
+        self.assertEqual(self.ranking(response), [
+            ("Pancake", 3, 0), ("Omelette", 2, 0), ("Bread", 1, 2)])
+        self.assertEqual(response.context["results"][2].missing_names, ["Salt", "Yeast"])
+        self.assertEqual(response.context["total"], 3)
+
+    def test_max_missing_and_unknown_names(self):
+        """Test if max_missing filters and unknown names are reported."""
+        response = self.search("Egg, Flour, Unicorn", max_missing=1)
+        self.assertEqual(self.ranking(response), [("Pancake", 2, 1), ("Omelette", 1, 1)])
+        self.assertEqual(response.context["unknown"], ["Unicorn"])
+        response = self.search("Unicorn")
+        self.assertEqual(response.context["error"], "No recipes use these ingredients.")
+
+    def test_index_follows_writes(self):
+        """Test if links added or removed after the build are searched."""
+        self.search("Lettuce")  # build
+        salad = self.recipes["Salad"]
+        RecipeIngredient.objects.create(recipe=salad, ingredient=Ingredient.objects.get(name="Egg"),
+                                        quantity="1")
+        self.assertIn(("Salad", 2, 0), self.ranking(self.search("Lettuce, Egg")))
+        RecipeIngredient.objects.get(recipe=self.recipes["Omelette"], ingredient__name="Milk").delete()
+        self.assertIn(("Omelette", 1, 0), self.ranking(self.search("Egg")))
+        new = Recipe.objects.create(name="Toast", cooking_time=5, created_by=self.user)
+        RecipeIngredient.objects.add_to_recipe(new, [("Bread", "1"), ("Egg", "1")])
+        self.assertIn(("Toast", 1, 1), self.ranking(self.search("Egg")))
+        self.recipes["Pancake"].delete()
+        self.assertNotIn("Pancake", [r[0] for r in self.ranking(self.search("Egg"))])
+        link = RecipeIngredient.objects.get(recipe=salad, ingredient__name="Lettuce")
+        link.recipe = new
+        link.save()  # moved to another recipe
+        self.assertEqual(self.ranking(self.search("Lettuce")), [("Toast", 1, 2)])
+
+    def test_queries_do_not_grow_with_pantry(self):
+        """Test if a search is two queries once the index is built."""
+        pantry = list(Ingredient.objects.values_list("pk", flat=True))
+        find_recipes(pantry[:1])  # build
+        with self.assertNumQueries(2):
+            results, total = find_recipes(pantry)
+        self.assertEqual(total, 4)
+
+
+class RecipeSimilarityTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="password123")
+        self.client.login(username="testuser", password="password123")
+        self.recipes = {}
+        for name, ingredients in [("Pancake", ["Egg", "Milk", "Flour", "Sugar", "Butter"]),
+                                  ("Crepe", ["Egg", "Milk", "Flour", "Sugar", "Salt"]),
+                                  ("Waffle", ["Egg", "Milk", "Flour", "Yeast", "Oil"]),
+                                  ("Salad", ["Lettuce", "Tomato", "Cucumber"])]:
+            recipe = Recipe.objects.create(name=name, cooking_time=5, created_by=self.user)
+            RecipeIngredient.objects.add_to_recipe(recipe, [(i, "1") for i in ingredients])
+            self.recipes[name] = recipe
+
+    def similar_names(self, name):
+        return [similar.name for similar in similar_recipes(self.recipes[name].pk)]
+
+    def test_signature_estimates_jaccard(self):
+        """Test if equal sets agree everywhere and disjoint sets almost nowhere."""
+        ids, matrix = signatures([1, 1, 1, 2, 2, 2, 3, 3], [5, 6, 7, 5, 6, 7, 100, 200])
+        self.assertEqual(list(ids), [1, 2, 3])
+        self.assertEqual((matrix[0] == matrix[1]).mean(), 1.0)
+        self.assertLess((matrix[0] == matrix[2]).mean(), 0.1)
+
+    def test_build_command(self):
+        """Test if the command writes a signature per recipe with ingredients."""
+        Recipe.objects.create(name="Empty", cooking_time=5, created_by=self.user)
+        out = StringIO()
+        call_command("build_recipe_signatures", "--batch-size", "2", stdout=out)
+        self.assertIn("Built 4 signature(s).", out.getvalue())
+        self.assertEqual(RecipeSignature.objects.count(), 4)
+        self.assertEqual(RecipeSignatureBand.objects.count(), 4 * 16)
+        self.assertEqual(self.similar_names("Pancake")[0], "Crepe")
+        self.assertNotIn("Salad", self.similar_names("Pancake"))
+
+    def test_candidates_limited(self):
+        """Test if only the recipes sharing the most buckets are compared."""
+        call_command("build_recipe_signatures", stdout=StringIO())
+        with mock.patch("recipes.similarity.MAX_CANDIDATES", 1), self.assertNumQueries(3):
+            self.assertEqual(self.similar_names("Pancake"), ["Crepe"])
+
+    def test_detail_view_panel(self):
+        """Test if the detail page lists similar recipes."""
+        call_command("build_recipe_signatures", stdout=StringIO())
+        response = self.client.get(reverse("recipes:recipe_detail",
+                                           args=[self.recipes["Crepe"].pk]))
+        self.assertContains(response, "Similar Recipes")
+        self.assertEqual(response.context["similar"][0].name, "Pancake")
+
+    def test_updated_incrementally(self):
+        """Test if ingredient writes update the signature after commit."""
+        call_command("build_recipe_signatures", stdout=StringIO())
+        self.assertEqual(self.similar_names("Salad"), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredient.objects.add_to_recipe(
+                self.recipes["Salad"],
+                [("Egg", "1"), ("Milk", "1"), ("Flour", "1"), ("Yeast", "1"), ("Oil", "1")])
+            RecipeIngredient.objects.filter(
+                recipe=self.recipes["Salad"], ingredient__name="Lettuce").get().delete()
+        self.assertIn("Salad", self.similar_names("Waffle"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes["Waffle"].delete()
+        self.assertFalse(RecipeSignature.objects.filter(recipe_id=self.recipes["Waffle"].pk).exists())
+
+
+class RecipeFullTextSearchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="password123")
+        self.client.login(username="testuser", password="password123")
+        Ingredient.objects.create(name="Basil", introduction="Fragrant herb used in pesto")
+        Ingredient.objects.create(name="Tomato", introduction="Juicy red fruit")
+        self.recipes = {}
+        for name, ingredients in [("Tomato Soup", ["Tomato", "Salt"]),
+                                  ("Pesto Pasta", ["Basil", "Pasta"]),
+                                  ("Caprese Salad", ["Tomato", "Basil"])]:
+            recipe = Recipe.objects.create(name=name, cooking_time=5, created_by=self.user)
+            RecipeIngredient.objects.add_to_recipe(recipe, [(i, "1") for i in ingredients])
+            self.recipes[name] = recipe
+        fulltext_index.invalidate()
+
+    def names(self, query):
+        ids = fulltext_index.search(query).tolist()
+        recipes = Recipe.objects.in_bulk(ids)
+        return [recipes[pk].name for pk in ids]
+
+    def test_tokenize(self):
+        """Test if text is lowercased, stop words dropped and plurals stemmed."""
+        self.assertEqual(tokenize("The Tomatoes and Cherries, with BASIL"),
+                         ["tomato", "cherry", "basil"])
+
+    def test_bm25_ranking(self):
+        """Test if name matches outrank ingredient text and introductions match."""
+        self.assertEqual(self.names("tomato")[0], "Tomato Soup")
+        self.assertEqual(set(self.names("tomatoes")), {"Tomato Soup", "Caprese Salad"})
+        self.assertEqual(set(self.names("fragrant herb")), {"Pesto Pasta", "Caprese Salad"})
+        self.assertEqual(self.names("pesto")[0], "Pesto Pasta")
+        self.assertEqual(self.names("unicorn"), [])
+
+    def test_incremental_updates(self):
+        """Test if recipe, ingredient and link writes are searchable right away."""
+        self.names("tomato")  # build
+        soup = self.recipes["Tomato Soup"]
+        soup.name = "Gazpacho"
+        soup.save()
+        self.assertEqual(self.names("gazpacho"), ["Gazpacho"])
+        salt = Ingredient.objects.get(name="Salt")
+        salt.introduction = "Mined from ancient seas"
+        salt.save()
+        self.assertEqual(self.names("ancient"), ["Gazpacho"])
+        RecipeIngredient.objects.add_to_recipe(self.recipes["Pesto Pasta"], [("Salt", "1")])
+        self.assertEqual(set(self.names("ancient")), {"Gazpacho", "Pesto Pasta"})
+        RecipeIngredient.objects.get(recipe=soup, ingredient=salt).delete()
+        self.assertEqual(self.names("ancient"), ["Pesto Pasta"])
+        self.recipes["Pesto Pasta"].delete()
+        self.assertEqual(self.names("ancient"), [])
+
+    def test_rebuild_keeps_serving_and_writes(self):
+        """Test if searches use the old index during a rebuild and writes made meanwhile are kept."""
+        self.names("tomato")  # build
+        load, during = SearchIndex._load, []
+
+        def load_then_write(index):
+            load(index)
+            during.append(self.names("tomato"))  # not blocked by the rebuild
+            soup = self.recipes["Tomato Soup"]
+            soup.name = "Gazpacho"  # too late for the rebuild's queries
+            soup.save()
+
+        with override_settings(FULLTEXT_INDEX_TTL=-1), \
+                mock.patch.object(SearchIndex, "_load", load_then_write):
+            fulltext_index.search("soup")  # expired, rebuilds
+        self.assertEqual(during[0][0], "Tomato Soup")
+        self.assertEqual(self.names("gazpacho"), ["Gazpacho"])
+
+    def test_search_view_paginates(self):
+        """Test if the view returns ranked pages of results."""
+        for i in range(25):
+            Recipe.objects.create(name=f"Tomato Pie {i}", cooking_time=5, created_by=self.user)
+        url = reverse("recipes:recipe_search")
+        response = self.client.get(url, {"q": "tomato"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["page"].paginator.count, 27)
+        self.assertEqual(len(response.context["recipes"]), 20)
+        response = self.client.get(url, {"q": "tomato", "page": 2})
+        self.assertEqual(len(response.context["recipes"]), 7)
+        self.assertContains(response, "Previous Page")
+        self.assertEqual(self.client.get(url, {"q": "tomato", "page": 9}).status_code, 404)
+        self.assertContains(self.client.get(url, {"q": "unicorn"}), "No recipes match")
+
+
+class RecipeDetailViewTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="password123")
+        self.client.login(username="testuser", password="password123")
+        self.recipe = Recipe.objects.create(name="Omelette", cooking_time=5, created_by=self.user)
+        RecipeIngredient.objects.add_to_recipe(
+            self.recipe, [(name, "1") for name in ["Egg", "Milk", "Salt", "Pepper", "Butter"]])
+        self.url = reverse("recipes:recipe_detail", args=[self.recipe.pk])
+
+    def test_queries_do_not_grow_with_ingredients(self):
+        """Test if recipe, author and ingredients are two queries."""
+        # session + user, recipe + author, ingredient rows, similar recipes
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url)
+        self.assertContains(response, "Pepper - 1")
+        self.assertContains(response, "testuser")
+
+    def test_fragment_cached_until_recipe_changes(self):
+        """Test if a hot recipe is served from the cache and writes invalidate it."""
+        self.client.get(self.url)
+        with self.assertNumQueries(2):  # session + user only
+            response = self.client.get(self.url)
+        self.assertContains(response, "Omelette - Recipe Details")
+        self.assertContains(response, "Butter - 1")
+
+        RecipeIngredient.objects.get(recipe=self.recipe, ingredient__name="Butter").delete()
+        self.assertNotContains(self.client.get(self.url), "Butter - 1")
+        RecipeIngredient.objects.add_to_recipe(self.recipe, [("Cheese", "50 g")])
+        self.assertContains(self.client.get(self.url), "Cheese - 50 g")
+        self.recipe.name = "Cheese Omelette"
+        self.recipe.save()
+        self.assertContains(self.client.get(self.url), "Details: Cheese Omelette")
+        cheese = Ingredient.objects.get(name="Cheese")
+        cheese.name = "Cheddar"
+        cheese.save()
+        self.assertContains(self.client.get(self.url), "Cheddar - 50 g")
+
+        self.recipe.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class CachePolicyTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="password123")
+        self.client.login(username="testuser", password="password123")
+        self.recipe = Recipe.objects.create(name="Pancakes", cooking_time=15, created_by=self.user)
+        self.url = reverse("recipes:recipe_list")
+        for policy in policies.values():
+            policy.reset_stats()
+
+    def test_recipe_list_cached_until_recipes_change(self):
+        """Test if a list page is served from the cache and recipe writes drop it."""
+        self.client.get(self.url)
+        with self.assertNumQueries(2):  # session + user only
+            response = self.client.get(self.url)
+        self.assertContains(response, "Pancakes")
+        self.assertEqual(policies["recipe_list"].stats()["hits"], 1)
+
+        Recipe.objects.create(name="Waffles", cooking_time=20, created_by=self.user)
+        self.assertContains(self.client.get(self.url), "Waffles")
+        self.recipe.delete()
+        self.assertNotContains(self.client.get(self.url), "Pancakes")
+
+    def test_pages_cached_per_login_state(self):
+        """Test if home and about are cached once for anonymous and signed-in visitors."""
+        for name in ["home", "about"]:
+            self.assertContains(self.client.get(reverse(name)), "Logout")
+            self.assertContains(self.client.get(reverse(name)), "Logout")
+        self.client.logout()
+        self.assertContains(self.client.get(reverse("home")), "Login")
+        self.assertEqual(policies["home"].stats(), {"hits": 1, "misses": 2, "hit_rate": 1 / 3})
+        self.assertEqual(policies["about"].stats()["hits"], 1)
+
+    def test_stats_page_is_staff_only(self):
+        """Test if the cache statistics page needs staff and can drop a policy."""
+        stats_url = reverse("cache_stats")
+        self.assertEqual(self.client.get(stats_url).status_code, 302)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get(self.url)
+        self.client.get(self.url)
+        response = self.client.get(stats_url)
+        self.assertContains(response, "recipe_list")
+        self.assertContains(response, "LocMemCache")
+        self.assertNotContains(response, "recipe-charts")  # no cache locations
+        row = next(row for row in response.context["rows"] if row["name"] == "recipe_list")
+        self.assertEqual((row["hits"], row["misses"]), (1, 1))
+
+        self.client.post(stats_url, {"policy": "recipe_list"})
+        self.client.get(self.url)
+        self.assertEqual(policies["recipe_list"].stats()["misses"], 2)
+        self.client.post(stats_url, {"policy": "reset"})
+        self.assertEqual(policies["recipe_list"].stats()["misses"], 0)
+
+
+@override_settings(METRICS_SAMPLE_RATE=1.0, METRICS_SERVER_TIMING=True, METRICS_TOKEN="")
+class MetricsMiddlewareTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="password123")
+        self.client.login(username="testuser", password="password123")
+        self.recipe = Recipe.objects.create(name="Omelette", cooking_time=5, created_by=self.user)
+        metrics_registry.clear()
+
+    def test_records_queries_and_timings_per_view(self):
+        """Test if a sampled request is recorded under its URL name."""
+        url = reverse("recipes:recipe_detail", args=[self.recipe.pk])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertIn(f'desc="{len(queries)} queries"', response.headers["Server-Timing"])
+        self.assertIn("total;dur=", response.headers["Server-Timing"])
+
+        histogram = metrics_registry.get("view_db_queries", "recipes:recipe_detail")
+        self.assertEqual((histogram.count, histogram.sum), (1, len(queries)))
+        self.assertGreater(metrics_registry.get(
+            "view_template_duration_seconds", "recipes:recipe_detail").sum, 0)
+
+        self.client.get("/no-such-page/")
+        self.assertEqual(metrics_registry.get("view_duration_seconds", "<unresolved>").count, 1)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_recorded(self):
+        response = self.client.get(reverse("recipes:recipe_list"))
+        self.assertNotIn("Server-Timing", response.headers)
+        self.assertIsNone(metrics_registry.get("view_duration_seconds", "recipes:recipe_list"))
+
+    def test_prometheus_endpoint(self):
+        """Test if /metrics exports cumulative buckets and honours the token."""
+        self.client.get(reverse("recipes:recipe_list"))
+        self.client.get(reverse("recipes:recipe_list"))
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        with self.settings(DEBUG=True):
+            response = self.client.get(reverse("metrics"))
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        self.assertContains(response, "# TYPE view_db_queries histogram")
+        self.assertContains(
+            response, 'view_db_queries_bucket{view="recipes:recipe_list",le="+Inf"} 2')
+        self.assertContains(response, 'view_duration_seconds_count{view="recipes:recipe_list"} 2')
+
+        with self.settings(METRICS_TOKEN="secret"):
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+            response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret")
+            self.assertEqual(response.status_code, 200)
+
+
+@override_settings(THUMBNAIL_WORKERS=0)
+class ThumbnailTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        media = override_settings(MEDIA_ROOT=self.media.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.user = User.objects.create_user(username="testuser", password="password123")
+        self.client.login(username="testuser", password="password123")
+
+    def upload(self, color="red", size=(800, 600), fmt="PNG"):
+        buffer = BytesIO()
+        Image.new("RGB", size, color).save(buffer, fmt)
+        return SimpleUploadedFile(f"pic.{fmt.lower()}", buffer.getvalue())
+
+    def test_thumbnails_after_commit(self):
+        """Test if an upload is thumbnailed after commit, not during the save."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            recipe = Recipe.objects.create(name="Soup", cooking_time=5, created_by=self.user,
+                                           pic=self.upload())
+        self.assertEqual(Recipe.objects.get(pk=recipe.pk).pic_hash, "")
+        for callback in callbacks:
+            callback()
+        recipe.refresh_from_db()
+        self.assertEqual(len(recipe.pic_hash), 16)
+
+        card = Image.open(os.path.join(self.media.name, thumbnail_name(recipe.pic_hash, "card", 640, "webp")))
+        self.assertEqual((card.format, card.size), ("WEBP", (640, 480)))
+        detail = Image.open(os.path.join(self.media.name, thumbnail_name(recipe.pic_hash, "detail", 1440, "jpg")))
+        self.assertEqual(detail.size, (800, 600))  # never enlarged
+
+        response = self.client.get(reverse("recipes:recipe_list"))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, f"{recipe.pic_hash}-card-320.webp 320w")
+
+    def test_new_upload_and_shared_content(self):
+        """Test if a new upload replaces the hash and equal pictures share files."""
+        with self.captureOnCommitCallbacks(execute=True):
+            first = Recipe.objects.create(name="Soup", cooking_time=5, created_by=self.user,
+                                          pic=self.upload())
+            second = Recipe.objects.create(name="Stew", cooking_time=5, created_by=self.user,
+                                           pic=self.upload())
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.pic_hash, second.pic_hash)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.pic = self.upload(color="blue")
+            first.save()
+        first.refresh_from_db()
+        self.assertNotEqual(first.pic_hash, second.pic_hash)
+
+    def test_detail_fragment_follows_thumbnails(self):
+        """Test if a cached detail page picks up thumbnails made after it."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            recipe = Recipe.objects.create(name="Soup", cooking_time=5, created_by=self.user,
+                                           pic=self.upload())
+        url = reverse("recipes:recipe_detail", args=[recipe.pk])
+        self.assertNotContains(self.client.get(url), "<picture>")
+        for callback in callbacks:
+            callback()
+        self.assertContains(self.client.get(url), "-detail-960.webp 960w")
+
+    def test_build_command(self):
+        """Test if the command thumbnails existing rows and reports missing files."""
+        with open(os.path.join(self.media.name, "no_picture.jpg"), "wb") as f:
+            f.write(self.upload(fmt="JPEG").read())
+        Recipe.objects.create(name="Soup", cooking_time=5, created_by=self.user)
+        Ingredient.objects.create(name="Salt")
+        Ingredient.objects.create(name="Kale", pic="ingredients/gone.png")
+        out, err = StringIO(), StringIO()
+        call_command("build_thumbnails", stdout=out, stderr=err)
+        self.assertIn("Thumbnailed 2 picture(s), 1 missing file(s).", out.getvalue())
+        self.assertIn("ingredients/gone.png", err.getvalue())
+        self.assertEqual(Ingredient.objects.get(name="Salt").pic_hash,
+                         Recipe.objects.get(name="Soup").pic_hash)
+
+
+class RollupTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="password123")
+        self.soup = Recipe.objects.create(name="Soup", cooking_time=5, created_by=self.user)
+        self.stew = Recipe.objects.create(name="Stew", cooking_time=5, created_by=self.user)
+        RecipeIngredient.objects.add_to_recipe(self.soup, [("Salt", "1"), ("Leek", "2")])
+        RecipeIngredient.objects.create(recipe=self.stew, ingredient=Ingredient.objects.get(name="Salt"),
+                                        quantity="1")
+
+    def counts(self):
+        return dict(top_ingredients()), dict(daily_recipes())
+
+    def test_kept_current_by_signals(self):
+        """Test if saves and deletes keep both rollups in step with the rows."""
+        today = timezone.localdate()
+        self.assertEqual(self.counts(), ({"Salt": 2, "Leek": 1}, {today: 2}))
+
+        RecipeIngredient.objects.get(recipe=self.soup, ingredient__name="Leek").delete()
+        self.stew.delete()  # its links go with it
+        self.assertEqual(self.counts(), ({"Salt": 1}, {today: 1}))
+
+    def test_moved_link_moves_count(self):
+        """Test if pointing a link at another ingredient moves its recipe count."""
+        link = RecipeIngredient.objects.get(recipe=self.stew)
+        link.ingredient = Ingredient.objects.get(name="Leek")
+        link.save()
+        self.assertEqual(self.counts()[0], {"Salt": 1, "Leek": 2})
+        link.quantity = "2"
+        link.save()  # same pair, no change
+        self.assertEqual(self.counts()[0], {"Salt": 1, "Leek": 2})
+
+    def test_charts_read_rollups(self):
+        """Test if the popular and growth charts are one small query each."""
+        with self.assertNumQueries(1):
+            spec, _ = get_chart_data("#2")
+        self.assertEqual((spec["labels"], spec["values"]), (["Salt", "Leek"], [2, 1]))
+        with self.assertNumQueries(2):  # the first day, then the buckets
+            spec, _ = get_chart_data("#3")
+        self.assertEqual(spec["values"], [2])
+
+    def test_recount_without_conflict_target(self):
+        """Test if the recount upsert names no conflict target where MySQL refuses one."""
+        pepper = Ingredient.objects.create(name="Pepper")
+        with mock.patch.object(connection.features, "supports_update_conflicts_with_target", False), \
+                CaptureQueriesContext(connection) as queries:
+            recount_ingredients([pepper.pk])
+        self.assertNotIn("ON CONFLICT", queries.captured_queries[-1]["sql"])
+        self.assertEqual(IngredientRecipeCount.objects.get(ingredient=pepper).recipes, 0)
+
+    def test_rebuild_command(self):
+        """Test if the command recomputes drifted counts in batches."""
+        IngredientRecipeCount.objects.update(recipes=7)
+        DailyRecipeCount.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_rollups", "--batch-size", "1", stdout=out)
+        self.assertIn("Rebuilt 2 ingredient count(s) and 1 day count(s).", out.getvalue())
+        self.assertEqual(self.counts(), ({"Salt": 2, "Leek": 1}, {timezone.localdate(): 2}))
+
+
+@override_settings(CHART_RENDER_WORKERS=0)
+class GrowthSeriesTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="password123")
+        self.client.login(username="testuser", password="password123")
+        DailyRecipeCount.objects.all().delete()
+        # Wednesday, Friday, Monday of the next week, then a month later
+        for day, recipes in [("2025-01-01", 2), ("2025-01-03", 1),
+                             ("2025-01-06", 4), ("2025-02-10", 3)]:
+            DailyRecipeCount.objects.create(day=day, recipes=recipes)
+
+    def series(self, resolution="day", start=None, end=None, **kwargs):
+        return growth_series(GrowthQuery(resolution, date.fromisoformat(start) if start else None,
+                                         date.fromisoformat(end or "2025-02-10")), **kwargs)
+
+    def test_gaps_filled_per_resolution(self):
+        """Test if every bucket of the range is present, empty ones as 0."""
+        days = self.series(end="2025-01-07")
+        self.assertEqual(days.labels[:4], ["2025-01-01", "2025-01-02", "2025-01-03", "2025-01-04"])
+        self.assertEqual(days.counts, [2, 0, 1, 0, 0, 4, 0])
+
+        weeks = self.series("week")
+        self.assertEqual(weeks.labels[:2], ["2024-12-30", "2025-01-06"])  # Mondays
+        self.assertEqual(weeks.counts, [3, 4, 0, 0, 0, 0, 3])
+
+        months = self.series("month", start="2024-12-15")
+        self.assertEqual(months, ("month", 1, ["2024-12-01", "2025-01-01", "2025-02-01"], [0, 7, 3]))
+
+    def test_points_bounded(self):
+        """Test if long ranges are coarsened, then summed, below the limit."""
+        coarsened = self.series(max_points=10)
+        self.assertEqual((coarsened.resolution, coarsened.step), ("week", 1))
+
+        summed = self.series(start="2015-01-01", max_points=12)
+        self.assertEqual(summed.resolution, "month")
+        self.assertLessEqual(len(summed.counts), 12)
+        self.assertEqual(sum(summed.counts), 10)
+
+    def test_open_end_keyed_on_today(self):
+        """Test if an open-ended range gets a new chart key when the day changes."""
+        query = GrowthQuery("week", date(2025, 1, 1))
+        self.assertEqual(query.cache_key(), query._replace(end=timezone.localdate()).cache_key())
+        with mock.patch("recipes.growth.timezone.localdate", return_value=date(2099, 1, 1)):
+            self.assertEqual(query.cache_key(), "growth:week:2025-01-01:2099-01-01")
+
+    def test_api_and_chart(self):
+        """Test if the JSON API and the chart endpoint take the same parameters."""
+        url = reverse("recipes:recipe_growth")
+        data = self.client.get(url, {"resolution": "month", "end": "2025-02-28"}).json()
+        self.assertEqual(data["points"], [{"start": "2025-01-01", "recipes": 7},
+                                          {"start": "2025-02-01", "recipes": 3}])
+        bad = self.client.get(url, {"start": "2025-03-01", "end": "2025-02-01"})
+        self.assertEqual(bad.status_code, 400)
+
+        response = self.client.get(reverse("recipes:ingredient_search"),
+                                   {"chart": "#3", "resolution": "week", "end": "2025-02-28"})
+        chart = response.context["chart"]
+        self.assertIn("resolution=week", chart)
+        self.assertEqual(self.client.get(chart)["Content-Type"], "image/png")
+
+
+class ConnectionPoolTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.connections = ConnectionHandler({"default": {
+            "ENGINE": "recipe_project.db.sqlite3",
+            "NAME": os.path.join(directory.name, "db.sqlite3"),
+            "POOL": {"SIZE": 1, "CHECK_AFTER": 0},
+        }})
+        self.addCleanup(lambda: get_pool("default", {}).clear())
+        self.addCleanup(self.connections.close_all)
+
+    def test_closed_connection_is_reused(self):
+        """Test if closing returns the connection and the next connect takes it."""
+        first = self.connections["default"]
+        first.ensure_connection()
+        raw = first.connection
+        first.close()
+        self.assertEqual(len(first.pool), 1)
+
+        second = self.connections.create_connection("default")  # e.g. another thread
+        second.ensure_connection()
+        self.assertIs(second.connection, raw)
+        self.assertTrue(second.reused_connection)
+        with second.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        second.close()
+
+    def test_dirty_or_broken_connections_are_not_pooled(self):
+        """Test if connections in a transaction, or failing the check, are closed."""
+        wrapper = self.connections["default"]
+        wrapper.ensure_connection()
+        wrapper.set_autocommit(False)
+        wrapper.close()
+        self.assertEqual(len(wrapper.pool), 0)
+
+        wrapper.ensure_connection()
+        wrapper.close()
+        wrapper.pool._idle[0][0].close()  # e.g. dropped by the server
+        wrapper.ensure_connection()
+        self.assertFalse(wrapper.reused_connection)
+        wrapper.close()
@@ -0,0 +1,179 @@
+"""
+Thumbnails of uploaded recipe and ingredient pictures.
+
+Every picture is resized with Pillow into a few fixed widths per preset,
+each encoded as WebP and as a JPEG fallback, and stored in the media
+storage as `thumbs/<hash[:2]>/<hash>-<preset>-<width>.<ext>`. The hash is
+that of the source file, so a name never changes content: the files can be
+served with a far-future immutable Cache-Control header, and a picture
+uploaded twice is only encoded once.
+
+Saving a model whose `pic_hash` is empty queues its picture after the
+transaction commits (recipes/signals.py, ingredients/signals.py). Threads
+of a small pool do the work outside the request; Pillow releases the GIL
+while decoding, resizing and encoding. `pic_hash` is only written once the
+files exist, so templates fall back to the original picture until then.
+With THUMBNAIL_WORKERS = 0 the work runs inline.
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.dispatch import Signal
+
+logger = logging.getLogger(__name__)
+
+# sent with `pks` once thumbnails of those rows of `sender` exist
+thumbnails_ready = Signal()
+
+Preset = namedtuple("Preset", "widths aspect sizes")
+
+PRESETS = {
+    # list cards: cropped to 4:3 so every card has the same height
+    "card": Preset((320, 640), (4, 3), "(min-width: 768px) 33vw, 100vw"),
+    # detail pages: the whole picture, never enlarged
+    "detail": Preset((480, 960, 1440), None, "(min-width: 768px) 40vw, 100vw"),
+}
+
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+HASH_LENGTH = 16
+
+
+def thumbnail_name(digest, preset, width, ext):
+    return f"thumbs/{digest[:2]}/{digest}-{preset}-{width}.{ext}"
+
+
+def srcset(digest, preset, ext):
+    """`url 320w, url 640w` of one preset and format."""
+    return ", ".join(
+        f"{default_storage.url(thumbnail_name(digest, preset, width, ext))} {width}w"
+        for width in PRESETS[preset].widths)
+
+
+def render_variants(data, digest):
+    """Encode every preset, width and format of an image: {name: bytes}."""
+    from PIL import Image, ImageOps
+
+    largest = max(width for preset in PRESETS.values() for width in preset.widths)
+    with Image.open(BytesIO(data)) as image:
+        # JPEGs decode at a reduced scale when that is still big enough
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        variants = {}
+        for preset_name, preset in PRESETS.items():
+            for width in preset.widths:
+                if preset.aspect:
+                    height = round(width * preset.aspect[1] / preset.aspect[0])
+                    resized = ImageOps.fit(image, (width, height), Image.LANCZOS)
+                else:
+                    resized = image.copy()
+                    resized.thumbnail((width, width * 4), Image.LANCZOS)
+                for ext, (fmt, options) in FORMATS.items():
+                    buffer = BytesIO()
+                    resized.save(buffer, fmt, **options)
+                    variants[thumbnail_name(digest, preset_name, width, ext)] = buffer.getvalue()
+    return variants
+
+
+def generate(name):
+    """
+    Write the thumbnails of the stored picture `name`, unless files of the
+    same content already exist, and return its content hash.
+    """
+    with default_storage.open(name, "rb") as source:
+        data = source.read()
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+    # written last, so its presence means the whole set is there
+    preset = list(PRESETS)[-1]
+    last = thumbnail_name(digest, preset, PRESETS[preset].widths[-1], list(FORMATS)[-1])
+    if not default_storage.exists(last):
+        for thumb, content in render_variants(data, digest).items():
+            if not default_storage.exists(thumb):
+                default_storage.save(thumb, ContentFile(content))
+    return digest
+
+
+def process(model, pk):
+    """Thumbnail one row's picture and record its hash."""
+    name = model.objects.filter(pk=pk).values_list("pic", flat=True).first()
+    if not name:
+        return
+    try:
+        digest = generate(name)
+    except FileNotFoundError:
+        logger.warning("Picture %s of %s %s is missing", name, model.__name__, pk)
+        return
+    # a newer upload may have replaced the picture meanwhile
+    if model.objects.filter(pk=pk, pic=name).update(pic_hash=digest):
+        thumbnails_ready.send(sender=model, pks=[pk])
+
+
+class ThumbnailPool:
+    """Lazily started ThreadPoolExecutor for process()."""
+
+    def __init__(self):
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def workers(self):
+        return settings.THUMBNAIL_WORKERS
+
+    def _get_executor(self):
+        with self._lock:
+            # a pool inherited through fork() has no threads in this process
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="thumbnails")
+                self._pid = os.getpid()
+            return self._executor
+
+    def submit(self, model, pk):
+        if not self.workers:
+            process(model, pk)
+            return
+        self._get_executor().submit(self._run, model, pk)
+
+    def _run(self, model, pk):
+        try:
+            process(model, pk)
+        except Exception:
+            logger.exception("Could not thumbnail %s %s", model.__name__, pk)
+        finally:
+            connection.close()  # the worker thread's own connection
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+pool = ThumbnailPool()
+
+
+def schedule(model, pk):
+    """Queue a row's picture once the current transaction commits."""
+    transaction.on_commit(partial(pool.submit, model, pk))
@@ -1,6 +1,7 @@
 from django.urls import path
 from .views import home
-from .views import RecipeListView, RecipeDetailView, ingredient_search
+from .views import RecipeListView, RecipeDetailView, ingredient_search, chart_image
+from .views import pantry_search, recipe_growth, recipe_search
 from .views import RecipeCreateView, RecipeIngredientCreateView
 
 app_name = 'recipes'
@@ -10,6 +11,10 @@ urlpatterns = [
     path('list/', RecipeListView.as_view(), name='recipe_list'),
     path('list/<pk>', RecipeDetailView.as_view(), name='recipe_detail'),
     path("ingredient-search/", ingredient_search, name="ingredient_search"),
+    path("charts/growth.json", recipe_growth, name="recipe_growth"),
+    path("charts/<slug:chart>.<slug:fmt>", chart_image, name="chart"),
+    path("pantry/", pantry_search, name="pantry_search"),
+    path("search/", recipe_search, name="recipe_search"),
     path('new/', RecipeCreateView.as_view(), name='recipe_create'),
     path('recipe/<int:recipe_id>/add_ingredients/', RecipeIngredientCreateView.as_view(), name='recipe_add_ingredients'),
 ]
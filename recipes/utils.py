@@ -1,34 +1,67 @@
-import matplotlib.pyplot as plt
-from io import BytesIO
-import base64
-from django.db.models import Count
-from django.db.models.functions import TruncDate
+from recipes.cache import chart_cache
+from recipes.rendering import renderer
+from recipes.growth import GrowthQuery, growth_series
+from recipes.rollups import top_ingredients
+from recipes.search import DIFFICULTY_LEVELS, IngredientSearchResult
+from ingredients.fuzzy import index as fuzzy_index
 
-from recipes.models import Recipe
-from recipesingredients.models import RecipeIngredient
-from ingredients.models import Ingredient
 
+# URL slug of each chart type, e.g. /recipes/charts/popular-ingredients.png
+CHART_SLUGS = {
+    "#1": "difficulty",
+    "#2": "popular-ingredients",
+    "#3": "recipe-growth",
+}
 
-def get_graph(fig):
-    """Convert Matplotlib figure to base64-encoded image"""
-    buffer = BytesIO()
-    fig.savefig(buffer, format='png')
-    buffer.seek(0)
-    img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-    buffer.close()
-    return img_base64
+GROWTH_PERIODS = {"day": "Daily", "week": "Weekly", "month": "Monthly"}
 
 
-def generate_chart(chart_type, ingredient_name=None):
+def chart_argument(chart_type, ingredient_name=None, growth=None):
+    """What besides the type tells two charts apart, for cache keys and ETags"""
+    if chart_type == "#3":
+        return (growth or GrowthQuery()).cache_key()
+    return ingredient_name
+
+
+def generate_chart(chart_type, ingredient_name=None, fmt="png", growth=None):
+    """
+    Return a chart from the chart cache, rendering it on a miss.
+    See render_chart() for parameters and return values.
+    """
+    return chart_cache.get_or_render(
+        chart_type, chart_argument(chart_type, ingredient_name, growth),
+        lambda: render_chart(chart_type, ingredient_name, fmt, growth), fmt)
+
+
+def render_chart(chart_type, ingredient_name=None, fmt="png", growth=None):
     """
     Generate a chart based on the provided chart type.
 
     Parameters:
     - chart_type (str): The type of chart to generate ('#1' for Pie, '#2' for Bar, '#3' for Line).
     - ingredient_name (str, optional): The ingredient to filter recipes by (only used for Pie chart).
+    - fmt (str): Image format, 'png' or 'svg'.
+    - growth (GrowthQuery, optional): Resolution and date range of the Line chart.
+
+    Returns:
+    - ChartImage: Encoded image bytes.
+    - str: Error message (if any).
+
+    Raises RenderUnavailable when the render pool cannot draw it in time.
+    """
+    spec, error = get_chart_data(chart_type, ingredient_name, growth)
+    if error:
+        return None, error
+
+    return renderer.render(spec, fmt), None
+
+
+def get_chart_data(chart_type, ingredient_name=None, growth=None):
+    """
+    Aggregate the data of a chart into a picklable spec for the renderer.
 
     Returns:
-    - str: Base64-encoded image string.
+    - dict: Chart spec (see recipes.rendering.draw_chart).
     - str: Error message (if any).
     """
 
@@ -37,88 +70,58 @@ def generate_chart(chart_type, ingredient_name=None):
         if not ingredient_name:
             return None, "Ingredient name is required for Pie Chart."
 
-        try:
-            ingredient = Ingredient.objects.get(name=ingredient_name)
-        except Ingredient.DoesNotExist:
+        # same cached rows the search page shows, no extra aggregation query
+        ingredient_name = fuzzy_index.canonical(ingredient_name) or ingredient_name
+        result = IngredientSearchResult.get(ingredient_name)
+        if not result.found:
             return None, "Ingredient not found."
-
-        # Get recipes containing this ingredient
-        recipes_with_ingredient = RecipeIngredient.objects.filter(
-            ingredient=ingredient).values_list("recipe", flat=True)
-
-        # Count difficulty levels
-        difficulty_counts = Recipe.objects.filter(id__in=recipes_with_ingredient).values(
-            "difficulty").annotate(count=Count("id"))
-
-        # Convert to dictionary
-        difficulty_data = {entry["difficulty"]: entry["count"]
-                           for entry in difficulty_counts}
-
-        # Ensure all difficulty levels are represented
-        difficulty_labels = ["Easy", "Medium", "Intermediate", "Hard"]
-        difficulty_values = [difficulty_data.get(
-            level, 0) for level in difficulty_labels]
-
-        # **Generate pie chart using fig, ax**
-        fig, ax = plt.subplots(figsize=(6, 4))
-        ax.pie(difficulty_values, labels=difficulty_labels, autopct="%1.1f%%",
-               colors=["green", "orange", "blue", "red"])
-        ax.set_title(f"Recipes with {ingredient_name} by Difficulty")
+        if not result.recipes:
+            return None, "No recipes contain this ingredient."
+
+        return {
+            "kind": "pie",
+            "figsize": (6, 4),
+            "labels": DIFFICULTY_LEVELS,
+            "values": result.difficulty_counts(),
+            "colors": ["green", "orange", "blue", "red"],
+            "title": f"Recipes with {ingredient_name} by Difficulty",
+        }, None
 
     # **2️. Bar Chart: Most Popular Ingredients (No User Input Needed)**
     elif chart_type == "#2":
-        # Count how many recipes contain each ingredient
-        ingredient_counts = RecipeIngredient.objects.values("ingredient__name").annotate(
-            # Top 10 ingredients
-            count=Count("recipe")).order_by("-count")[:10]
+        # Top 10 ingredients, read from the per-ingredient rollup
+        ingredient_counts = top_ingredients(10)
 
-        if not ingredient_counts.exists():
+        if not ingredient_counts:
             return None, "No ingredient data available."
 
-        # Extract data
-        ingredient_names = [entry["ingredient__name"]
-                            for entry in ingredient_counts]
-        recipe_counts = [entry["count"] for entry in ingredient_counts]
-
-        # Generate bar chart
-        fig, ax = plt.subplots(figsize=(7, 5))
-        ax.barh(ingredient_names, recipe_counts, color="blue")
-        ax.set_xlabel("Number of Recipes")
-        ax.set_ylabel("Ingredients")
-        ax.set_title("Top 10 Most Popular Ingredients in Recipes")
-        ax.invert_yaxis()  # Invert Y-axis for better readability (most popular at the top)
+        return {
+            "kind": "barh",
+            "labels": [name for name, _ in ingredient_counts],
+            "values": [count for _, count in ingredient_counts],
+            "xlabel": "Number of Recipes",
+            "ylabel": "Ingredients",
+            "title": "Top 10 Most Popular Ingredients in Recipes",
+        }, None
 
     # **3️. Line Chart: Recipe Growth Over Time (No User Input Needed)**
     elif chart_type == "#3":
-        # Aggregate recipes by day
-        daily_recipe_counts = Recipe.objects.annotate(
-            day=TruncDate("created_at")
-        ).values("day").annotate(count=Count("id")).order_by("day")
+        # Recipes per day, week or month, at most MAX_POINTS points
+        series = growth_series(growth or GrowthQuery())
 
-        if not daily_recipe_counts.exists():
+        if not any(series.counts):
             return None, "No data available for recipe growth."
 
-        # Extract data
-        days = [entry["day"].strftime("%Y-%m-%d")
-                for entry in daily_recipe_counts]
-        recipe_counts = [entry["count"] for entry in daily_recipe_counts]
-
-        # Generate line chart
-        fig, ax = plt.subplots(figsize=(7, 5))
-        ax.plot(days, recipe_counts, marker="o", linestyle="-", color="blue")
-        ax.set_xlabel("Day")
-        ax.set_ylabel("Number of Recipes Added")
-        ax.set_ylim(0, max(recipe_counts) + 1)  # Adding 1 for padding
-
-        if len(days) > 1:
-            ax.set_xticks(range(len(days)))
-            ax.set_xticklabels(days, rotation=45)
-
-        ax.set_title("Recipe Growth Over Time (Daily)")
-
-    else:
-        return None, "Invalid chart type."
-
-    # Convert graph to base64
-    img_base64 = get_graph(fig)
-    return f"data:image/png;base64,{img_base64}", None
+        period = GROWTH_PERIODS[series.resolution]
+        if series.step > 1:
+            period = f"Every {series.step} {series.resolution.title()}s"
+        return {
+            "kind": "line",
+            "labels": series.labels,
+            "values": series.counts,
+            "xlabel": series.resolution.title(),
+            "ylabel": "Number of Recipes Added",
+            "title": f"Recipe Growth Over Time ({period})",
+        }, None
+
+    return None, "Invalid chart type."
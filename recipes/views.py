@@ -1,15 +1,32 @@
-import pandas as pd
+from urllib.parse import urlencode
+
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import Prefetch
+from django.db.models.functions import Lower
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import render, redirect
-from django.urls import reverse_lazy
+from django.template.loader import render_to_string
+from django.urls import reverse, reverse_lazy
+from django.utils.cache import get_conditional_response, patch_cache_control
 # to display lists and details
 from django.views.generic import ListView, DetailView, CreateView
-from .models import Recipe  # to access Recipe model
-from .forms import IngredientSearchForm
+from .models import DailyRecipeCount, Recipe  # to access Recipe model
+from .forms import GrowthForm, IngredientSearchForm, PantrySearchForm
 from .forms import RecipeForm, RecipeIngredientForm, inlineformset_factory
-from .utils import generate_chart
+from .cache import CachePolicy, cached_page, chart_cache
+from .rendering import CONTENT_TYPES
+from .utils import CHART_SLUGS, chart_argument, generate_chart
+from .growth import growth_series
+from .pagination import KeysetPaginator
+from .search import IngredientSearchResult, fetch_recipe_rows, recipe_table_rows
+from .fulltext import index as fulltext_index
+from .pantry import find_recipes
+from .similarity import similar_recipes
 
 from recipesingredients.models import RecipeIngredient
+from ingredients.choices import get_ingredient_choices
 from ingredients.models import Ingredient
+from ingredients.fuzzy import index as fuzzy_index
 
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
@@ -19,6 +36,7 @@ from django.forms import formset_factory
 
 
 # Welcome page
+@cached_page(CachePolicy("home", "PAGE_CACHE_TTL"))
 def home(request):
     return render(request, 'recipes/recipes_home.html')
 
@@ -29,6 +47,35 @@ def home(request):
 class RecipeListView(LoginRequiredMixin, ListView):  # class-based view
     model = Recipe  # specify model
     template_name = 'recipes/list.html'  # specify template
+    fragment_template_name = 'recipes/list_body.html'
+    # any recipe write drops every page, see recipes/signals.py
+    cache_policy = CachePolicy("recipe_list", "RECIPE_LIST_FRAGMENT_TTL", tags=("recipes",))
+    paginate_by = 12
+    ordering = ("created_at", "id")  # unique, so it can be used as a cursor
+
+    def get_queryset(self):
+        # only the columns the cards render, author joined in the same query
+        return Recipe.objects.select_related("created_by").only(
+            "id", "name", "pic", "pic_hash", "created_at", "created_by__username")
+
+    def paginate_queryset(self, queryset, page_size):
+        """Keyset pagination: ?cursor=<token> instead of ?page=<n>"""
+        paginator = KeysetPaginator(queryset, self.get_ordering(), page_size)
+        try:
+            page = paginator.page(self.request.GET.get("cursor"))
+        except InvalidPage as e:
+            raise Http404(str(e))
+        return (paginator, page, page.object_list, page.has_next)
+
+    def get(self, request, *args, **kwargs):
+        """ serve the rendered page of cards from the cache when possible """
+        key = self.cache_policy.key(self.request.GET.get("cursor", ""))
+        body = self.cache_policy.get(key)
+        if body is None:
+            self.object_list = self.get_queryset()
+            body = render_to_string(self.fragment_template_name, self.get_context_data())
+            self.cache_policy.set(key, body)
+        return render(request, self.template_name, {"body": body})
 
 # The detail of recipe
 
@@ -36,13 +83,49 @@ class RecipeListView(LoginRequiredMixin, ListView):  # class-based view
 class RecipeDetailView(LoginRequiredMixin, DetailView):  # class-based view
     model = Recipe  # specify model
     template_name = 'recipes/detail.html'  # specify template
+    fragment_template_name = 'recipes/detail_body.html'
+    # the catalog tag covers renamed ingredients
+    cache_policy = CachePolicy("recipe_detail", "RECIPE_FRAGMENT_TTL",
+                               tags=("recipe:{pk}", "ingredients"))
+
+    def get_queryset(self):
+        """ recipe + author in one query, ingredient rows + names in a second """
+        ingredients = RecipeIngredient.objects.select_related("ingredient").only(
+            "recipe_id", "quantity", "ingredient__name").order_by("pk")
+        return Recipe.objects.select_related("created_by").prefetch_related(
+            Prefetch("recipeingredient_set", queryset=ingredients))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["ingredients"] = RecipeIngredient.objects.filter(
-            recipe=self.object)
+        context["ingredients"] = self.object.recipeingredient_set.all()
+        context["similar"] = similar_recipes(self.object.pk)
         return context
 
+    def get(self, request, *args, **kwargs):
+        """
+        Serve the rendered recipe body from the cache when possible, so a hot
+        recipe is shown without reading the database. Writes to the recipe or
+        its ingredient rows bump its version (recipes/signals.py).
+        """
+        pk = str(self.kwargs[self.pk_url_kwarg])
+        if not pk.isdigit():
+            raise Http404("No recipe found matching the query")
+        key = self.cache_policy.key(pk=pk)
+        fragment = self.cache_policy.get(key)
+        if fragment is not None:
+            return self.render_to_response(fragment)
+
+        self.object = self.get_object()
+        context = self.get_context_data(object=self.object)
+        # rendered without the request: nothing user specific is cached
+        fragment = {
+            "title": self.object.name,
+            "body": render_to_string(self.fragment_template_name, context),
+        }
+        self.cache_policy.set(key, fragment)
+        context.update(fragment)
+        return self.render_to_response(context)
+
 
 @login_required
 def ingredient_search(request):
@@ -56,8 +139,9 @@ def ingredient_search(request):
 
     chart = None
     error = None
-    recipes = Recipe.objects.none()  # make sure `recipes` is a QuerySet
-    recipes_df_html = None
+    recipes = []
+    suggestions = []
+    growth_form = GrowthForm()
 
     # if GET
     if request.method == "GET":
@@ -71,59 +155,189 @@ def ingredient_search(request):
             if not ingredient_name:
                 error = "Ingredient name cannot be empty."
             else:
-                try:
-                    ingredient = Ingredient.objects.get(name=ingredient_name)
-                    recipes = Recipe.objects.filter(
-                        id__in=RecipeIngredient.objects.filter(
-                            ingredient=ingredient
-                        ).values_list("recipe", flat=True)
-                    )
-                except Ingredient.DoesNotExist:
-                    recipes = Recipe.objects.none()
+                # "tomato" finds "Tomato"
+                ingredient_name = fuzzy_index.canonical(ingredient_name) or ingredient_name
+                # one joined query, shared with the pie chart endpoint
+                result = IngredientSearchResult.get(ingredient_name)
+                recipes = result.recipes
+                if not result.found:
                     error = "Ingredient not found."
-
-                # if find fit recipe
-                if recipes.exists():
-                    df = pd.DataFrame(list(recipes.values(
-                        "id", "name", "cooking_time", "ingredient_num", "difficulty")))
-
-                    # make a link
-                    df["name"] = df.apply(
-                        lambda row: f'<a href="/recipes/list/{row["id"]}">{row["name"]}</a>', axis=1)
-
-                    # rename
-                    df.rename(columns={
-                        "name": "Recipe Name",
-                        "cooking_time": "Cooking Time (min)",
-                        "ingredient_num": "Ingredient Count",
-                        "difficulty": "Difficulty"
-                    }, inplace=True)
-
-                    # transfer DataFrame to HTML
-                    recipes_df_html = df.to_html(
-                        index=False, classes="table table-striped", escape=False)
+                    # typos get suggestions from the in-memory trigram index
+                    suggestions = [match.name for match in fuzzy_index.lookup(ingredient_name)]
+                elif not recipes:
+                    error = "No recipes contain this ingredient."
 
                 # creat Pie Chart
                 if not error:
-                    chart, error = generate_chart("#1", ingredient_name)
+                    chart = chart_url("#1", ingredient_name)
 
         # 2️. Bar Chart (No input required)
         elif request.GET.get("chart") == "#2":
-            chart, error = generate_chart("#2")
+            if RecipeIngredient.objects.exists():
+                chart = chart_url("#2")
+            else:
+                error = "No ingredient data available."
 
         # 3️. Line Chart (No input required)
         elif request.GET.get("chart") == "#3":
-            chart, error = generate_chart("#3")
+            growth_form = GrowthForm(request.GET)
+            if not growth_form.is_valid():
+                error = " ".join(growth_form.errors.get("__all__", ["Invalid range."]))
+            elif DailyRecipeCount.objects.filter(recipes__gt=0).exists():
+                chart = chart_url("#3", growth=growth_form.get_query())
+            else:
+                error = "No data available for recipe growth."
 
     else:
         form = IngredientSearchForm()
 
     return render(request, "recipes/ingredient_search.html", {
         "form": form,
+        "growth_form": growth_form,
         "recipes": recipes,
+        "recipe_rows": recipe_table_rows(recipes),  # rendered lazily by the template
         "chart": chart,
         "error": error,
-        "recipes_df": recipes_df_html
+        "suggestions": suggestions,
+        "did_you_mean": suggestions[0] if suggestions else None,
+    })
+
+
+SEARCH_PAGE_SIZE = 20
+
+
+@login_required
+def recipe_search(request):
+    """
+    Free-text search over recipe names and the names and introductions of
+    their ingredients, best BM25 score first, ?page=<n> paginated.
+    """
+    query = request.GET.get("q", "").strip()
+    page = None
+    recipes = []
+
+    if query:
+        # ranking happens in memory, only the page of recipes is queried
+        paginator = Paginator(fulltext_index.search(query), SEARCH_PAGE_SIZE)
+        try:
+            page = paginator.page(request.GET.get("page", 1))
+        except InvalidPage as e:
+            raise Http404(str(e))
+        recipes = fetch_recipe_rows(page.object_list.tolist())
+
+    return render(request, "recipes/recipe_search.html", {
+        "query": query,
+        "page": page,
+        "recipes": recipes,
+        "recipe_rows": recipe_table_rows(recipes),
+    })
+
+
+PANTRY_RESULTS = 50
+
+
+@login_required
+def pantry_search(request):
+    """
+    Recipes ranked by how many of the given ingredients they use: all
+    matched first, then missing one, missing two, and so on.
+    """
+    results = []
+    total = 0
+    unknown = []
+    error = None
+
+    form = PantrySearchForm(request.GET or None)
+    if form.is_valid():
+        names = form.cleaned_data["ingredients"]
+        # only the pantry's names, not the whole catalog
+        by_name = dict(Ingredient.objects.annotate(lower_name=Lower("name"))
+                       .filter(lower_name__in=[name.lower() for name in names])
+                       .values_list("lower_name", "id"))
+        ingredient_ids = []
+        for name in names:
+            if name.lower() in by_name:
+                ingredient_ids.append(by_name[name.lower()])
+            else:
+                unknown.append(name)
+
+        results, total = find_recipes(
+            ingredient_ids, form.cleaned_data["max_missing"], PANTRY_RESULTS)
+        if not results:
+            error = "No recipes use these ingredients."
+
+    return render(request, "recipes/pantry_search.html", {
+        "form": form,
+        "results": results,
+        "total": total,
+        "unknown": unknown,
+        "error": error,
+    })
+
+
+def chart_url(chart_type, ingredient_name=None, fmt="png", growth=None):
+    """URL of the image endpoint serving a chart"""
+    url = reverse("recipes:chart", args=[CHART_SLUGS[chart_type], fmt])
+    if ingredient_name:
+        url += "?" + urlencode({"ingredient": ingredient_name})
+    elif growth and growth.params():
+        url += "?" + urlencode(growth.params())
+    return url
+
+
+@login_required
+def chart_image(request, chart, fmt):
+    """
+    Serve a chart as raw PNG or SVG bytes.
+
+    The strong ETag is derived from the data version, so a browser that
+    already has the image only gets a 304 until a recipe changes.
+    """
+    chart_type = {slug: key for key, slug in CHART_SLUGS.items()}.get(chart)
+    if chart_type is None or fmt not in CONTENT_TYPES:
+        raise Http404("Unknown chart.")
+    ingredient_name = request.GET.get("ingredient") or None
+    growth = None
+    if chart_type == "#3":
+        growth_form = GrowthForm(request.GET)
+        if not growth_form.is_valid():
+            raise Http404("Invalid growth range.")
+        growth = growth_form.get_query()
+
+    etag = chart_cache.etag(chart_type, chart_argument(chart_type, ingredient_name, growth), fmt)
+    not_modified = get_conditional_response(request, etag=f'"{etag}"')
+    if not_modified is not None:
+        return not_modified
+
+    image, error = generate_chart(chart_type, ingredient_name, fmt, growth)
+    if error:
+        raise Http404(error)
+
+    response = HttpResponse(image.data, content_type=image.content_type)
+    if image.is_fallback:
+        # stale or placeholder image, make the browser ask again next time
+        patch_cache_control(response, no_store=True)
+    else:
+        response.headers["ETag"] = f'"{etag}"'
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@login_required
+def recipe_growth(request):
+    """
+    JSON recipe growth series: ?resolution=day|week|month&start=&end=
+    (ISO dates, open ends by default), at most growth.MAX_POINTS points.
+    """
+    form = GrowthForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    series = growth_series(form.get_query())
+    return JsonResponse({
+        "resolution": series.resolution,
+        "step": series.step,
+        "points": [{"start": label, "recipes": count}
+                   for label, count in zip(series.labels, series.counts)],
     })
 
 
@@ -149,30 +363,26 @@ class RecipeIngredientCreateView(LoginRequiredMixin, CreateView):
         recipe = Recipe.objects.get(pk=recipe_id)
         ingredient_num = recipe.ingredient_num  # get ingredient num
         IngredientFormSet = formset_factory(RecipeIngredientForm, extra=ingredient_num)  # generate
-        formset = IngredientFormSet()
+        # every form shares one cached ingredient list
+        formset = IngredientFormSet(
+            form_kwargs={"ingredient_choices": get_ingredient_choices()})
         return render(request, self.template_name, {"formset": formset, "recipe": recipe})
 
     def post(self, request, recipe_id):
         """store RecipeIngredient"""
         recipe = Recipe.objects.get(pk=recipe_id)
         IngredientFormSet = formset_factory(RecipeIngredientForm)
-        formset = IngredientFormSet(request.POST)
+        formset = IngredientFormSet(
+            request.POST, form_kwargs={"ingredient_choices": get_ingredient_choices()})
 
         if formset.is_valid():
-            for form in formset:
-                ingredient_name = form.cleaned_data.get('ingredient', '')
-                quantity = form.cleaned_data.get('quantity', '')
-
-                if not ingredient_name or not quantity:
-                    continue
-
-    
-                ingredient, created = Ingredient.objects.get_or_create(name=ingredient_name)
-
-                recipe_ingredient = form.save(commit=False)
-                recipe_ingredient.ingredient = ingredient  #  `Ingredient` Model instance
-                recipe_ingredient.recipe = recipe
-                recipe_ingredient.save()
+            rows = [
+                (form.cleaned_data.get('ingredient'), form.cleaned_data.get('quantity'))
+                for form in formset
+                if form.cleaned_data.get('ingredient') and form.cleaned_data.get('quantity')
+            ]
+            # one transaction and a fixed number of queries for any row count
+            RecipeIngredient.objects.add_to_recipe(recipe, rows)
 
             return redirect('recipes:recipe_list')  # store and go to Recipe list
         
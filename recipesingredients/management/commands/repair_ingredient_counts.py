@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+
+from recipes.cache import bump_data_version
+from recipes.models import Recipe
+from recipesingredients.models import ingredient_count
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Recipe.ingredient_num and difficulty from the "
+        "RecipeIngredient rows, one primary key range per UPDATE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Recipes per UPDATE statement (default: 1000).")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        bounds = Recipe.objects.aggregate(low=Min("pk"), high=Max("pk"))
+        if bounds["low"] is None:
+            self.stdout.write("No recipes.")
+            return
+
+        fixed = 0
+        for start in range(bounds["low"], bounds["high"] + 1, batch_size):
+            count = ingredient_count()
+            # each batch is its own short statement, only drifted rows are written
+            fixed += Recipe.objects.filter(
+                pk__gte=start, pk__lt=start + batch_size,
+            ).exclude(ingredient_num=count).update(
+                difficulty=Recipe.difficulty_for(count), ingredient_num=count)
+
+        if fixed:
+            bump_data_version()
+        self.stdout.write(self.style.SUCCESS(f"Repaired {fixed} recipe(s)."))
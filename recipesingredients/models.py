@@ -1,6 +1,66 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from recipes.models import Recipe
 from ingredients.models import Ingredient
+from ingredients.choices import bump_catalog_version
+from recipes.cache import bump_data_version
+from recipe_project.db.utils import upsert_options
+from .signals import ingredients_added
+
+
+def ingredient_count():
+    """ correlated subquery: number of links of the outer Recipe row """
+    links = RecipeIngredient.objects.filter(recipe=OuterRef("pk")).order_by()
+    return Coalesce(Subquery(
+        links.values("recipe").annotate(n=Count("pk")).values("n")), 0)
+
+
+class RecipeIngredientManager(models.Manager):
+    def add_to_recipe(self, recipe, items):
+        """
+        Bulk write path: link `(ingredient name, quantity)` pairs to `recipe`.
+
+        Unknown names become new ingredients. The number of queries does not
+        depend on len(items): one lookup of all names, one insert and one
+        re-read of the missing ingredients, one insert of the links and one
+        recount of `ingredient_num`, all in a single transaction. Adding an
+        ingredient the recipe already has updates its quantity.
+        """
+        quantities = {}
+        for name, quantity in items:
+            quantities[str(name)] = quantity  # the last row of a name wins
+        if not quantities:
+            return
+
+        with transaction.atomic():
+            ids = dict(Ingredient.objects.filter(
+                name__in=quantities).values_list("name", "id"))
+            missing = [name for name in quantities if name not in ids]
+            if missing:
+                # MySQL does not return primary keys from a bulk insert
+                Ingredient.objects.bulk_create(
+                    [Ingredient(name=name) for name in missing],
+                    ignore_conflicts=True)
+                ids.update(Ingredient.objects.filter(
+                    name__in=missing).values_list("name", "id"))
+
+            self.bulk_create(
+                [self.model(recipe=recipe, ingredient_id=ids[name], quantity=quantity)
+                 for name, quantity in quantities.items()],
+                **upsert_options(self, ["recipe", "ingredient"], ["quantity"]),
+            )
+
+            # recounted inside the UPDATE, so concurrent writers cannot
+            # overwrite each other's result
+            count = ingredient_count()
+            Recipe.objects.filter(pk=recipe.pk).update(
+                difficulty=Recipe.difficulty_for(count), ingredient_num=count)
+
+        bump_data_version()  # bulk_create skipped the save() methods
+        if missing:
+            bump_catalog_version()
+        ingredients_added.send(sender=self.model, recipe=recipe)
 
 
 class RecipeIngredient(models.Model):
@@ -8,7 +68,13 @@ class RecipeIngredient(models.Model):
     ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
     quantity = models.CharField(max_length=50)
 
+    objects = RecipeIngredientManager()
+
     class Meta:
+        # recipes of one ingredient by recipe id, see IngredientDetailView
+        indexes = [
+            models.Index(fields=["ingredient", "recipe"], name="ingredient_recipe_idx")
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=["recipe", "ingredient"], name="unique_recipe_ingredient"
@@ -21,19 +87,26 @@ class RecipeIngredient(models.Model):
             name=self.ingredient.name)
         self.ingredient = ingredient
 
-        """ change recipe.ingredient_num when add/update """
+        """ change recipe.ingredient_num when add or moved to another recipe """
+        adding = self._state.adding
+        previous = None if adding else RecipeIngredient.objects.filter(
+            pk=self.pk).values_list("recipe_id", "ingredient_id").first()
+        # (recipe id, ingredient id) before this save, for the post_save receivers
+        self.previous_ids = previous
         super().save(*args, **kwargs)
 
-        self.recipe.ingredient_num = RecipeIngredient.objects.filter(
-            recipe=self.recipe).count()
-        self.recipe.save()
+        if previous is None:
+            Recipe.adjust_ingredient_num(self.recipe_id, 1)
+        elif previous[0] != self.recipe_id:
+            Recipe.adjust_ingredient_num(previous[0], -1)
+            Recipe.adjust_ingredient_num(self.recipe_id, 1)
+        bump_data_version()
 
     def delete(self, *args, **kwargs):
         """ change recipe.ingredient_num when delete """
-        super().delete(*args, **kwargs)
-        self.recipe.ingredient_num = RecipeIngredient.objects.filter(
-            recipe=self.recipe).count()
-        self.recipe.save()
+        result = super().delete(*args, **kwargs)
+        Recipe.adjust_ingredient_num(self.recipe_id, -1)
+        return result  # the data version is bumped by the post_delete receiver
 
     def __str__(self):
         return f"{self.quantity} of {self.ingredient.name} in {self.recipe.name}"
@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# sent by RecipeIngredient.objects.add_to_recipe(), which bypasses the
+# per-row post_save signals; arguments: recipe
+ingredients_added = Signal()
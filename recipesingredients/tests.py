@@ -1,4 +1,10 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from recipes.models import Recipe
 from ingredients.models import Ingredient
@@ -43,3 +49,142 @@ class RecipeIngredientModelTest(TestCase):
         self.recipe.refresh_from_db()
         # ingredient_num should back to 0
         self.assertEqual(self.recipe.ingredient_num, 0)
+
+
+class RecipeIngredientBulkAddTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass")
+        self.recipe = Recipe.objects.create(
+            name="Test Recipe", cooking_time=5, ingredient_num=0,
+            created_by=self.user)
+        Ingredient.objects.create(name="Tomato")
+
+    def add(self, recipe, count):
+        """ one existing ingredient, the rest have to be created """
+        items = [("Tomato", "1")] + [(f"Spice {recipe.pk}-{i}", "1 tsp")
+                                     for i in range(count - 1)]
+        RecipeIngredient.objects.add_to_recipe(recipe, items)
+
+    def test_query_count_is_constant(self):
+        """ test the bulk path costs the same for 2 or 20 ingredients """
+        with CaptureQueriesContext(connection) as small:
+            self.add(self.recipe, 2)
+        other = Recipe.objects.create(
+            name="Other Recipe", cooking_time=5, created_by=self.user)
+        with self.assertNumQueries(len(small.captured_queries)):
+            self.add(other, 20)
+
+    def test_counter_and_links(self):
+        """ test links, new ingredients and ingredient_num are written """
+        self.add(self.recipe, 5)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.ingredient_num, 5)
+        self.assertEqual(self.recipe.difficulty, "Medium")
+        self.assertEqual(Ingredient.objects.count(), 5)
+        self.assertEqual(RecipeIngredient.objects.filter(
+            recipe=self.recipe).count(), 5)
+
+    def test_existing_link_updates_quantity(self):
+        """ test adding an ingredient twice keeps one link """
+        RecipeIngredient.objects.add_to_recipe(self.recipe, [("Tomato", "1")])
+        RecipeIngredient.objects.add_to_recipe(self.recipe, [("Tomato", "3")])
+        link = RecipeIngredient.objects.get(recipe=self.recipe)
+        self.assertEqual(link.quantity, "3")
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.ingredient_num, 1)
+
+    def test_no_conflict_target_without_backend_support(self):
+        """ test the bulk path on backends like MySQL, which refuse unique_fields """
+        with mock.patch.object(connection.features, "supports_update_conflicts_with_target", False), \
+                CaptureQueriesContext(connection) as queries:
+            self.add(self.recipe, 3)
+        inserts = [query["sql"] for query in queries.captured_queries
+                   if query["sql"].startswith('INSERT INTO "recipesingredients_recipeingredient"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertNotIn("ON CONFLICT", inserts[0])
+        self.assertEqual(RecipeIngredient.objects.filter(recipe=self.recipe).count(), 3)
+
+
+class IngredientCounterTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass")
+        self.recipe = Recipe.objects.create(
+            name="Quick Salad", cooking_time=5, ingredient_num=3,
+            created_by=self.user)
+        self.tomato = Ingredient.objects.create(name="Tomato")
+
+    def test_difficulty_updated_with_counter(self):
+        """ test difficulty follows ingredient_num in the same UPDATE """
+        link = RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=self.tomato, quantity="2")
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.ingredient_num, 4)
+        self.assertEqual(self.recipe.difficulty, "Medium")
+
+        link.delete()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.ingredient_num, 3)
+        self.assertEqual(self.recipe.difficulty, "Easy")
+
+    def test_counter_never_negative(self):
+        """ test deleting from a drifted counter stops at 0 """
+        link = RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=self.tomato, quantity="2")
+        Recipe.objects.filter(pk=self.recipe.pk).update(ingredient_num=0)
+        link.delete()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.ingredient_num, 0)
+
+    def test_other_columns_not_rewritten(self):
+        """ test a stale recipe instance does not overwrite other columns """
+        Recipe.objects.filter(pk=self.recipe.pk).update(name="Renamed")
+        RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=self.tomato, quantity="2")
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.name, "Renamed")
+
+    def test_moved_link_updates_both_counters(self):
+        """ test moving a link to another recipe moves its count too """
+        other = Recipe.objects.create(
+            name="Soup", cooking_time=5, ingredient_num=0, created_by=self.user)
+        link = RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=self.tomato, quantity="2")
+        link.recipe = other
+        link.save()
+        self.recipe.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.recipe.ingredient_num, other.ingredient_num), (3, 1))
+
+        link.quantity = "3"
+        link.save()  # same recipe, no change
+        other.refresh_from_db()
+        self.assertEqual(other.ingredient_num, 1)
+
+    def test_stale_recipe_save_keeps_counter(self):
+        """ test saving a recipe loaded before a link was added keeps the count """
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=self.tomato, quantity="2")
+        stale.name = "Tomato Salad"
+        stale.save()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.ingredient_num, 4)
+        self.assertEqual(self.recipe.difficulty, "Medium")
+
+    def test_repair_command(self):
+        """ test the repair command recomputes drifted counters in batches """
+        RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=self.tomato, quantity="2")
+        for i in range(5):
+            Recipe.objects.create(name=f"Empty {i}", cooking_time=30,
+                                  ingredient_num=7, created_by=self.user)
+        out = StringIO()
+        call_command("repair_ingredient_counts", "--batch-size", "2", stdout=out)
+        self.assertIn("Repaired 6 recipe(s).", out.getvalue())
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.ingredient_num, 1)
+        self.assertEqual(self.recipe.difficulty, "Easy")
+        self.assertFalse(Recipe.objects.exclude(
+            pk=self.recipe.pk).exclude(ingredient_num=0).exists())
@@ -0,0 +1,25 @@
+// Suggest ingredient names for every <input data-autocomplete-url="...">
+document.querySelectorAll("input[data-autocomplete-url]").forEach(function (input, n) {
+  var list = document.createElement("datalist");
+  var timer = null;
+  list.id = "autocomplete-list-" + n;
+  input.setAttribute("list", list.id);
+  input.setAttribute("autocomplete", "off");
+  input.after(list);
+
+  input.addEventListener("input", function () {
+    clearTimeout(timer);
+    timer = setTimeout(function () {
+      var url = input.dataset.autocompleteUrl + "?q=" + encodeURIComponent(input.value);
+      fetch(url)
+        .then(function (response) { return response.json(); })
+        .then(function (data) {
+          list.replaceChildren.apply(list, data.results.map(function (item) {
+            var option = document.createElement("option");
+            option.value = item.name;
+            return option;
+          }));
+        });
+    }, 100);
+  });
+});